@@ -0,0 +1,157 @@
+# Description: 複数のケース (cases/*.json) を並列のワーカープロセスで実行し、ケースごとの結果を JSON で書き出す
+# Usage: python3 batch.py CASE_OR_GLOB [CASE_OR_GLOB ...] [-j N] [-o OUTPUT_DIR]
+#   例: python3 batch.py 'cases/full_register_access_*.json' cases/qft_5_no_swap.json -j 4
+#   各ケースの max_timesteps で打ち切る。
+#   シミュレーションの標準出力は OUTPUT_DIR/<ケース名>.log に保存する
+#   --stats を付けると段階ごとの時間と回数 (instrumentation) を結果に含め、イベントを含む全体を
+#   OUTPUT_DIR/<ケース名>.stats.json に書き出す (--stats-every N で N タイムステップごとにも書き出す)
+#   QASM から作った依存グラフは .dag_cache/ にキャッシュする (--no-cache で無効)
+#   --eviction でパーキングエッジから出すイオンの選び方を変えられる (eviction.EVICTION_POLICIES)
+#   --planner でタイムステップごとのイオンの移動の決め方を変えられる (planner.PLANNERS)
+#   --trace を付けると、すべてのイベント (event_trace) を OUTPUT_DIR/<ケース名>.trace.jsonl に書き出す
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from instrumentation import stats  # noqa: E402
+from event_trace import trace  # noqa: E402
+from dag_cache import DagCache  # noqa: E402
+from eviction import EVICTION_POLICIES  # noqa: E402
+from planner import PLANNERS  # noqa: E402
+from main import load_config, run_simulation, setup_simulation  # noqa: E402
+
+
+def expand_cases(patterns: list[str]) -> list[Path]:
+    """
+    ファイル名とグロブを展開し、重複を除いたケースのリストを返す (指定順)
+    """
+    cases = {}
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            print(f"No case matches {pattern}")
+        for match in matches:
+            cases.setdefault(Path(match), None)
+    return list(cases)
+
+
+def run_case(
+    config_file: Path,
+    output_dir: Path,
+    collect_stats: bool = False,
+    stats_every: int | None = None,
+    use_cache: bool = True,
+    eviction: str = "move_list",
+    write_trace: bool = False,
+    planner: str = "heuristic",
+) -> dict:
+    """
+    1ケースを実行して結果の辞書を返す。例外が起きた場合は error に記録する
+    """
+    result = {
+        "case": config_file.stem,
+        "config_file": str(config_file),
+        "eviction": eviction,
+        "planner": planner,
+    }
+    timings = {}
+    if collect_stats:
+        stats.enable(
+            dump_path=output_dir / f"{config_file.stem}.stats.json",
+            dump_every=stats_every,
+        )
+    if write_trace:
+        trace.open(output_dir / f"{config_file.stem}.trace.jsonl")
+    start = time.perf_counter()
+    log_file = output_dir / f"{config_file.stem}.log"
+    try:
+        with log_file.open("w") as log, contextlib.redirect_stdout(log):
+            config = load_config(config_file)
+            result.update(config)
+            cache = DagCache() if use_cache else None
+            simulation = setup_simulation(config, timings, cache)
+            front_layer = simulation[4]
+
+            simulate_start = time.perf_counter()
+            timestep = run_simulation(
+                *simulation,
+                max_timesteps=config["max_timesteps"],
+                eviction=eviction,
+                planner=planner,
+            )
+            timings["simulate"] = time.perf_counter() - simulate_start
+
+        result["timestep"] = timestep
+        result["completed"] = len(front_layer) == 0
+    except Exception:
+        result["error"] = traceback.format_exc()
+    finally:
+        trace.close()
+    result["wall_time"] = time.perf_counter() - start
+    result["timings"] = timings
+    if collect_stats:
+        result["stats"] = stats.summary(include_events=False)
+        stats.disable()
+
+    with (output_dir / f"{config_file.stem}.json").open("w") as f:
+        json.dump(result, f, indent=2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("cases", nargs="+", help="case JSON files or globs")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("-o", "--output-dir", type=Path, default=Path("results"))
+    parser.add_argument("--stats", action="store_true")
+    parser.add_argument("--stats-every", type=int)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument(
+        "--eviction", choices=sorted(EVICTION_POLICIES), default="move_list"
+    )
+    parser.add_argument("--trace", action="store_true")
+    parser.add_argument("--planner", choices=sorted(PLANNERS), default="heuristic")
+    args = parser.parse_args()
+
+    cases = expand_cases(args.cases)
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"{'case':<28}{'timestep':>10}{'completed':>11}{'wall [s]':>10}")
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [
+            executor.submit(
+                run_case,
+                config_file,
+                args.output_dir,
+                args.stats,
+                args.stats_every,
+                not args.no_cache,
+                args.eviction,
+                args.trace,
+                args.planner,
+            )
+            for config_file in cases
+        ]
+        for future in futures:
+            result = future.result()
+            if "error" in result:
+                status = "error: " + result["error"].strip().splitlines()[-1]
+                print(f"{result['case']:<28}{status}")
+            else:
+                print(
+                    f"{result['case']:<28}{result['timestep']:>10}"
+                    f"{str(result['completed']):>11}{result['wall_time']:>10.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from batch import expand_cases, run_case
+
+ROOT = Path(__file__).resolve().parent
+
+
+def test_expand_cases_keeps_order_and_drops_duplicates(monkeypatch):
+    """
+    Test that `expand_cases` expands globs in order and lists each case once.
+    """
+    monkeypatch.chdir(ROOT)
+    cases = expand_cases(
+        ["cases/full_register_access_6.json", "cases/full_register_access_*.json"]
+    )
+    assert cases[0] == Path("cases/full_register_access_6.json")
+    assert len(cases) == len(set(cases))
+    assert Path("cases/full_register_access_5.json") in cases
+
+
+def test_run_case_writes_result(monkeypatch, tmp_path):
+    """
+    Test that `run_case` writes a JSON result with the final timestep and phase timings.
+    """
+    monkeypatch.chdir(ROOT)
+    result = run_case(
+        Path("cases/full_register_access_6.json"), tmp_path, use_cache=False
+    )
+
+    assert "error" not in result
+    assert result["timestep"] == 7
+    assert result["completed"] is True
+    assert set(result["timings"]) == {
+        "graph",
+        "dist_dict",
+        "routing_table",
+        "parse",
+        "sequence",
+        "simulate",
+    }
+    with (tmp_path / "full_register_access_6.json").open() as f:
+        assert json.load(f) == result
+    assert (
+        "Full Sequence executed in 7 time steps"
+        in (tmp_path / "full_register_access_6.log").read_text()
+    )
+
+
+def test_run_case_records_errors(monkeypatch, tmp_path):
+    """
+    Test that `run_case` records a failing case instead of raising.
+    """
+    monkeypatch.chdir(ROOT)
+    (tmp_path / "cases").mkdir()
+    config_file = tmp_path / "cases" / "broken.json"
+    config_file.write_text(
+        json.dumps(
+            {
+                "arch": [3, 3, 1, 1],
+                "max_timesteps": 10,
+                "num_ion_chains": 2,
+                "qu_alg": "missing.qasm",
+            }
+        )
+    )
+    result = run_case(config_file, tmp_path, use_cache=False)
+    assert "The file is not a valid QASM file." in result["error"]
+    assert (tmp_path / "broken.json").exists()
+
+
+def test_worker_imports_skip_heavy_dependencies():
+    """
+    Test that importing the simulation in a new worker process loads neither
+    matplotlib nor qiskit (nor numpy and scipy through them).
+    """
+    script = (
+        "import sys, batch; "
+        "print([m for m in ('numpy', 'matplotlib', 'qiskit', 'scipy') if m in sys.modules])"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert output.strip() == "[]"
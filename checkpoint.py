@@ -0,0 +1,163 @@
+import os
+import pickle
+import random
+import tempfile
+import zlib
+from pathlib import Path
+
+import networkx as nx
+
+from compilation import FrontLayer, update_sequence
+from graph_basics import update_distance_map
+from graph_utils import get_ion_chains
+
+# 保存する内容を変えたら上げる (古いチェックポイントからは再開できなくなる)
+CHECKPOINT_VERSION = 1
+
+
+def executed_mask(front_layer: FrontLayer) -> bytes:
+    """
+    実行済みのゲートを 1 にしたバイト列 (zlib で圧縮する。実行済みのゲートは id の小さい方に固まるのでよく縮む)
+    """
+    mask = bytearray(b"\x01") * len(front_layer.dag)
+    for node_id in front_layer.front:
+        mask[node_id] = 0
+    for node_id in front_layer.in_degree:
+        mask[node_id] = 0
+    return zlib.compress(bytes(mask))
+
+
+def front_layer_from_mask(dag, compressed_mask: bytes) -> FrontLayer:
+    """
+    executed_mask から FrontLayer を作り直す。残りのゲートの入次数は、実行されていない直前のゲートの数
+    """
+    mask = zlib.decompress(compressed_mask)
+    front_layer = FrontLayer.__new__(FrontLayer)
+    front_layer.dag = dag
+    in_degree = list(dag.in_degree)
+    for node_id, executed in enumerate(mask):
+        if executed:
+            for successor in dag.successors[node_id]:
+                in_degree[successor] -= 1
+    front_layer.front = []
+    front_layer.in_degree = {}
+    for node_id, executed in enumerate(mask):
+        if executed:
+            continue
+        if in_degree[node_id] == 0:
+            front_layer.front.append(node_id)
+        else:
+            front_layer.in_degree[node_id] = in_degree[node_id]
+    return front_layer
+
+
+def simulation_state(
+    G: nx.Graph,
+    front_layer: FrontLayer,
+    timestep: int,
+    timestep_buffer: int,
+    eviction_policy,
+    options: dict | None = None,
+) -> dict:
+    """
+    run_simulation のループの区切りでの状態。グラフ、距離、経路表、依存グラフは設定から作り直せるので含めない
+    (設定は Checkpointer が加える)。options は再開するときに run_simulation に渡す引数
+
+    ゲート列 (seq) も保存しない。ループの区切りでは seq は常に、残りのゲートと今のイオンの配置から
+    update_sequence で作り直したものなので、再開するときに同じものを計算し直せる
+    """
+    return {
+        "version": CHECKPOINT_VERSION,
+        "options": options or {},
+        "num_gates": len(front_layer.dag),
+        "edge_ions": G.occupancy.edge_ions,
+        "ion_edge": G.occupancy.ion_edge,
+        "executed": executed_mask(front_layer),
+        "timestep": timestep,
+        "timestep_buffer": timestep_buffer,
+        "random_state": random.getstate(),
+        "eviction_policy": eviction_policy,
+    }
+
+
+def save_checkpoint(path: str | Path, state: dict) -> None:
+    """
+    state を pickle で書き出す。一時ファイルからの置き換えなので、書き込み中に落ちても前のチェックポイントが残る
+    """
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def load_checkpoint(path: str | Path) -> dict:
+    with Path(path).open("rb") as f:
+        state = pickle.load(f)
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version: {state.get('version')}")
+    return state
+
+
+def restore_state(G: nx.Graph, front_layer: FrontLayer, state: dict):
+    """
+    setup_simulation で作り直したグラフに state を書き戻し、FrontLayer とゲート列を作り直す (乱数の状態も戻す)
+
+    Returns:
+        (front_layer, seq, flat_seq, next_node, timestep, timestep_buffer, eviction_policy)
+    """
+    dag = front_layer.dag
+    if len(dag) != state["num_gates"]:
+        raise ValueError("The checkpoint was saved for a different circuit")
+
+    G.occupancy.edge_ions = [list(ions) for ions in state["edge_ions"]]
+    G.occupancy.ion_edge = list(state["ion_edge"])
+    front_layer = front_layer_from_mask(dag, state["executed"])
+    distance_map = update_distance_map(get_ion_chains(G), G.dist_dict)
+    gate_ids, next_node = update_sequence(front_layer, distance_map)
+    seq = [tuple(gate) for gate in gate_ids]
+    flat_seq = [item for sublist in seq for item in sublist]
+    eviction_policy = state["eviction_policy"]
+    eviction_policy.on_schedule(seq)
+    random.setstate(state["random_state"])
+    return (
+        front_layer,
+        seq,
+        flat_seq,
+        next_node,
+        state["timestep"],
+        state["timestep_buffer"],
+        eviction_policy,
+    )
+
+
+class Checkpointer:
+    """
+    シミュレーションの状態を every タイムステップごとに path へ保存する。
+    保存は状態の pickle (イオンの配置、残りのゲート、乱数の状態) だけなので、1タイムステップの処理より十分軽い
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        every: int = 100,
+        config: dict | None = None,
+    ):
+        self.path = Path(path)
+        self.every = every
+        self.config = config
+        self.next_timestep = every
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def due(self, timestep: int) -> bool:
+        return timestep >= self.next_timestep
+
+    def save(self, state: dict) -> None:
+        state["config"] = self.config
+        save_checkpoint(self.path, state)
+        # タイムステップは飛ぶことがあるので、次の every の倍数を次の保存タイミングにする
+        self.next_timestep = (state["timestep"] // self.every + 1) * self.every
@@ -0,0 +1,69 @@
+import pickle
+
+import pytest
+
+from checkpoint import (
+    Checkpointer,
+    executed_mask,
+    front_layer_from_mask,
+    load_checkpoint,
+)
+from compilation import FrontLayer, load_dependency_dag
+from main import load_config, run_simulation, setup_simulation
+
+CONFIG_FILE = "cases/qft_5_no_swap.json"
+
+
+def test_front_layer_from_mask_round_trip():
+    """
+    Test that the executed-gate mask rebuilds the same front layer and in-degrees.
+    """
+    dag = load_dependency_dag(
+        "qft_without_swaps/qft_no_swaps_nativegates_quantinuum_tket_5.qasm"
+    )
+    front_layer = FrontLayer(dag)
+    for _ in range(40):
+        front_layer.remove(front_layer.nodes()[-1])
+
+    rebuilt = front_layer_from_mask(dag, executed_mask(front_layer))
+    assert rebuilt.front == front_layer.front
+    assert rebuilt.in_degree == front_layer.in_degree
+
+
+@pytest.mark.parametrize("eviction", ["move_list", "lru"])
+def test_resume_matches_uninterrupted_run(tmp_path, capsys, eviction: str):
+    """
+    Test that resuming from a checkpoint prints the same gates and ends at the same
+    timestep as a run that was never stopped.
+    """
+    config = load_config(CONFIG_FILE)
+    timestep = run_simulation(*setup_simulation(config), eviction=eviction)
+    full_output = capsys.readouterr().out.splitlines()
+
+    checkpointer = Checkpointer(tmp_path / "checkpoint.pickle", 50, config)
+    run_simulation(
+        *setup_simulation(config),
+        eviction=eviction,
+        max_timesteps=120,
+        checkpointer=checkpointer,
+    )
+    capsys.readouterr()
+
+    state = load_checkpoint(tmp_path / "checkpoint.pickle")
+    assert 100 <= state["timestep"] < 120
+    resumed_timestep = run_simulation(
+        *setup_simulation(config), resume_state=state, **state["options"]
+    )
+    resumed_output = capsys.readouterr().out.splitlines()
+
+    assert resumed_timestep == timestep
+    assert resumed_output == full_output[-len(resumed_output) :]
+    assert resumed_output[0].startswith(f"time step: {state['timestep'] + 1},")
+
+
+def test_load_checkpoint_rejects_other_versions(tmp_path):
+    path = tmp_path / "checkpoint.pickle"
+    with path.open("wb") as f:
+        pickle.dump({"version": 0}, f)
+    with pytest.raises(ValueError):
+        load_checkpoint(path)
@@ -1,9 +1,16 @@
+from __future__ import annotations
+
+import bisect
+import heapq
 import math
+from typing import TYPE_CHECKING
+
+from qasm_reader import read_qasm_gates
 
-from qiskit.dagcircuit import DAGDependency
-from qiskit.dagcircuit.dagnode import DAGOpNode
-from qiskit import QuantumCircuit
-from qiskit.converters import circuit_to_dagdependency
+# qiskit の import は重い (1秒以上) ので、qasm_reader で読めない回路と DAGDependency を直接扱う関数の中でだけ読み込む
+if TYPE_CHECKING:
+    from qiskit.dagcircuit import DAGDependency
+    from qiskit.dagcircuit.dagnode import DAGOpNode
 
 # This file is almost copy from Daniel's one.
 # ref: https://docs.quantum.ibm.com/api/qiskit/0.24/dagcircuit
@@ -24,8 +31,12 @@ def is_qasm_file(filename: str) -> bool:
 
     try:
         with open(filename) as file:
-            first_line = file.readline()
-            return "OPENQASM" in first_line
+            # 先頭に空行やコメントがあるファイル (qft_without_swaps の多く) も受け付ける
+            for line in file:
+                line = line.strip()
+                if line and not line.startswith("//"):
+                    return "OPENQASM" in line
+            return False
     except OSError:
         return False
 
@@ -48,6 +59,168 @@ def get_front_layer(dag: DAGDependency) -> list[DAGOpNode]:
     return front_layer
 
 
+class GateNode:
+    """
+    A gate of a `DependencyDAG`. It keeps only what the simulator reads from a DAGOpNode.
+    """
+
+    __slots__ = ("node_id", "name", "qindices")
+
+    def __init__(self, node_id: int, name: str, qindices: list[int]):
+        self.node_id = node_id
+        self.name = name
+        self.qindices = qindices
+
+    def __repr__(self) -> str:
+        return f"GateNode({self.node_id}, {self.name!r}, {self.qindices})"
+
+
+class DependencyDAG:
+    """
+    Immutable dependency structure of a circuit, extracted once from its DAGDependency.
+
+    Node ids are renumbered to 0..n-1 in the order of the DAGDependency, so they can be
+    used as list indices. Which gates have been executed is not stored here but in a
+    `FrontLayer`, so one DependencyDAG is shared by every snapshot of a run.
+    """
+
+    def __init__(self, nodes: list[GateNode], successors: list[tuple[int, ...]]):
+        """
+        Args:
+            nodes: The gates, where nodes[i].node_id == i.
+            successors: The ids of the direct successors of each gate.
+        """
+        self.nodes = nodes
+        self.successors = successors
+        in_degree = [0] * len(nodes)
+        for node_successors in successors:
+            for successor in node_successors:
+                in_degree[successor] += 1
+        self.in_degree: tuple[int, ...] = tuple(in_degree)
+
+    @classmethod
+    def from_dagdependency(cls, dag: DAGDependency) -> "DependencyDAG":
+        """
+        Extract the dependency structure of a DAGDependency.
+
+        Args:
+            dag: The DAGDependency object representing the quantum circuit.
+
+        Returns:
+            The DependencyDAG with the same gates and dependencies.
+        """
+        node_ids = [node.node_id for node in dag.get_nodes()]
+        new_id = {node_id: i for i, node_id in enumerate(node_ids)}
+        nodes = [
+            GateNode(new_id[node.node_id], node.name, list(node.qindices))
+            for node in dag.get_nodes()
+        ]
+        successors = [
+            tuple(new_id[successor] for successor in dag.direct_successors(node_id))
+            for node_id in node_ids
+        ]
+        return cls(nodes, successors)
+
+    @classmethod
+    def from_gates(
+        cls,
+        names: list[str],
+        qindices: list[tuple[int, ...]],
+        successors: list[tuple[int, ...]],
+    ) -> "DependencyDAG":
+        """
+        Build a DependencyDAG from plain lists, as returned by
+        `qasm_reader.read_qasm_gates` or stored in a `dag_cache.DagCache`.
+
+        Args:
+            names: The name of each gate.
+            qindices: The qubit indices of each gate.
+            successors: The ids of the direct successors of each gate.
+
+        Returns:
+            The DependencyDAG with these gates and dependencies.
+        """
+        nodes = [
+            GateNode(node_id, name, list(indices))
+            for node_id, (name, indices) in enumerate(zip(names, qindices))
+        ]
+        return cls(nodes, successors)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+
+class FrontLayer:
+    """
+    The gates of a `DependencyDAG` that have not been executed yet, tracked through the
+    front layer and per-node in-degree counts.
+
+    Executing a gate with `remove` only updates the in-degrees of its direct
+    successors, so querying the front layer costs O(|front|) instead of a scan
+    over every node of the DAG as in `get_front_layer`.
+    `snapshot` gives an independent copy for "what-if" orderings such as
+    `update_sequence`, without rebuilding the DAG.
+    """
+
+    def __init__(self, dag: DependencyDAG):
+        """
+        Args:
+            dag: The dependency DAG. All of its gates start unexecuted.
+        """
+        self.dag = dag
+        # number of remaining direct predecessors of the nodes outside the front layer
+        self.in_degree: dict[int, int] = {}
+        # node ids of the front layer, in ascending order like `get_front_layer`
+        self.front: list[int] = []
+        for node_id, num_predecessors in enumerate(dag.in_degree):
+            if num_predecessors == 0:
+                self.front.append(node_id)
+            else:
+                self.in_degree[node_id] = num_predecessors
+
+    def __len__(self) -> int:
+        """
+        Returns:
+            The number of gates that have not been executed yet.
+        """
+        return len(self.front) + len(self.in_degree)
+
+    def nodes(self) -> list[GateNode]:
+        """
+        Returns:
+            A list of GateNodes in the front layer of the DAG.
+        """
+        return [self.dag.nodes[node_id] for node_id in self.front]
+
+    def remove(self, node: GateNode) -> None:
+        """
+        Execute a node of the front layer.
+
+        Args:
+            node: The node to be executed.
+        """
+        self.front.remove(node.node_id)
+        for successor in self.dag.successors[node.node_id]:
+            self.in_degree[successor] -= 1
+            if self.in_degree[successor] == 0:
+                del self.in_degree[successor]
+                bisect.insort(self.front, successor)
+
+    def snapshot(self) -> "FrontLayer":
+        """
+        Copy the execution state. The DependencyDAG itself is shared, so this costs
+        O(number of remaining gates).
+
+        Returns:
+            A FrontLayer that can be modified without affecting this one.
+        """
+        snapshot = FrontLayer.__new__(FrontLayer)
+        snapshot.dag = self.dag
+        snapshot.in_degree = self.in_degree.copy()
+        snapshot.front = self.front.copy()
+        return snapshot
+
+
 # My original function
 def get_front_layer_ions(dag: DAGDependency):
     working_dag = manual_copy_dag(dag)
@@ -73,16 +246,16 @@ def remove_node(dag: DAGDependency, node: DAGOpNode) -> None:
     dag._multi_graph.remove_node(node.node_id)
 
 
-def find_best_gate(front_layer: list[DAGOpNode], dist_map: dict[int, int]) -> DAGOpNode:
+def find_best_gate(front_layer: list[GateNode], dist_map: dict[int, int]) -> GateNode:
     """
     Find the best gate to execute based on the distance map.
 
     Args:
-        front_layer: A list of DAGOpNodes in the front layer.
+        front_layer: A list of GateNodes (or DAGOpNodes) in the front layer.
         dist_map: A dictionary mapping qubit indices to distances.
 
     Returns:
-        The DAGOpNode of the best gate to execute.
+        The GateNode of the best gate to execute.
     """
     min_gate_cost = math.inf
     best_gate = None
@@ -111,6 +284,8 @@ def manual_copy_dag(dag: DAGDependency) -> DAGDependency:
     Returns:
         A copy of the DAGDependency object.
     """
+    from qiskit.dagcircuit import DAGDependency
+
     new_dag = DAGDependency()
 
     for qreg in dag.qregs.values():
@@ -122,26 +297,123 @@ def manual_copy_dag(dag: DAGDependency) -> DAGDependency:
     return new_dag
 
 
-def update_sequence(dag: DAGDependency, distance_map: dict[int, int]):
+class HeapScheduler:
+    """
+    Heap-based version of the greedy ordering of `update_sequence`.
+
+    Gates are popped in the order of the key (cost, not 2-qubit-at-distance-0, node_id),
+    which picks the same gate as `find_best_gate` on every round, so the sequence is
+    identical while costing O(G log |front|) instead of O(G * |front|).
+    Keys are cached between calls, and only the gates acting on ions whose distance
+    changed are re-keyed.
+    """
+
+    def __init__(self, dag: DependencyDAG):
+        """
+        Args:
+            dag: The dependency DAG to schedule.
+        """
+        self.dag = dag
+        self.keys: list[tuple | None] = [None] * len(dag)
+        self.distance_map: dict[int, int] = {}
+        # qubit -> ids of the gates acting on it
+        self.qubit_gates: dict[int, list[int]] = {}
+        for node in dag.nodes:
+            for qubit in node.qindices:
+                self.qubit_gates.setdefault(qubit, []).append(node.node_id)
+
+    def update_distances(self, distance_map: dict[int, int]) -> None:
+        """
+        Invalidate the keys of the gates acting on ions whose distance changed.
+
+        Args:
+            distance_map: A dictionary that maps each ion to its distance from the processing zone.
+        """
+        changed = [
+            ion
+            for ion in distance_map.keys() | self.distance_map.keys()
+            if distance_map.get(ion) != self.distance_map.get(ion)
+        ]
+        for ion in changed:
+            for node_id in self.qubit_gates.get(ion, ()):
+                self.keys[node_id] = None
+        self.distance_map = dict(distance_map)
+
+    def key(self, node_id: int) -> tuple:
+        key = self.keys[node_id]
+        if key is None:
+            qubit_indices = self.dag.nodes[node_id].qindices
+            gate_cost = max([self.distance_map[qs] for qs in qubit_indices])
+            # 2-qubit gates whose ions are both in the processing zone come first
+            key = (
+                gate_cost,
+                not (len(qubit_indices) == 2 and gate_cost == 0),
+                node_id,
+            )
+            self.keys[node_id] = key
+        return key
+
+    def schedule(self, front_layer: FrontLayer, distance_map: dict[int, int]):
+        """
+        Same as `update_sequence`, using the heap.
+
+        Args:
+            front_layer: The gates of the dependency DAG that have not been executed yet.
+            distance_map: A dictionary that maps each ion to its distance from the processing zone.
+
+        Returns:
+            The list of gate sequences and the first gate node in the sequence.
+        """
+        self.update_distances(distance_map)
+        in_degree = front_layer.in_degree.copy()
+        heap = [self.key(node_id) for node_id in front_layer.front]
+        heapq.heapify(heap)
+        sequence = []
+        first_node = None
+
+        while heap:
+            node_id = heapq.heappop(heap)[2]
+            sequence.append(self.dag.nodes[node_id].qindices)
+            for successor in self.dag.successors[node_id]:
+                in_degree[successor] -= 1
+                if in_degree[successor] == 0:
+                    heapq.heappush(heap, self.key(successor))
+
+            if first_node is None:
+                first_node = self.dag.nodes[node_id]
+
+        return sequence, first_node
+
+
+def update_sequence(
+    front_layer: FrontLayer,
+    distance_map: dict[int, int],
+    scheduler: HeapScheduler | None = None,
+):
     """
     Get the sequence of gates from the DAG and create a new sequence based on distances.
 
     Args:
-    - dag (DAGDependency): The dependency DAG of quantum gates.
+    - front_layer (FrontLayer): The gates of the dependency DAG that have not been executed yet.
     - distance_map (dict): A dictionary that maps each ion to its distance from the processing zone.
+    - scheduler (HeapScheduler): If given, use the heap-based scheduler. Otherwise scan
+      the front layer with `find_best_gate` every round. Both give the same sequence.
 
     Returns:
     - sequence (list): List of gate sequences.
-    - first_node (DAGDependencyNode): The first gate node in the sequence.
+    - first_node (GateNode): The first gate node in the sequence.
     """
-    # Create a working copy of the DAG
-    working_dag = manual_copy_dag(dag)
+    if scheduler is not None:
+        return scheduler.schedule(front_layer, distance_map)
+
+    # Create a working copy of the execution state
+    working_front_layer = front_layer.snapshot()
     sequence = []
     first_node = None
 
     while True:
         # Get the front layer of executable gates
-        front_gates = get_front_layer(working_dag)
+        front_gates = working_front_layer.nodes()
         if not front_gates:
             break
 
@@ -150,8 +422,8 @@ def update_sequence(dag: DAGDependency, distance_map: dict[int, int]):
 
         # Append the gate's qubit indices to the sequence
         sequence.append(best_gate.qindices)
-        # Remove the selected node from the working DAG
-        remove_node(working_dag, best_gate)
+        # Remove the selected node from the working state
+        working_front_layer.remove(best_gate)
 
         # Update first_node for the first iteration
         if first_node is None:
@@ -160,33 +432,91 @@ def update_sequence(dag: DAGDependency, distance_map: dict[int, int]):
     return sequence, first_node
 
 
+def load_dependency_dag(filename: str, cache=None) -> DependencyDAG:
+    """
+    Parse a QASM file and build its dependency DAG.
+
+    Final measurements and the barrier before them are dropped, since they
+    do not act on ions in the processing zone. Circuits made only of rz, rx,
+    rzz and h gates are read by `qasm_reader.read_qasm_gates` without qiskit;
+    anything else goes through `qiskit_dependency_dag`.
+
+    Args:
+        filename: The name of the QASM file.
+        cache: An optional `dag_cache.DagCache`. A cached DAG for the same
+            file contents is returned without parsing; otherwise the built
+            DAG is stored in it.
+
+    Returns:
+        The DependencyDAG of the circuit.
+    """
+    assert is_qasm_file(filename), "The file is not a valid QASM file."
+    if cache is not None:
+        dag = cache.get(filename)
+        if dag is not None:
+            return dag
+
+    gates = read_qasm_gates(filename)
+    if gates is not None:
+        dag = DependencyDAG.from_gates(*gates)
+        if cache is not None:
+            cache.put(filename, dag)
+        return dag
+
+    dag = qiskit_dependency_dag(filename)
+    if cache is not None:
+        cache.put(filename, dag)
+    return dag
+
+
+def qiskit_dependency_dag(filename: str) -> DependencyDAG:
+    """
+    Build the dependency DAG of a QASM file with qiskit's `circuit_to_dagdependency`.
+    Used by `load_dependency_dag` for circuits that `read_qasm_gates` does not support.
+
+    Args:
+        filename: The name of the QASM file.
+
+    Returns:
+        The DependencyDAG of the circuit, without final measurements and barriers.
+    """
+    from qiskit import QuantumCircuit
+    from qiskit.converters import circuit_to_dagdependency
+
+    qc = QuantumCircuit.from_qasm_file(filename)
+    # 末尾の barrier / measure は DAGDependency 上で qindices が空になり、シャトリングの対象でもないので除く
+    # (remove_final_measurements は回路を組み直してゲートの順序が変わるので使わない)
+    while qc.data and qc.data[-1].operation.name in ("barrier", "measure"):
+        del qc.data[-1]
+    return DependencyDAG.from_dagdependency(circuit_to_dagdependency(qc))
+
+
 def create_initial_sequence(
-    distance_map: dict[tuple[int, int], int], filename: str
-) -> tuple[list[tuple[int]], list[int], DAGDependency, DAGOpNode]:
+    distance_map: dict[tuple[int, int], int], filename: str | DependencyDAG
+) -> tuple[list[tuple[int]], list[int], FrontLayer, GateNode]:
     """
     Create the initial gate sequence from the QASM file.
 
     Args:
         distance_map: A dictionary mapping qubit pairs to distances.
-        filename: The name of the QASM file.
+        filename: The name of the QASM file, or a DependencyDAG already
+            built with `load_dependency_dag`.
 
     Returns:
         A tuple containing:
             - A list of tuples representing the gate sequence.
             - A flattened list of qubit indices.
-            - The DAGDependency object representing the quantum circuit.
-            - The next DAGOpNode to be executed.
+            - The FrontLayer holding the gates of the quantum circuit to execute.
+            - The next GateNode to be executed.
     """
-    with open(filename) as file:
-        first_line = file.readline()
-        # print(first_line)
-    assert is_qasm_file(filename), "The file is not a valid QASM file."
-
-    qc = QuantumCircuit.from_qasm_file(filename)
-    dag_dep = circuit_to_dagdependency(qc)
+    if isinstance(filename, DependencyDAG):
+        dag = filename
+    else:
+        dag = load_dependency_dag(filename)
+    front_layer = FrontLayer(dag)
 
-    gate_ids, next_node = update_sequence(dag_dep, distance_map)
+    gate_ids, next_node = update_sequence(front_layer, distance_map)
     seq = [tuple(gate) for gate in gate_ids]
     flat_seq = [item for sublist in seq for item in sublist]
 
-    return seq, flat_seq, dag_dep, next_node
+    return seq, flat_seq, front_layer, next_node
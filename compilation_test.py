@@ -0,0 +1,175 @@
+import random
+
+import pytest
+from qiskit import QuantumCircuit
+from qiskit.converters import circuit_to_dagdependency
+
+from compilation import (
+    DependencyDAG,
+    FrontLayer,
+    HeapScheduler,
+    find_best_gate,
+    is_qasm_file,
+    load_dependency_dag,
+    get_front_layer,
+    manual_copy_dag,
+    remove_node,
+    update_sequence,
+)
+
+QASM_FILES = [
+    "qft_without_swaps/qft_no_swaps_nativegates_quantinuum_tket_5.qasm",
+    "full_register_access/full_register_access_8.qasm",
+]
+
+
+def load_dag(filename: str):
+    return circuit_to_dagdependency(QuantumCircuit.from_qasm_file(filename))
+
+
+def update_sequence_by_scan(dag, distance_map):
+    """
+    Reference implementation of `update_sequence` that copies the DAGDependency and
+    rescans the whole DAG every round.
+    """
+    working_dag = manual_copy_dag(dag)
+    sequence = []
+    while front_gates := get_front_layer(working_dag):
+        best_gate = find_best_gate(front_gates, distance_map)
+        sequence.append(best_gate.qindices)
+        remove_node(working_dag, best_gate)
+    return sequence
+
+
+@pytest.mark.parametrize("filename", QASM_FILES)
+def test_dependency_dag_matches_dagdependency(filename: str):
+    """
+    Test that `DependencyDAG` keeps the gates and edges of the DAGDependency.
+    """
+    dag = load_dag(filename)
+    dependency_dag = DependencyDAG.from_dagdependency(dag)
+
+    assert len(dependency_dag) == dag.size()
+    for node, gate in zip(dag.get_nodes(), dependency_dag.nodes):
+        assert gate.qindices == node.qindices
+        assert gate.name == node.name
+        assert list(dependency_dag.successors[gate.node_id]) == dag.direct_successors(
+            node.node_id
+        )
+
+
+@pytest.mark.parametrize("filename", QASM_FILES)
+def test_front_layer_matches_get_front_layer(filename: str):
+    """
+    Test that `FrontLayer` tracks the same front layer as `get_front_layer` while gates are removed.
+    """
+    dag = load_dag(filename)
+    front_layer = FrontLayer(DependencyDAG.from_dagdependency(dag))
+    while True:
+        expected = [node.node_id for node in get_front_layer(dag)]
+        assert [node.node_id for node in front_layer.nodes()] == expected
+        assert len(front_layer) == dag.size()
+        if not expected:
+            break
+        # 先頭以外のノードも取り除かれるように、最後のノードを実行する
+        node = front_layer.nodes()[-1]
+        front_layer.remove(node)
+        remove_node(dag, dag.get_node(node.node_id))
+
+
+def test_front_layer_snapshot_is_independent():
+    """
+    Test that executing gates on a snapshot does not change the original FrontLayer.
+    """
+    dag = load_dag(QASM_FILES[0])
+    front_layer = FrontLayer(DependencyDAG.from_dagdependency(dag))
+    front_before = [node.node_id for node in front_layer.nodes()]
+
+    snapshot = front_layer.snapshot()
+    while snapshot.nodes():
+        snapshot.remove(snapshot.nodes()[0])
+
+    assert len(snapshot) == 0
+    assert len(front_layer) == dag.size()
+    assert [node.node_id for node in front_layer.nodes()] == front_before
+
+
+@pytest.mark.parametrize("filename", QASM_FILES)
+def test_update_sequence_matches_scan(filename: str):
+    """
+    Test that `update_sequence` gives the same sequence as rescanning the DAG every round.
+    """
+    dag = load_dag(filename)
+    front_layer = FrontLayer(DependencyDAG.from_dagdependency(dag))
+    num_qubits = len(dag.qubits)
+    distance_map = {qubit: (qubit * 7) % 5 for qubit in range(num_qubits)}
+
+    expected = update_sequence_by_scan(dag, distance_map)
+    # 何ゲートか実行した後の状態からも同じ順序になる
+    for _ in range(3):
+        sequence, first_node = update_sequence(front_layer, distance_map)
+        assert sequence == expected
+        assert first_node.qindices == sequence[0]
+
+        front_layer.remove(first_node)
+        remove_node(dag, dag.get_node(first_node.node_id))
+        expected = update_sequence_by_scan(dag, distance_map)
+
+
+@pytest.mark.parametrize("filename", QASM_FILES)
+def test_heap_scheduler_matches_update_sequence(filename: str):
+    """
+    Test that `HeapScheduler` gives the same sequence as the front-layer scan, also when
+    only a few ion distances change between calls.
+    """
+    dag = load_dag(filename)
+    front_layer = FrontLayer(DependencyDAG.from_dagdependency(dag))
+    scheduler = HeapScheduler(front_layer.dag)
+    rng = random.Random(0)
+    num_qubits = len(dag.qubits)
+    distance_map = {qubit: rng.randint(0, 3) for qubit in range(num_qubits)}
+
+    while len(front_layer) > 0:
+        expected = update_sequence(front_layer, distance_map)
+        assert update_sequence(front_layer, distance_map, scheduler) == expected
+
+        front_layer.remove(expected[1])
+        for qubit in rng.sample(range(num_qubits), 2):
+            distance_map[qubit] = rng.randint(0, 3)
+
+
+def test_is_qasm_file_skips_leading_blank_lines(tmp_path):
+    """
+    Test that `is_qasm_file` accepts files whose header follows blank or comment lines.
+    """
+    for n_qubits in (10, 14):
+        assert is_qasm_file(
+            f"qft_without_swaps/qft_no_swaps_nativegates_quantinuum_tket_{n_qubits}.qasm"
+        )
+    blank = tmp_path / "blank.qasm"
+    blank.write_text("\n// OPENQASM 2.0;\n")
+    assert not is_qasm_file(str(blank))
+    assert not is_qasm_file(str(tmp_path / "missing.qasm"))
+
+
+@pytest.mark.parametrize("filename", QASM_FILES)
+def test_load_dependency_dag(filename: str):
+    """
+    Test that `load_dependency_dag` matches converting the qiskit DAGDependency.
+    """
+    got = load_dependency_dag(filename)
+    expected = DependencyDAG.from_dagdependency(load_dag(filename))
+    assert got.successors == expected.successors
+    assert [(node.name, node.qindices) for node in got.nodes] == [
+        (node.name, node.qindices) for node in expected.nodes
+    ]
+
+
+def test_load_dependency_dag_drops_final_measurements():
+    """
+    Test that final barriers and measurements do not end up as gates without qubits.
+    """
+    filename = "qft_without_swaps/qft_no_swaps_nativegates_quantinuum_tket_10.qasm"
+    dag = load_dependency_dag(filename)
+    assert all(node.qindices for node in dag.nodes)
+    assert {node.name for node in dag.nodes} == {"rx", "rz", "rzz"}
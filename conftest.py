@@ -1,7 +1,7 @@
 import pytest
-import networkx as nx
 from graph_basics import GraphCreator
 from graph_utils import create_idc_dictionary
+from occupancy import Occupancy
 
 
 @pytest.fixture
@@ -12,10 +12,10 @@ def graph3311():
     graph_creator = GraphCreator(3, 3, 1, 1)
     G = graph_creator.get_graph()
     G.idc_dict = create_idc_dictionary(G)
-    nx.set_edge_attributes(G, {edge: [] for edge in G.edges}, "ions")
+    G.occupancy = Occupancy(G)
 
-    G.edges[((0, 0), (0, 1))]["ions"] = [0]
-    G.edges[((0, 1), (1, 1))]["ions"] = [1]
+    G.occupancy.place(0, ((0, 0), (0, 1)))
+    G.occupancy.place(1, ((0, 1), (1, 1)))
 
     return graph_creator
 
@@ -28,12 +28,12 @@ def graph3322():
     graph_creator = GraphCreator(3, 3, 2, 2)
     G = graph_creator.get_graph()
     G.idc_dict = create_idc_dictionary(G)
-    nx.set_edge_attributes(G, {edge: [] for edge in G.edges}, "ions")
+    G.occupancy = Occupancy(G)
 
-    G.edges[((0, 1), (0, 2))]["ions"] = [0]
-    G.edges[((0, 2), (1, 2))]["ions"] = [1]
-    G.edges[((1, 2), (2, 2))]["ions"] = [2]
-    G.edges[((2, 2), (3, 2))]["ions"] = [3]
+    G.occupancy.place(0, ((0, 1), (0, 2)))
+    G.occupancy.place(1, ((0, 2), (1, 2)))
+    G.occupancy.place(2, ((1, 2), (2, 2)))
+    G.occupancy.place(3, ((2, 2), (3, 2)))
 
     return graph_creator
 
@@ -46,7 +46,7 @@ def graph2233():
     graph_creator = GraphCreator(2, 2, 3, 3)
     G = graph_creator.get_graph()
     G.idc_dict = create_idc_dictionary(G)
-    nx.set_edge_attributes(G, {edge: [] for edge in G.edges}, "ions")
+    G.occupancy = Occupancy(G)
 
     return graph_creator
 
@@ -59,11 +59,11 @@ def graph3333_sp():
     graph_creator = GraphCreator(3, 3, 3, 3)
     G = graph_creator.get_graph()
     G.idc_dict = create_idc_dictionary(G)
-    nx.set_edge_attributes(G, {edge: [] for edge in G.edges}, "ions")
+    G.occupancy = Occupancy(G)
 
-    G.edges[((0, 1), (0, 2))]["ions"] = [0]
-    G.edges[((0, 2), (1, 2))]["ions"] = [1]
-    G.edges[((1, 2), (2, 2))]["ions"] = [2]
-    G.edges[((2, 2), (3, 2))]["ions"] = [3]
+    G.occupancy.place(0, ((0, 1), (0, 2)))
+    G.occupancy.place(1, ((0, 2), (1, 2)))
+    G.occupancy.place(2, ((1, 2), (2, 2)))
+    G.occupancy.place(3, ((2, 2), (3, 2)))
 
     return graph_creator
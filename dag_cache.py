@@ -0,0 +1,88 @@
+import hashlib
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+from compilation import DependencyDAG
+
+# 保存形式やコンパイル手順 (load_dependency_dag) を変えたら上げる。古いエントリは読まれなくなり、LRU で消える
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / ".dag_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class DagCache:
+    """
+    QASM ファイルから作った DependencyDAG をディスクに保存しておくキャッシュ。
+
+    キーはファイルの内容の sha256 なので、ファイルが変われば別のエントリになる。
+    読み込んだエントリは mtime を更新し、合計サイズが max_bytes を超えたら mtime の古い順に消す (LRU)。
+    書き込みは一時ファイルからの置き換えなので、複数のプロセスから同時に使ってもよい。
+    """
+
+    def __init__(
+        self,
+        directory: str | Path = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, filename: str) -> Path:
+        with open(filename, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        return self.directory / f"{digest}.v{CACHE_VERSION}.pickle"
+
+    def get(self, filename: str) -> DependencyDAG | None:
+        path = self.path_for(filename)
+        try:
+            with path.open("rb") as f:
+                names, qindices, successors = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return DependencyDAG.from_gates(names, qindices, successors)
+
+    def put(self, filename: str, dag: DependencyDAG) -> None:
+        path = self.path_for(filename)
+        entry = (
+            [node.name for node in dag.nodes],
+            [tuple(node.qindices) for node in dag.nodes],
+            dag.successors,
+        )
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        合計サイズが max_bytes 以下になるまで、最後に使われたのが古いエントリから消す
+        """
+        entries = []
+        for path in self.directory.glob("*.pickle"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self) -> None:
+        for path in self.directory.glob("*.pickle"):
+            path.unlink(missing_ok=True)
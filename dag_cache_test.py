@@ -0,0 +1,82 @@
+import os
+import shutil
+
+import compilation
+from compilation import load_dependency_dag
+from dag_cache import DagCache
+
+QASM_FILE = "full_register_access/full_register_access_8.qasm"
+
+
+def assert_same_dag(got, expected):
+    assert [(node.node_id, node.name, node.qindices) for node in got.nodes] == [
+        (node.node_id, node.name, node.qindices) for node in expected.nodes
+    ]
+    assert list(got.successors) == list(expected.successors)
+    assert got.in_degree == expected.in_degree
+
+
+def test_dag_cache_round_trip_skips_parsing(tmp_path, monkeypatch):
+    """
+    Test that a cached DAG is loaded without parsing the QASM file again.
+    """
+    cache = DagCache(tmp_path / "cache")
+    assert cache.get(QASM_FILE) is None
+    expected = load_dependency_dag(QASM_FILE, cache)
+
+    def fail(*_):
+        raise AssertionError("the QASM file should not be parsed")
+
+    monkeypatch.setattr(compilation, "read_qasm_gates", fail)
+    monkeypatch.setattr(compilation, "qiskit_dependency_dag", fail)
+    assert_same_dag(load_dependency_dag(QASM_FILE, cache), expected)
+
+
+def test_dag_cache_invalidated_by_file_change(tmp_path):
+    """
+    Test that changing the QASM file misses the cache instead of returning the old DAG.
+    """
+    cache = DagCache(tmp_path / "cache")
+    filename = str(tmp_path / "circuit.qasm")
+    shutil.copy(QASM_FILE, filename)
+    before = load_dependency_dag(filename, cache)
+
+    with open(filename, "a") as f:
+        f.write("rz(0.5*pi) q[0];\n")
+    assert cache.get(filename) is None
+    after = load_dependency_dag(filename, cache)
+    assert len(after) == len(before) + 1
+
+
+def test_dag_cache_evicts_least_recently_used(tmp_path):
+    """
+    Test that the cache stays under its size cap by dropping the least recently used entries.
+    """
+    files = []
+    for n_qubits in (5, 6, 8):
+        files.append(f"full_register_access/full_register_access_{n_qubits}.qasm")
+    cache = DagCache(tmp_path / "cache", max_bytes=10**9)
+    for age, filename in enumerate(files):
+        load_dependency_dag(filename, cache)
+        os.utime(cache.path_for(filename), (1000 + age, 1000 + age))
+
+    # 一番古いものを読むと、最近使ったことになる
+    assert cache.get(files[0]) is not None
+    sizes = {f: cache.path_for(f).stat().st_size for f in files}
+    cache.max_bytes = sizes[files[0]] + sizes[files[2]]
+    cache.evict()
+
+    assert cache.get(files[1]) is None
+    assert cache.get(files[0]) is not None
+    assert cache.get(files[2]) is not None
+
+
+def test_dag_cache_ignores_corrupt_entries(tmp_path):
+    """
+    Test that an unreadable entry is treated as a miss.
+    """
+    cache = DagCache(tmp_path / "cache")
+    cache.path_for(QASM_FILE).write_bytes(b"not a pickle")
+    assert cache.get(QASM_FILE) is None
+    load_dependency_dag(QASM_FILE, cache)
+    assert cache.get(QASM_FILE) is not None
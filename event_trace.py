@@ -0,0 +1,297 @@
+import json
+import mmap
+import struct
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+# 索引の1件: (タイムステップ, そのタイムステップの最初のイベントのバイト位置)
+INDEX_RECORD = struct.Struct("<qQ")
+
+
+def index_path(path: str | Path) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + ".idx")
+
+
+def format_console(event: dict) -> str | None:
+    """
+    コンソールに書く文 (以前 print していたものと同じ)。書かないイベントは None
+    """
+    kind = event["event"]
+    if kind == "gate":
+        return (
+            f"time step: {event['t']}, execution of gate "
+            f"({event['gate']}/{event['num_gates']}) on qubit(s) {event['qubits']}"
+        )
+    if kind == "rollback":
+        return f"rollback {event['reason']}"
+    if kind == "warning":
+        return event["message"]
+    return None
+
+
+def apply_move(edge_ions: list[list[int]], event: dict) -> None:
+    """
+    move イベントを配置 (エッジ番号ごとのイオンのリスト) に当てはめる。
+    index のない移動は移動先の末尾に、ある移動 (ロールバック) はその位置に置く
+    """
+    edge_ions[event["source"]].remove(event["ion"])
+    index = event.get("index")
+    if index is None:
+        edge_ions[event["target"]].append(event["ion"])
+    else:
+        edge_ions[event["target"]].insert(index, event["ion"])
+
+
+class ConsoleSink:
+    """
+    ゲートの実行、ロールバック、警告を標準出力に書く。
+
+    max_lines_per_second を渡すと、1秒あたりそれを超えた行は書かずに数え、
+    次の1秒の最初 (と close) に書かなかった行数を書く
+    """
+
+    kinds = {"gate", "rollback", "warning"}
+
+    def __init__(self, max_lines_per_second: int | None = None):
+        self.max_lines_per_second = max_lines_per_second
+        self.window_start = 0.0
+        self.lines_in_window = 0
+        self.suppressed = 0
+
+    def write(self, event: dict) -> None:
+        line = format_console(event)
+        if self.max_lines_per_second is not None:
+            now = time.monotonic()
+            if now - self.window_start >= 1.0:
+                self.report_suppressed()
+                self.window_start = now
+                self.lines_in_window = 0
+            if self.lines_in_window >= self.max_lines_per_second:
+                self.suppressed += 1
+                return
+            self.lines_in_window += 1
+        print(line)
+
+    def report_suppressed(self) -> None:
+        if self.suppressed:
+            print(f"... {self.suppressed} lines suppressed")
+            self.suppressed = 0
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.report_suppressed()
+
+
+class TraceWriter:
+    """
+    すべてのイベントを JSONL で path に書く (バッファしてまとめて書く)。
+
+    タイムステップが進むたびに、その最初のイベントのバイト位置を path.idx に (timestep, offset) の
+    固定長レコードで追記するので、TraceReader は途中のタイムステップだけを読める
+    """
+
+    kinds = None
+
+    def __init__(self, path: str | Path, buffer_size: int = 1 << 20):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = self.path.open("wb", buffering=buffer_size)
+        self.index_file = index_path(self.path).open("wb")
+        self.offset = 0
+        self.last_timestep: int | None = None
+
+    def write(self, event: dict) -> None:
+        timestep = event["t"]
+        if self.last_timestep is None or timestep > self.last_timestep:
+            self.index_file.write(INDEX_RECORD.pack(timestep, self.offset))
+            self.last_timestep = timestep
+        line = json.dumps(event, separators=(",", ":")).encode() + b"\n"
+        self.file.write(line)
+        self.offset += len(line)
+
+    def flush(self) -> None:
+        # 索引が指す位置は必ずファイルに書かれているように、トレースを先に書き出す
+        self.file.flush()
+        self.index_file.flush()
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+            self.index_file.close()
+
+
+class EventTrace:
+    """
+    シミュレーションのイベント (イオンの移動、押し出し、パーキングエッジからの追い出し、ゲートの実行、
+    ロールバック、警告) を sink に渡す。
+
+    イベントは {"t": タイムステップ, "event": 種類, ...} の辞書で、t は run_simulation が timestep に設定した値。
+    どの sink も受け取らない種類のイベントは emit がすぐ戻るので、呼び出し側は辞書を作る前に
+    wants で確かめなくてよい (引数の計算が重いときだけ確かめる)。
+
+    既定では ConsoleSink だけがあり、標準出力には以前の print と同じ文が出る
+    """
+
+    def __init__(self):
+        self.timestep = 0
+        self.sinks: list = []
+        self.console: ConsoleSink | None = None
+        self.kinds: set[str] = set()
+        self.all_kinds = False
+
+    def _update_kinds(self) -> None:
+        self.all_kinds = any(sink.kinds is None for sink in self.sinks)
+        self.kinds = set().union(
+            *(sink.kinds for sink in self.sinks if sink.kinds is not None)
+        )
+
+    def add_sink(self, sink) -> None:
+        self.sinks.append(sink)
+        self._update_kinds()
+
+    def remove_sink(self, sink) -> None:
+        sink.close()
+        self.sinks.remove(sink)
+        self._update_kinds()
+
+    def set_console(
+        self, enabled: bool = True, max_lines_per_second: int | None = None
+    ) -> None:
+        """
+        コンソールへの出力を切り替える (enabled=False で何も書かない)
+        """
+        if self.console is not None:
+            self.remove_sink(self.console)
+            self.console = None
+        if enabled:
+            self.console = ConsoleSink(max_lines_per_second)
+            self.add_sink(self.console)
+
+    @contextmanager
+    def muted(self):
+        """
+        with の中ではコンソールに何も書かない (出力を捨てるワーカー用)
+        """
+        console = self.console
+        if console is not None:
+            self.sinks.remove(console)
+            self._update_kinds()
+        try:
+            yield
+        finally:
+            if console is not None:
+                self.sinks.append(console)
+                self._update_kinds()
+
+    def open(self, path: str | Path) -> TraceWriter:
+        """
+        path へのトレースの書き出しを始める (close か remove_sink で閉じる)
+        """
+        writer = TraceWriter(path)
+        self.add_sink(writer)
+        return writer
+
+    def close(self) -> None:
+        """
+        コンソール以外の sink を閉じて外す
+        """
+        for sink in list(self.sinks):
+            if sink is not self.console:
+                self.remove_sink(sink)
+        if self.console is not None:
+            self.console.close()
+
+    def wants(self, kind: str) -> bool:
+        return self.all_kinds or kind in self.kinds
+
+    def emit(self, kind: str, **data) -> None:
+        if not (self.all_kinds or kind in self.kinds):
+            return
+        event = {"t": self.timestep, "event": kind, **data}
+        for sink in self.sinks:
+            if sink.kinds is None or kind in sink.kinds:
+                sink.write(event)
+
+    def warning(self, message: str) -> None:
+        self.emit("warning", message=message)
+
+    def flush(self) -> None:
+        for sink in self.sinks:
+            sink.flush()
+
+
+class TraceReader:
+    """
+    TraceWriter が書いたトレースをメモリマップして読む。
+    索引で探すので、あるタイムステップのイベントを読むのにファイル全体を読む必要はない
+
+        with TraceReader("trace.jsonl") as reader:
+            for event in reader.events(start=100, stop=200):
+                ...
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.file = self.path.open("rb")
+        size = self.path.stat().st_size
+        self.data = (
+            mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        )
+        raw = index_path(self.path).read_bytes()
+        # 書きかけで止まった場合は、ファイルに書かれた位置までの索引だけを使う
+        records = [
+            record
+            for record in INDEX_RECORD.iter_unpack(
+                raw[: len(raw) - len(raw) % INDEX_RECORD.size]
+            )
+            if record[1] <= size
+        ]
+        self.timesteps = [timestep for timestep, _ in records]
+        self.offsets = [offset for _, offset in records]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def _parse(self, start: int, end: int):
+        for line in self.data[start:end].splitlines():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # 書きかけの最後の行
+                return
+
+    def events(self, start: int | None = None, stop: int | None = None):
+        """
+        start <= t < stop のイベントを書いた順に返す (None は端まで)
+        """
+        first = 0 if start is None else bisect_left(self.timesteps, start)
+        last = (
+            len(self.timesteps) if stop is None else bisect_left(self.timesteps, stop)
+        )
+        if first >= last:
+            return
+        begin = self.offsets[first]
+        end = self.offsets[last] if last < len(self.offsets) else len(self.data)
+        yield from self._parse(begin, end)
+
+    def events_at(self, timestep: int) -> list[dict]:
+        return list(self.events(timestep, timestep + 1))
+
+
+# モジュール全体で共有するインスタンス
+trace = EventTrace()
+trace.set_console()
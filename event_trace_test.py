@@ -0,0 +1,88 @@
+from event_trace import ConsoleSink, EventTrace, TraceReader, apply_move, trace
+from main import load_config, run_simulation, setup_simulation
+
+CONFIG_FILE = "cases/qft_5_no_swap.json"
+
+
+def test_trace_replays_to_final_placement(tmp_path, capsys):
+    """
+    Test that the start event and the move events (including rolled back ones)
+    rebuild the placement at the end of the run, and that the console output
+    still has one line per executed gate.
+    """
+    simulation = setup_simulation(load_config(CONFIG_FILE))
+    G = simulation[0]
+    init_seq_len = simulation[6]
+    trace.open(tmp_path / "trace.jsonl")
+    try:
+        timestep = run_simulation(*simulation)
+    finally:
+        trace.close()
+    output = capsys.readouterr().out
+
+    with TraceReader(tmp_path / "trace.jsonl") as reader:
+        events = list(reader.events())
+    assert events[0]["event"] == "start"
+    assert events[-1] == {"t": timestep, "event": "end", "remaining_gates": 0}
+    assert [event["t"] for event in events] == sorted(event["t"] for event in events)
+
+    edge_ions = [list(ions) for ions in events[0]["edge_ions"]]
+    for event in events:
+        if event["event"] == "move":
+            apply_move(edge_ions, event)
+    assert edge_ions == G.occupancy.edge_ions
+
+    gates = [event for event in events if event["event"] == "gate"]
+    assert [event["gate"] for event in gates] == list(range(1, init_seq_len + 1))
+    assert output.count("execution of gate") == init_seq_len
+    rollbacks = sum(event["event"] == "rollback" for event in events)
+    assert output.count("rollback") == rollbacks
+
+
+def test_reader_seeks_by_timestep(tmp_path):
+    """
+    Test that the index finds the events of a timestep, including timesteps that
+    only appear in the middle of the file.
+    """
+    event_trace = EventTrace()
+    event_trace.open(tmp_path / "trace.jsonl")
+    for timestep, ion in [(0, 0), (0, 1), (3, 2), (5, 3), (5, 4), (9, 5)]:
+        event_trace.timestep = timestep
+        event_trace.emit("eviction", ion=ion)
+    event_trace.close()
+
+    with TraceReader(tmp_path / "trace.jsonl") as reader:
+        assert reader.timesteps == [0, 3, 5, 9]
+        assert [event["ion"] for event in reader.events_at(5)] == [3, 4]
+        assert reader.events_at(4) == []
+        assert [event["ion"] for event in reader.events(start=1, stop=9)] == [2, 3, 4]
+        assert [event["ion"] for event in reader.events(start=4)] == [3, 4, 5]
+
+
+def test_console_rate_limit(capsys):
+    """
+    Test that lines over the limit are counted instead of printed.
+    """
+    sink = ConsoleSink(max_lines_per_second=2)
+    for ion in range(5):
+        sink.write({"t": 0, "event": "warning", "message": f"warning {ion}"})
+    sink.close()
+    assert capsys.readouterr().out.splitlines() == [
+        "warning 0",
+        "warning 1",
+        "... 3 lines suppressed",
+    ]
+
+
+def test_muted_skips_console(capsys):
+    """
+    Test that nothing reaches the console inside muted(), and that events no sink
+    wants are dropped.
+    """
+    event_trace = EventTrace()
+    event_trace.set_console()
+    assert not event_trace.wants("move")
+    with event_trace.muted():
+        event_trace.warning("hidden")
+    event_trace.warning("shown")
+    assert capsys.readouterr().out == "shown\n"
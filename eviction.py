@@ -0,0 +1,184 @@
+import bisect
+import math
+
+from graph_basics import update_distance_map
+from graph_utils import get_ion_chains
+from processing_zone import find_unnecessary_ion
+
+
+class NextUseIndex:
+    """
+    Positions in the gate sequence where each ion is used, to answer "when is this ion
+    needed next" with a binary search instead of scanning the sequence.
+
+    Built in O(len(seq)) whenever the sequence is rescheduled.
+    """
+
+    def __init__(self, seq: list[tuple[int, ...]]):
+        """
+        Args:
+            seq: The gate sequence (qubit indices of each gate) in execution order.
+        """
+        self.seq = seq
+        self.positions: dict[int, list[int]] = {}
+        for position, gate in enumerate(seq):
+            for ion in gate:
+                self.positions.setdefault(ion, []).append(position)
+
+    def next_use(self, ion: int, start: int = 0) -> float:
+        """
+        Returns:
+            The first position >= start where ion is used, or math.inf if it is not used again.
+        """
+        positions = self.positions.get(ion)
+        if not positions:
+            return math.inf
+        i = bisect.bisect_left(positions, start)
+        return positions[i] if i < len(positions) else math.inf
+
+    def farthest(self, ions: list[int], start: int = 0) -> int:
+        """
+        Returns:
+            The ion whose next use is farthest (the first one in ions on ties).
+        """
+        return max(ions, key=lambda ion: self.next_use(ion, start))
+
+
+class EvictionPolicy:
+    """
+    Chooses which ion to send back from the parking edge when it holds more than
+    `max_chains_in_parking` ions.
+
+    process_pz calls `on_schedule` after every reschedule, `on_gate` for every executed
+    gate and `choose` when the parking edge overflows.
+    Policies are pickled into checkpoints; `on_schedule` is called again after resuming.
+    """
+
+    name = ""
+
+    def on_schedule(self, seq: list[tuple[int, ...]]) -> None:
+        pass
+
+    def on_gate(self, qindices: list[int], timestep: int) -> None:
+        pass
+
+    def choose(self, G, parking_ions: list[int], move_list: list[int]) -> int:
+        raise NotImplementedError
+
+
+class MoveListOrderPolicy(EvictionPolicy):
+    """
+    The original rule (`find_unnecessary_ion`): an ion that is not in the move list,
+    otherwise the one that appears last in it.
+    """
+
+    name = "move_list"
+
+    def choose(self, G, parking_ions, move_list):
+        return find_unnecessary_ion(parking_ions, move_list)
+
+
+class FarthestNextUsePolicy(EvictionPolicy):
+    """
+    Belady's rule: the ion whose next gate comes last in the current sequence.
+    """
+
+    name = "farthest_next_use"
+
+    def __init__(self):
+        self.index = NextUseIndex([])
+
+    def on_schedule(self, seq):
+        self.index = NextUseIndex(seq)
+
+    def choose(self, G, parking_ions, move_list):
+        return self.index.farthest(parking_ions)
+
+    def __getstate__(self):
+        # 索引は on_schedule で作り直せるので、チェックポイントには入れない
+        state = self.__dict__.copy()
+        del state["index"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.index = NextUseIndex([])
+
+
+class LRUPolicy(EvictionPolicy):
+    """
+    The ion that was used least recently, where entering the parking edge and taking
+    part in a gate both count as a use.
+    """
+
+    name = "lru"
+
+    def __init__(self):
+        self.clock = 0
+        self.last_used: dict[int, int] = {}
+        self.parked: set[int] = set()
+
+    def use(self, ion: int) -> None:
+        self.clock += 1
+        self.last_used[ion] = self.clock
+
+    def on_gate(self, qindices, timestep):
+        for ion in qindices:
+            self.use(ion)
+
+    def choose(self, G, parking_ions, move_list):
+        for ion in parking_ions:
+            if ion not in self.parked:
+                self.use(ion)
+        ion = min(parking_ions, key=lambda ion: self.last_used[ion])
+        self.parked = set(parking_ions)
+        self.parked.discard(ion)
+        return ion
+
+
+class DistanceAwarePolicy(FarthestNextUsePolicy):
+    """
+    Like `FarthestNextUsePolicy`, but a gate whose other ions are still far from the
+    processing zone counts as later: the estimated time until an ion is needed is the
+    position of its next gate plus the largest distance of the gate's other ions to the PZ.
+    """
+
+    name = "distance"
+
+    def choose(self, G, parking_ions, move_list):
+        distance_map = update_distance_map(get_ion_chains(G), G.dist_dict)
+
+        def needed_in(ion: int) -> float:
+            position = self.index.next_use(ion)
+            if position == math.inf:
+                return position
+            gate = self.index.seq[position]
+            return position + max(
+                (distance_map[other] for other in gate if other != ion), default=0
+            )
+
+        return max(parking_ions, key=needed_in)
+
+
+EVICTION_POLICIES = {
+    policy.name: policy
+    for policy in (
+        MoveListOrderPolicy,
+        FarthestNextUsePolicy,
+        LRUPolicy,
+        DistanceAwarePolicy,
+    )
+}
+
+
+def make_eviction_policy(name: str) -> EvictionPolicy:
+    """
+    Args:
+        name: One of EVICTION_POLICIES ("move_list" is the original behaviour).
+
+    Returns:
+        A new policy instance (policies keep state for one run).
+    """
+    if name not in EVICTION_POLICIES:
+        raise ValueError(f"Unknown eviction policy: {name}")
+    return EVICTION_POLICIES[name]()
@@ -0,0 +1,72 @@
+import math
+
+import pytest
+
+from eviction import (
+    EVICTION_POLICIES,
+    NextUseIndex,
+    make_eviction_policy,
+)
+from graph_basics import GraphCreator
+from main import load_config, run_simulation, setup_simulation
+
+
+def test_next_use_index():
+    """
+    Test next-use queries from the start and from a later position.
+    """
+    index = NextUseIndex([(0, 1), (2,), (1,), (0, 2)])
+    assert index.next_use(0) == 0
+    assert index.next_use(0, 1) == 3
+    assert index.next_use(1, 1) == 2
+    assert index.next_use(1, 3) == math.inf
+    assert index.next_use(5) == math.inf
+    assert index.farthest([0, 1, 2]) == 2
+    assert index.farthest([1, 2, 5]) == 5
+
+
+def test_eviction_policies_choose(graph3322: GraphCreator):
+    """
+    Test which parking ion each policy evicts.
+    """
+    G = graph3322.get_graph()
+    G.dist_dict = {edge: 0 for edge in G.edges}
+    G.dist_dict[G.occupancy.edge_of(3)] = 10
+    seq = [(0,), (1, 3), (2,)]
+
+    move_list_policy = make_eviction_policy("move_list")
+    assert move_list_policy.choose(G, [0, 1, 2], [2, 1, 0]) == 0
+    assert move_list_policy.choose(G, [0, 1, 2], [2, 1]) == 0
+
+    farthest = make_eviction_policy("farthest_next_use")
+    farthest.on_schedule(seq)
+    assert farthest.choose(G, [0, 1, 2], []) == 2
+
+    # ion 1 waits for ion 3, which is 10 away from the processing zone
+    distance = make_eviction_policy("distance")
+    distance.on_schedule(seq)
+    assert distance.choose(G, [0, 1, 2], []) == 1
+
+    # entering the parking edge counts as a use, in parking order
+    lru = make_eviction_policy("lru")
+    assert lru.choose(G, [0, 1, 2], []) == 0
+    lru.on_gate([1], 1)
+    assert lru.choose(G, [1, 2, 3], []) == 2
+    lru.on_gate([3], 2)
+    assert lru.choose(G, [1, 3, 0], []) == 1
+
+    with pytest.raises(ValueError):
+        make_eviction_policy("random")
+
+
+@pytest.mark.parametrize("eviction", sorted(EVICTION_POLICIES))
+def test_run_simulation_with_each_eviction_policy(eviction: str, capsys):
+    """
+    Test that every policy runs a small case to completion.
+    """
+    config = load_config("cases/full_register_access_6.json")
+    simulation = setup_simulation(config)
+    front_layer = simulation[4]
+    run_simulation(*simulation, eviction=eviction, max_timesteps=5000)
+    assert len(front_layer) == 0
+    assert "Full Sequence executed" in capsys.readouterr().out
@@ -2,38 +2,119 @@ import networkx as nx
 from itertools import pairwise
 
 
+def edge_weight(u, v, edge_attr_dict) -> float:
+    """
+    経路探索に使うエッジの重み。outbound edge (first_entry_connection) の重みを高くする。
+    """
+    # outbound edge の重みを高くする
+    weight = 1
+    if edge_attr_dict["edge_type"] == "first_entry_connection":
+        weight = 1e8
+
+    # イオンが存在するエッジにペナルティを加算
+    # (有効にすると重みがイオンの配置に依存するので、RoutingTable は使えなくなる)
+    # if "ions" in edge_attr_dict and edge_attr_dict["ions"]:
+    #     weight *= ion_penalty
+
+    return weight
+
+
+def compute_shortest_path(
+    G: nx.Graph, src: tuple[int, int], tar: tuple[int, int]
+) -> list[tuple[tuple[int, int], tuple[int, int]]]:
+    """
+    outbound edgeを避けてsrcからtarまでの最短経路を計算する (ルーティングテーブルを使わない)。
+
+    Args:
+        G (nx.Graph): グラフオブジェクト
+        src (tuple[int, int]): 出発ノード
+        tar (tuple[int, int]): 目的ノード
+
+    Returns:
+        list[tuple[tuple[int, int], tuple[int, int]]]: 最短経路のエッジリスト
+    """
+    node_path = nx.shortest_path(G, src, tar, weight=edge_weight)
+    return list(pairwise(node_path))
+
+
+class RoutingTable:
+    """
+    グラフごとに一度だけ作る、(出発ノード, 目的ノード) から最短経路への表。
+
+    GraphCreator が作るトポロジーはシミュレーション中に変わらず、
+    エッジの重みもイオンの配置に依存しないので、経路は一度計算すれば使い回せる。
+    経路は compute_shortest_path と同じ探索で求めるので、結果は探索し直した場合と一致する。
+    """
+
+    def __init__(self, G: nx.Graph, targets: list[tuple[int, int]] = ()):
+        """
+        Args:
+            G (nx.Graph): グラフオブジェクト
+            targets (list[tuple[int, int]]): 全ノードからの経路を事前に計算しておく目的ノード
+        """
+        self.G = G
+        self.paths: dict[
+            tuple[tuple[int, int], tuple[int, int]],
+            list[tuple[tuple[int, int], tuple[int, int]]],
+        ] = {}
+        for tar in targets:
+            if tar not in G:
+                # グラフにない目的ノードは、実際に引かれたときに探索と同じ例外を出す
+                continue
+            for src in G.nodes:
+                self.get(src, tar)
+
+    def get(
+        self, src: tuple[int, int], tar: tuple[int, int]
+    ) -> list[tuple[tuple[int, int], tuple[int, int]]]:
+        """
+        srcからtarまでの最短経路を返す。事前計算していない組み合わせは初回に計算して保存する。
+        返すリストは表と共有しているので、呼び出し側で変更しないこと。
+        """
+        path = self.paths.get((src, tar))
+        if path is None:
+            path = compute_shortest_path(self.G, src, tar)
+            self.paths[(src, tar)] = path
+        return path
+
+
+def create_routing_table(
+    G: nx.Graph, targets: list[tuple[int, int]] = ()
+) -> RoutingTable:
+    """
+    ルーティングテーブルを作る。G.routing_table に設定すると、
+    get_shortest_path と find_path はテーブルを引くだけになる。
+
+    Args:
+        G (nx.Graph): グラフオブジェクト
+        targets (list[tuple[int, int]]): 全ノードからの経路を事前に計算しておく目的ノード
+    """
+    return RoutingTable(G, targets)
+
+
 def get_shortest_path(
     G: nx.Graph, src: tuple[int, int], tar: tuple[int, int], ion_penalty: float = 10.0
 ) -> list[tuple[tuple[int, int], tuple[int, int]]]:
     """
     outbound edgeを避け、さらにイオンが存在するエッジにペナルティを付けて
     srcからtarまでの最短経路を計算する。
+    G.routing_table があればテーブルを引く。
 
     Args:
         G (nx.Graph): グラフオブジェクト
         src (tuple[int, int]): 出発ノード
         tar (tuple[int, int]): 目的ノード
-        ion_penalty (float): イオンが存在するエッジに加算する重みの倍率
+        ion_penalty (float): イオンが存在するエッジに加算する重みの倍率 (現在は未使用)
 
     Returns:
         list[tuple[tuple[int, int], tuple[int, int]]]: 最短経路のエッジリスト
     """
-
-    def edge_weight(u, v, edge_attr_dict):
-        # outbound edge の重みを高くする
-        weight = 1
-        if edge_attr_dict["edge_type"] == "first_entry_connection":
-            weight = 1e8
-
-        # イオンが存在するエッジにペナルティを加算
-        # if "ions" in edge_attr_dict and edge_attr_dict["ions"]:
-        #     weight *= ion_penalty
-
-        return weight
+    routing_table: RoutingTable | None = getattr(G, "routing_table", None)
+    if routing_table is not None:
+        return routing_table.get(src, tar)
 
     # 最短経路を計算
-    node_path = nx.shortest_path(G, src, tar, weight=edge_weight)
-    return list(pairwise(node_path))
+    return compute_shortest_path(G, src, tar)
 
 
 def find_path(
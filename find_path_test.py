@@ -0,0 +1,45 @@
+import pytest
+
+from graph_basics import GraphCreator
+from find_path import (
+    compute_shortest_path,
+    create_routing_table,
+    find_path,
+    get_shortest_path,
+)
+
+
+@pytest.mark.parametrize("graph_fixture", ["graph3311", "graph3322", "graph2233"])
+def test_routing_table_matches_shortest_path(graph_fixture, request):
+    """
+    Test that the routing table returns the same paths as a fresh search.
+    """
+    graph_creator: GraphCreator = request.getfixturevalue(graph_fixture)
+    G = graph_creator.get_graph()
+    targets = [graph_creator.parking_node, (graph_creator.m - 1, graph_creator.n - 1)]
+    routing_table = create_routing_table(G, targets)
+
+    for tar in targets + [(0, 0)]:
+        if tar not in G:
+            continue
+        for src in G.nodes:
+            assert routing_table.get(src, tar) == compute_shortest_path(G, src, tar)
+
+
+def test_find_path_uses_routing_table(graph3311):
+    """
+    Test that `find_path` gives the same result with and without `G.routing_table`.
+    """
+    G = graph3311.get_graph()
+    edge = ((0, 0), (0, 1))
+    expected = find_path(G, edge, graph3311.parking_node)
+
+    G.routing_table = create_routing_table(G, [graph3311.parking_node])
+    try:
+        assert find_path(G, edge, graph3311.parking_node) == expected
+        assert (
+            get_shortest_path(G, edge[0], graph3311.parking_node)
+            is G.routing_table.paths[(edge[0], graph3311.parking_node)]
+        )
+    finally:
+        del G.routing_table
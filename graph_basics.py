@@ -1,7 +1,7 @@
 import networkx as nx
-import numpy as np
-import matplotlib.pyplot as plt
 import random
+from occupancy import Occupancy
+from graph_utils import SiteEdgeTable, create_common_node_table
 
 
 class GraphCreator:
@@ -33,8 +33,18 @@ class GraphCreator:
         self._remove_vertical_edges(networkx_graph)
         self._remove_horizontal_nodes(networkx_graph)
         self._set_junction_nodes(networkx_graph)
+        # メンバーシップの判定用 (junction_nodes はリストなので判定が O(ジャンクション数) になる)
+        networkx_graph.junction_set = frozenset(networkx_graph.junction_nodes)
+        # PZ へのエッジを足す前 (メモリゾーンだけ) のサイトとエッジの対応表
+        networkx_graph.site_table = SiteEdgeTable(
+            networkx_graph,
+            self.ion_chain_size_vertical,
+            self.ion_chain_size_horizontal,
+        )
         nx.set_edge_attributes(networkx_graph, "trap", "edge_type")
         self._set_processing_zone(networkx_graph)
+        # 隣り合うエッジが共有するノード (トポロジーはこれ以降変わらない)
+        networkx_graph.common_nodes = create_common_node_table(networkx_graph)
 
         return networkx_graph
 
@@ -217,8 +227,9 @@ def create_starting_config(graph: nx.Graph, n_of_chains: int, seed=None):
     number_of_registers = len(starting_traps)
 
     # place ions onto traps (ion0 on starting_trap0)
+    graph.occupancy = Occupancy(graph)
     for ion, idc in enumerate(starting_traps):
-        graph.edges[idc]["ions"] = [ion]
+        graph.occupancy.place(ion, idc)
 
     return number_of_registers
 
@@ -1,5 +1,6 @@
 import networkx as nx
-import copy
+
+from event_trace import trace
 
 
 def sort_edge(
@@ -11,23 +12,45 @@ def sort_edge(
     return tuple(sorted(edge))
 
 
+class IdcDictionary(dict):
+    """
+    エッジのインデックスをキー、エッジのIDCを値とする辞書。
+    逆引き用に idx_from_idc (エッジのIDC → インデックス) も持つ。
+    idx_from_idc は両方の向きのエッジをキーに持つので、向きをそろえずに O(1) で引ける。
+    """
+
+    def __init__(self, idcs: list[tuple[tuple[int, int], tuple[int, int]]] = ()):
+        super().__init__(enumerate(idcs))
+        self.idx_from_idc: dict[tuple[tuple[int, int], tuple[int, int]], int] = {}
+        for idx, idc in self.items():
+            self.idx_from_idc[idc] = idx
+            self.idx_from_idc[(idc[1], idc[0])] = idx
+
+
 # create dictionary to swap from idx to idc and vice versa
 def create_idc_dictionary(
     nx_g: nx.Graph,
-) -> dict[int, tuple[tuple[int, int], tuple[int, int]]]:
+) -> IdcDictionary:
     """
     エッジのインデックスとエッジのIDCを対応させる辞書を生成する関数。
 
     :param nx_g: NetworkXのグラフオブジェクト。
-    :return: エッジのインデックスをキー、エッジのIDCを値とする辞書。
+    :return: エッジのインデックスをキー、エッジのIDCを値とする辞書 (逆引き付き)。
     """
-    edge_dict: dict[int, tuple[tuple[int, int], tuple[int, int]]] = {}
-    for edge_idx, edge_idc in enumerate(nx_g.edges()):
-        edge_dict[edge_idx] = tuple(sorted(edge_idc, key=sum))
+    edge_dict = IdcDictionary(
+        [tuple(sorted(edge_idc, key=sum)) for edge_idc in nx_g.edges()]
+    )
     # print("create_idc_dict", edge_dict)
     return edge_dict
 
 
+def dist_weight(_, __, edge_attr_dict) -> float:
+    """
+    PZまでの距離の計算に使うエッジの重み。first_entry_connection を通る経路には大きなペナルティを付ける。
+    """
+    return (edge_attr_dict["edge_type"] == "first_entry_connection") * 1e8 + 1
+
+
 def create_dist_dict(
     G: nx.Graph,
     exit_node: tuple[int, int],
@@ -36,75 +59,46 @@ def create_dist_dict(
     """
     Calculate and create a dictionary of distances from each edge to the processing zone.
 
+    The graph is undirected and the weights are symmetric, so a single Dijkstra search
+    from the processing zone gives the distance of every node to it.
+
     Args:
-    - graph (networkx.Graph): The graph representing the memory grid.
-    - idc_dict (dict): Dictionary mapping edge indices to edge identifiers.
-    - graph_creator (GraphCreator): Object that contains the graph and its relevant attributes.
+    - G (networkx.Graph): The graph representing the memory grid.
+    - exit_node (tuple): The exit node of the memory grid (unused).
+    - processing_zone (tuple): The processing zone node.
 
     Returns:
-    - dist_dict (dict): Dictionary with edge indices as keys and distances to processing zone as values.
+    - dist_dict (dict): Dictionary with edges as keys and distances to processing zone as values.
     """
-    # G_without_parking = G.copy()
-    # G_without_parking.remove_node(processing_zone)
+    node_dist = nx.single_source_dijkstra_path_length(
+        G, processing_zone, weight=dist_weight
+    )
 
     dist_dict: dict[tuple[tuple[int, int], tuple[int, int]], int] = {}
-    for e in G.edges(data=True):
-        edge = tuple([e[0], e[1]])
-        # data = e[2]
-        # if data["edge_type"] != "trap":
-        #     dist_dict[edge] = 0
-        #     continue
-
-        path_length_from_node1 = nx.shortest_path_length(
-            G,
-            source=edge[0],
-            target=processing_zone,
-            weight=lambda _, __, edge_attr_dict: (
-                edge_attr_dict["edge_type"] == "first_entry_connection"
-            )
-            * 1e8
-            + 1,
-        )
-        # node_path = nx.shortest_path(
-        #     nx_g,
-        #     src,
-        #     tar,
-        #     lambda _, __, edge_attr_dict: (edge_attr_dict["edge_type"] == "first_entry_connection") * 1e8 + 1,
-        # )
-        path_length_from_node2 = nx.shortest_path_length(
-            G,
-            source=edge[1],
-            target=processing_zone,
-            weight=lambda _, __, edge_attr_dict: (
-                edge_attr_dict["edge_type"] == "first_entry_connection"
-            )
-            * 1e8
-            + 1,
+    for edge_start, edge_end in G.edges():
+        dist_dict[(edge_start, edge_end)] = min(
+            node_dist[edge_start], node_dist[edge_end]
         )
-        distance_to_pz = min(path_length_from_node1, path_length_from_node2)
-
-        dist_dict[edge] = distance_to_pz
 
     return dist_dict
 
 
 def get_idx_from_idc(
-    edge_dictionary: dict[int, tuple[tuple[int, int], tuple[int, int]]],
+    edge_dictionary: IdcDictionary,
     idc: tuple[tuple[int, int], tuple[int, int]],
 ) -> int:
     """
     エッジのIDCからエッジのインデックスを取得する関数。
 
-    :param edge_dictionary: エッジのインデックスとエッジのIDCを対応させる辞書。
-    :param idc: エッジのIDC。
+    :param edge_dictionary: create_idc_dictionary で生成した辞書。
+    :param idc: エッジのIDC (どちらの向きでもよい)。
     :return: エッジのインデックス。
     """
-    idc = tuple(sorted(idc, key=sum))
-    return list(edge_dictionary.values()).index(idc)
+    return edge_dictionary.idx_from_idc[idc]
 
 
 def get_idc_from_idx(
-    edge_dictionary: dict[int, tuple[tuple[int, int], tuple[int, int]]], idx: int
+    edge_dictionary: IdcDictionary, idx: int
 ) -> tuple[tuple[int, int], tuple[int, int]]:
     """
     エッジのインデックスからエッジのIDCを取得する関数。
@@ -122,21 +116,60 @@ def get_ion_chains(
     """
     グラフ内の各イオンが存在するエッジを示す辞書を生成する関数。
 
-    :param graph: NetworkXのグラフオブジェクト。
+    :param graph: NetworkXのグラフオブジェクト (graph.occupancy にイオン配置を持つ)。
     :return: イオンのインデックスをキー、エッジを値とする辞書。
     """
-    ion_chains = {}
-    sorted_ion_chains = {}
+    return graph.occupancy.ion_chains()
 
-    # 各エッジを走査し、イオンが存在するエッジを辞書に追加
-    for edge_start, edge_end, data in graph.edges(data=True):
-        # print("get_ion_chains", (edge_start, edge_end), data)
-        if "ions" in data:
-            for ion in data["ions"]:
-                ion_chains[ion] = (edge_start, edge_end)
 
-    sorted_ion_chains = dict(sorted(ion_chains.items()))
-    return sorted_ion_chains
+def get_ion_edge(graph: nx.Graph, ion: int) -> tuple[tuple[int, int], tuple[int, int]]:
+    """
+    イオンが存在するエッジを O(1) で返す関数。
+
+    :param graph: NetworkXのグラフオブジェクト。
+    :param ion: イオンのインデックス。
+    :return: イオンが存在するエッジ。
+    """
+    return graph.occupancy.edge_of(ion)
+
+
+def check_ion_chains(graph: nx.Graph) -> None:
+    """
+    イオン→エッジの索引がエッジ上のイオン配置と一致しているか確認する関数 (デバッグ用)。
+    全エッジを走査するので、シミュレーション中は debug モードでのみ呼ぶ。
+
+    :param graph: NetworkXのグラフオブジェクト。
+    :raises AssertionError: 索引とイオン配置が一致しない場合。
+    """
+    graph.occupancy.check()
+
+
+class SiteEdgeTable:
+    """
+    メモリゾーンのサイト→エッジとエッジ→サイトの対応表。
+    GraphCreator がグラフを作るときに1回だけ作り (G.site_table)、get_edge_from_site と
+    get_sites_from_edge はこの表を引くだけで済む。どちらの向きのサイト・エッジでも引ける
+    """
+
+    def __init__(self, G: nx.Graph, vertical_size: int, horizontal_size: int):
+        """
+        :param G: メモリゾーンだけのグラフ (junction_set が必要)
+        :param vertical_size: 縦方向のエッジのサイズ
+        :param horizontal_size: 横方向のエッジのサイズ
+        """
+        self.sizes = (vertical_size, horizontal_size)
+        self.edge_from_site: dict = {}
+        self.sites_from_edge: dict = {}
+        for site in G.edges():
+            for oriented in (site, site[::-1]):
+                self.edge_from_site[oriented] = _edge_from_site(
+                    G.junction_set, oriented, vertical_size, horizontal_size
+                )
+        for edge in set(self.edge_from_site.values()):
+            for oriented in (edge, edge[::-1]):
+                self.sites_from_edge[oriented] = tuple(
+                    _sites_from_edge(G, oriented, vertical_size, horizontal_size)
+                )
 
 
 def get_edge_from_site(
@@ -147,6 +180,7 @@ def get_edge_from_site(
 ) -> tuple[tuple[int, int], tuple[int, int]]:
     """
     与えられたサイトが属するエッジを返す関数。
+    G.site_table にあれば O(1) で引き、なければ計算する。
 
     :param G: グラフオブジェクト
     :param site: サイト (tuple of two nodes)
@@ -154,17 +188,28 @@ def get_edge_from_site(
     :param horizontal_size: 横方向のエッジのサイズ
     :return: サイトが属するエッジ (tuple of two nodes)
     """
+    table: SiteEdgeTable | None = getattr(G, "site_table", None)
+    if table is not None and table.sizes == (vertical_size, horizontal_size):
+        edge = table.edge_from_site.get(site)
+        if edge is not None:
+            return edge
+    return _edge_from_site(G.junction_set, site, vertical_size, horizontal_size)
 
-    junction_nodes: list[tuple[int, int]] = G.junction_nodes
 
+def _edge_from_site(
+    junction_set: frozenset[tuple[int, int]],
+    site: tuple[tuple[int, int], tuple[int, int]],
+    vertical_size: int,
+    horizontal_size: int,
+) -> tuple[tuple[int, int], tuple[int, int]]:
     node1, node2 = site
 
-    if node1 in junction_nodes and node2 in junction_nodes:
+    if node1 in junction_set and node2 in junction_set:
         # siteが1のとき
         return site
-    elif node1 in junction_nodes or node2 in junction_nodes:
+    elif node1 in junction_set or node2 in junction_set:
         # a site touches a junciton
-        if node1 in junction_nodes:
+        if node1 in junction_set:
             # node1 is junction
             junction_node = node1
             other_node = node2
@@ -208,14 +253,14 @@ def get_edge_from_site(
             candidates = [
                 (y, x1) for y in range(y1 - vertical_size, y1 + vertical_size + 1)
             ]
-            junctions_in_range = [node for node in candidates if node in junction_nodes]
+            junctions_in_range = [node for node in candidates if node in junction_set]
             assert len(junctions_in_range) == 2
             return tuple(junctions_in_range)
         elif y1 == y2:  # 横方向のエッジ
             candidates = [
                 (y1, x) for x in range(x1 - horizontal_size, x1 + horizontal_size + 1)
             ]
-            junctions_in_range = [node for node in candidates if node in junction_nodes]
+            junctions_in_range = [node for node in candidates if node in junction_set]
             assert len(junctions_in_range) == 2
             return tuple(junctions_in_range)
         else:
@@ -230,6 +275,7 @@ def get_sites_from_edge(
 ) -> list[tuple[tuple[int, int], tuple[int, int]]]:
     """
     エッジからそのエッジに含まれるサイトを取得する関数。
+    G.site_table にあれば O(1) で引き、なければ計算する。
 
     :param G: グラフオブジェクト
     :param edge: エッジ (tuple of two nodes)
@@ -237,6 +283,20 @@ def get_sites_from_edge(
     :param horizontal_size: 横方向のエッジのサイズ
     :return: エッジに含まれるサイトのリスト [tuple of two nodes, tuple of two nodes, ...]
     """
+    table: SiteEdgeTable | None = getattr(G, "site_table", None)
+    if table is not None and table.sizes == (vertical_size, horizontal_size):
+        sites = table.sites_from_edge.get(edge)
+        if sites is not None:
+            return list(sites)
+    return _sites_from_edge(G, edge, vertical_size, horizontal_size)
+
+
+def _sites_from_edge(
+    G: nx.Graph,
+    edge: tuple[tuple[int, int], tuple[int, int]],
+    vertical_size: int,
+    horizontal_size: int,
+) -> list[tuple[tuple[int, int], tuple[int, int]]]:
     start_node, end_node = edge
     y1, x1 = start_node
     y2, x2 = end_node
@@ -268,28 +328,197 @@ def move_ion(
     current_edge: tuple[tuple[int, int], tuple[int, int]],
     new_edge: tuple[tuple[int, int], tuple[int, int]],
 ):
-    if ion in G.edges[current_edge]["ions"]:
-        G.edges[current_edge]["ions"].remove(ion)
-        G.edges[new_edge]["ions"].append(ion)
-    else:
-        print(f"Ion {ion} not found on edge {current_edge}")
+    if not G.occupancy.move(ion, current_edge, new_edge):
+        trace.warning(f"Ion {ion} not found on edge {current_edge}")
+    elif trace.wants("move"):
+        trace.emit(
+            "move",
+            ion=ion,
+            source=G.occupancy.idx(current_edge),
+            target=G.occupancy.idx(new_edge),
+        )
 
 
 # Check the updated ion positions
 # for edge in G.edges:
-#     print(f"Edge {edge} has ions: {G.edges[edge]['ions']}")
+#     print(f"Edge {edge} has ions: {G.occupancy.ions(edge)}")
 # move_ion(G, 1, ((5, 6), (4, 6)), ((3, 6), (4, 6)))
 # move_ion(G, 6, ((5, 6), (6, 6)), ((5, 6), (4, 6)))
 # move_ion(G, 8, ((6, 4), (6, 5)), ((5, 6), (6, 6)))
 
 
-def rollback_graph(G: nx.Graph, snapshot: nx.Graph):
+_MISSING = object()
+
+
+class JunctionReservations(dict):
     """
-    グラフGをスナップショットの状態に復元する
+    1タイムステップの間に使ったノード (ion -> node) の予約表。
+
+    dict として ion -> node を持ち、同時に node -> そのノードを予約しているイオンの数も更新するので、
+    ノードが使われているかどうか (reserved) を used_junctions.values() の走査ではなく O(1) で判定できる。
+    タイムステップの区切りで clear する (両方の辞書を空にするだけ)
     """
-    G.clear()  # 現在のGをクリア
-    G_copy = copy.deepcopy(G)
 
-    # G.add_edges_from(snapshot.edges(data=True))  # エッジをスナップショットから復元
-    # G.add_nodes_from(snapshot.nodes(data=True))  # ノードをスナップショットから復元
-    return G_copy
+    __slots__ = ("node_count",)
+
+    def __init__(self, reservations: dict[int, tuple[int, int]] | None = None):
+        super().__init__()
+        self.node_count: dict[tuple[int, int], int] = {}
+        for ion, node in (reservations or {}).items():
+            self[ion] = node
+
+    def __setitem__(self, ion: int, node: tuple[int, int]) -> None:
+        previous = self.get(ion, _MISSING)
+        if previous is not _MISSING:
+            self._release(previous)
+        super().__setitem__(ion, node)
+        self.node_count[node] = self.node_count.get(node, 0) + 1
+
+    def __delitem__(self, ion: int) -> None:
+        node = self[ion]
+        super().__delitem__(ion)
+        self._release(node)
+
+    def _release(self, node: tuple[int, int]) -> None:
+        count = self.node_count[node] - 1
+        if count:
+            self.node_count[node] = count
+        else:
+            del self.node_count[node]
+
+    def pop(self, ion: int, *default):
+        if ion in self:
+            node = self[ion]
+            del self[ion]
+            return node
+        if default:
+            return default[0]
+        raise KeyError(ion)
+
+    def update(self, *args, **kwargs) -> None:
+        for ion, node in dict(*args, **kwargs).items():
+            self[ion] = node
+
+    def setdefault(self, ion: int, node: tuple[int, int]) -> tuple[int, int]:
+        if ion not in self:
+            self[ion] = node
+        return self[ion]
+
+    def popitem(self):
+        ion, node = super().popitem()
+        self._release(node)
+        return ion, node
+
+    def clear(self) -> None:
+        super().clear()
+        self.node_count.clear()
+
+    def copy(self) -> "JunctionReservations":
+        return JunctionReservations(self)
+
+    def reserved(self, node: tuple[int, int]) -> bool:
+        """
+        node を予約しているイオンがいるか (node in used_junctions.values() と同じ)
+        """
+        return node in self.node_count
+
+
+def create_common_node_table(G: nx.Graph) -> dict:
+    """
+    隣り合う2つのエッジ (どちらの向きでも) -> 共有するノードの表。
+    値はこれまでの next(iter(set(edge1).intersection(set(edge2)))) をそのまま計算したもの
+    """
+    table = {}
+    for node in G.nodes():
+        incident = [(node, other) for other in G.neighbors(node)]
+        incident += [edge[::-1] for edge in incident]
+        for edge1 in incident:
+            for edge2 in incident:
+                table[edge1, edge2] = next(iter(set(edge1).intersection(set(edge2))))
+    return table
+
+
+def get_common_node(
+    G: nx.Graph,
+    edge1: tuple[tuple[int, int], tuple[int, int]],
+    edge2: tuple[tuple[int, int], tuple[int, int]],
+) -> tuple[int, int]:
+    """
+    2つのエッジが共有するノード。G.common_nodes (create_common_node_table) を O(1) で引く
+    """
+    node = G.common_nodes.get((edge1, edge2))
+    if node is None:
+        return next(iter(set(edge1).intersection(set(edge2))))
+    return node
+
+
+class MoveJournal:
+    """
+    move_ion による移動と used_junctions の更新を記録し、失敗した押し出しを取り消すためのログ。
+
+    グラフ全体を deepcopy する代わりに (ion, 移動元, 移動先, 移動元での位置) を記録するので、
+    取り消しは記録した移動の数に比例するコストで済む。
+    """
+
+    def __init__(self, G: nx.Graph, used_junctions: dict[int, tuple[int, int]]):
+        self.G = G
+        self.used_junctions = used_junctions
+        self.entries: list[tuple] = []
+        # 記録中のイオンの移動回数 (押し出しの連鎖の長さ)
+        self.moves = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def move_ion(
+        self,
+        ion: int,
+        current_edge: tuple[tuple[int, int], tuple[int, int]],
+        new_edge: tuple[tuple[int, int], tuple[int, int]],
+    ) -> None:
+        ions = self.G.occupancy.ions(current_edge)
+        if ion in ions:
+            self.entries.append(("move", ion, current_edge, new_edge, ions.index(ion)))
+            self.moves += 1
+        move_ion(self.G, ion, current_edge, new_edge)
+
+    def use_junction(self, ion: int, node: tuple[int, int]) -> None:
+        self.entries.append(("junction", ion, self.used_junctions.get(ion, _MISSING)))
+        self.used_junctions[ion] = node
+
+    def rollback(self) -> None:
+        """
+        記録した変更を新しいものから順に取り消し、ジャーナルを空にする。
+        イオンの並び順も含めて記録前の状態に戻る。
+        """
+        self.moves = 0
+        while self.entries:
+            entry = self.entries.pop()
+            if entry[0] == "move":
+                _, ion, current_edge, new_edge, index = entry
+                self.G.occupancy.ions(new_edge).remove(ion)
+                self.G.occupancy.place(ion, current_edge, index)
+                # 取り消しも移動として記録する (index は戻した位置)
+                if trace.wants("move"):
+                    trace.emit(
+                        "move",
+                        ion=ion,
+                        source=self.G.occupancy.idx(new_edge),
+                        target=self.G.occupancy.idx(current_edge),
+                        index=index,
+                    )
+            else:
+                _, ion, previous = entry
+                if previous is _MISSING:
+                    del self.used_junctions[ion]
+                else:
+                    self.used_junctions[ion] = previous
+
+
+def rollback_graph(G: nx.Graph, journal: MoveJournal) -> nx.Graph:
+    """
+    グラフGを journal に記録した移動の前の状態に復元する
+    """
+    assert journal.G is G, "journal does not belong to this graph"
+    journal.rollback()
+    return G
@@ -6,11 +6,20 @@ from graph_utils import (
     get_edge_from_site,
     get_sites_from_edge,
     get_ion_chains,
+    get_ion_edge,
+    check_ion_chains,
     get_idx_from_idc,
     get_idc_from_idx,
     create_idc_dictionary,
+    create_dist_dict,
+    dist_weight,
     move_ion,
     rollback_graph,
+    MoveJournal,
+    JunctionReservations,
+    get_common_node,
+    _edge_from_site,
+    _sites_from_edge,
 )
 
 
@@ -58,6 +67,9 @@ def test_create_idc_dictionary(
         # 3311
         ("graph3311", ((0, 0), (1, 0)), 0),
         ("graph3311", ((3, 3.0), (4, 3)), 14),
+        # 逆向きのエッジ
+        ("graph3311", ((1, 0), (0, 0)), 0),
+        ("graph3311", ((4, 3), (3, 3.0)), 14),
     ],
 )
 def test_get_idx_from_idc(
@@ -74,6 +86,19 @@ def test_get_idx_from_idc(
     assert get_idx_from_idc(G.idc_dict, idc) == expected_idx
 
 
+@pytest.mark.parametrize("graph_fixture", ["graph3311", "graph3322", "graph2233"])
+def test_idc_dictionary_round_trip(graph_fixture, request):
+    """
+    Test that every edge of the graph round-trips through the index in both directions.
+    """
+    graph_creator: GraphCreator = request.getfixturevalue(graph_fixture)
+    G = graph_creator.get_graph()
+    for idx, edge in enumerate(G.edges()):
+        assert get_idx_from_idc(G.idc_dict, edge) == idx
+        assert get_idx_from_idc(G.idc_dict, (edge[1], edge[0])) == idx
+        assert get_idc_from_idx(G.idc_dict, idx) == tuple(sorted(edge, key=sum))
+
+
 @pytest.mark.parametrize(
     "graph_fixture, idx, expected_idc",
     [
@@ -118,6 +143,68 @@ def test_get_ion_chains(
     assert got == expected_ion_chains
 
 
+@pytest.mark.parametrize(
+    "graph_fixture, ion, current_edge, new_edge, expected_edge",
+    [
+        # 3311
+        ("graph3311", 0, ((0, 0), (0, 1)), ((0, 1), (0, 2)), ((0, 1), (0, 2))),
+        # 逆向きで指定しても G.edges の向きで索引される
+        ("graph3311", 1, ((0, 1), (1, 1)), ((1, 2), (1, 1)), ((1, 1), (1, 2))),
+    ],
+)
+def test_get_ion_edge_after_move_ion(
+    graph_fixture,
+    ion: int,
+    current_edge: tuple[tuple[int, int], tuple[int, int]],
+    new_edge: tuple[tuple[int, int], tuple[int, int]],
+    expected_edge: tuple[tuple[int, int], tuple[int, int]],
+    request,
+):
+    """
+    Test that `move_ion` keeps the index used by `get_ion_edge` up to date.
+    """
+    graph_creator: GraphCreator = request.getfixturevalue(graph_fixture)
+    G = graph_creator.get_graph()
+    assert get_ion_edge(G, ion) == current_edge
+    move_ion(G, ion, current_edge, new_edge)
+    assert get_ion_edge(G, ion) == expected_edge
+    check_ion_chains(G)
+
+
+def test_check_ion_chains_detects_stale_index(graph3311):
+    """
+    Test that `check_ion_chains` fails when ions are moved behind the index's back.
+    """
+    G = graph3311.get_graph()
+    G.occupancy.ions(((0, 0), (0, 1))).remove(0)
+    G.occupancy.ions(((0, 1), (0, 2))).append(0)
+    with pytest.raises(AssertionError):
+        check_ion_chains(G)
+
+
+@pytest.mark.parametrize(
+    "arch", [(3, 3, 1, 1), (4, 2, 1, 1), (2, 2, 1, 5), (3, 3, 2, 2), (5, 5, 1, 1)]
+)
+def test_create_dist_dict(arch):
+    """
+    Test that `create_dist_dict` matches per-edge shortest path lengths to the processing zone.
+    """
+    graph_creator = GraphCreator(*arch)
+    G = graph_creator.get_graph()
+    got = create_dist_dict(G, graph_creator.exit, graph_creator.processing_zone)
+
+    assert list(got) == list(G.edges())
+    for edge, dist in got.items():
+        expected = min(
+            nx.shortest_path_length(
+                G, node, graph_creator.processing_zone, weight=dist_weight
+            )
+            for node in edge
+        )
+        assert dist == expected
+        assert type(dist) is type(expected)
+
+
 @pytest.mark.parametrize(
     "graph_fixture, site, expected_edge",
     [
@@ -184,12 +271,50 @@ def test_get_sites_from_edge(
     assert got == expected_sites
 
 
+@pytest.mark.parametrize(
+    "arch", [[3, 3, 1, 1], [3, 3, 2, 2], [4, 5, 3, 2], [5, 4, 1, 3]]
+)
+def test_site_table_matches_computation(arch):
+    """
+    Test that the precomputed site/edge tables give the same answer as computing
+    the mapping, for both orientations of every memory-zone site and edge.
+    """
+    graph_creator = GraphCreator(*arch)
+    G = graph_creator.get_graph()
+    vertical, horizontal = arch[2], arch[3]
+    assert G.junction_set == set(G.junction_nodes)
+
+    table = G.site_table
+    memory_sites = [
+        site
+        for site in G.edges()
+        if all(
+            y < graph_creator.m_extended and x < graph_creator.n_extended
+            for y, x in site
+        )
+    ]
+    assert len(table.edge_from_site) == 2 * len(memory_sites)
+    for site, edge in table.edge_from_site.items():
+        assert get_edge_from_site(G, site, vertical, horizontal) == edge
+        assert edge == _edge_from_site(G.junction_set, site, vertical, horizontal)
+    for edge, sites in table.sites_from_edge.items():
+        assert get_sites_from_edge(G, edge, vertical, horizontal) == list(sites)
+        assert list(sites) == _sites_from_edge(G, edge, vertical, horizontal)
+        assert all(table.edge_from_site[site] in (edge, edge[::-1]) for site in sites)
+
+    # 返したリストを書き換えても表は変わらない
+    edge = next(iter(table.sites_from_edge))
+    get_sites_from_edge(G, edge, vertical, horizontal).clear()
+    assert table.sites_from_edge[edge]
+
+
 @pytest.mark.parametrize(
     "graph_fixture, graph_fixture_rollback",
     [
         # 3311
         ("graph3311", "graph3311"),
-        ("graph3311", "graph3311"),
+        # 3322
+        ("graph3322", "graph3322"),
     ],
 )
 def test_rollback_graph(graph_fixture, graph_fixture_rollback, request):
@@ -198,19 +323,91 @@ def test_rollback_graph(graph_fixture, graph_fixture_rollback, request):
     """
     graph_creator: GraphCreator = request.getfixturevalue(graph_fixture)
     G = graph_creator.get_graph()
-    move_ion(G, 0, ((0, 0), (0, 1)), ((0, 1), (0, 2)))
-    move_ion(G, 1, ((0, 1), (1, 1)), ((1, 1), (1, 2)))
+    used_junctions = {9: (0, 0)}
+    journal = MoveJournal(G, used_junctions)
+    edges = list(G.edges)
+    for ion, edge in list(get_ion_chains(G).items()):
+        journal.use_junction(ion, edge[1])
+        journal.move_ion(ion, edge, edges[-1])
+    journal.use_junction(9, (1, 1))
+    assert len(journal) > 0
 
     graph_creator_rollback: GraphCreator = request.getfixturevalue(
         graph_fixture_rollback
     )
     G_rollback = graph_creator_rollback.get_graph()
 
-    G = rollback_graph(G, G_rollback)
+    G = rollback_graph(G, journal)
 
-    # assert G == G_rollback
-    print("edges", G.edges)
+    assert len(journal) == 0
+    assert used_junctions == {9: (0, 0)}
     assert G.edges == G_rollback.edges
     assert G.nodes == G_rollback.nodes
     assert G.idc_dict == G_rollback.idc_dict
     assert G.junction_nodes == G_rollback.junction_nodes
+    for edge in G.edges:
+        assert G.occupancy.ions(edge) == G_rollback.occupancy.ions(edge)
+    check_ion_chains(G)
+
+
+def test_move_journal_restores_ion_order(graph3311):
+    """
+    Rolling back a move puts the ion back at its original position on the edge.
+    """
+    G = graph3311.get_graph()
+    edge = ((0, 0), (0, 1))
+    G.occupancy.place(5, edge, 0)
+    G.occupancy.place(6, edge)
+    journal = MoveJournal(G, {})
+    journal.move_ion(0, edge, ((0, 1), (1, 1)))
+    journal.move_ion(5, edge, ((0, 1), (1, 1)))
+    assert G.occupancy.ions(edge) == [6]
+
+    journal.rollback()
+
+    assert G.occupancy.ions(edge) == [5, 0, 6]
+    assert G.occupancy.ions(((0, 1), (1, 1))) == [1]
+    check_ion_chains(G)
+
+
+def test_junction_reservations_track_nodes():
+    """
+    Test that `reserved` follows every way the ion -> node mapping changes,
+    including a journal rollback.
+    """
+    used_junctions = JunctionReservations({0: (1, 1)})
+    used_junctions[1] = (1, 1)
+    used_junctions[0] = (2, 2)
+    assert used_junctions.reserved((1, 1)) and used_junctions.reserved((2, 2))
+    assert used_junctions.pop(1) == (1, 1)
+    assert not used_junctions.reserved((1, 1))
+
+    journal = MoveJournal(GraphCreator(3, 3, 1, 1).get_graph(), used_junctions)
+    journal.use_junction(0, (3, 3))
+    journal.use_junction(2, (2, 2))
+    assert used_junctions.reserved((3, 3)) and used_junctions.reserved((2, 2))
+    journal.rollback()
+    assert used_junctions == {0: (2, 2)}
+    assert used_junctions.node_count == {(2, 2): 1}
+
+    used_junctions.clear()
+    assert not used_junctions.reserved((2, 2))
+    assert set(used_junctions.values()) == set(used_junctions.node_count) == set()
+
+
+@pytest.mark.parametrize("arch", [[3, 3, 1, 1], [3, 3, 2, 2], [4, 5, 3, 2]])
+def test_common_node_table(arch):
+    """
+    Test that the precomputed shared node matches the set intersection it replaces,
+    for both orientations of every pair of adjacent edges.
+    """
+    G = GraphCreator(*arch).get_graph()
+    edges = list(G.edges()) + [edge[::-1] for edge in G.edges()]
+    pairs = 0
+    for edge1 in edges:
+        for edge2 in edges:
+            common = set(edge1).intersection(set(edge2))
+            if common:
+                assert get_common_node(G, edge1, edge2) == next(iter(common))
+                pairs += 1
+    assert pairs == len(G.common_nodes)
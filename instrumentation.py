@@ -0,0 +1,154 @@
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class Instrumentation:
+    """
+    シミュレーションのどこに時間がかかっているかを調べるためのカウンタ、累積タイマー、イベントの記録。
+
+    既定では無効で、無効の間は各メソッドが enabled を見てすぐ戻るだけになる。
+    計測する側は次のように使う (clock も無効なら 0.0 を返すだけ):
+
+        start = stats.clock()
+        path = find_path(...)
+        stats.add_time("routing", start)
+
+    タイマーは呼び出し回数も数える。イベントは max_events 件まで保持し、それ以降は件数だけ数える。
+    """
+
+    __slots__ = (
+        "enabled",
+        "counters",
+        "timers",
+        "calls",
+        "events",
+        "dropped_events",
+        "max_events",
+        "dump_path",
+        "dump_every",
+        "next_dump",
+    )
+
+    def __init__(self):
+        self.enabled = False
+        self.max_events = 100_000
+        self.dump_path: Path | None = None
+        self.dump_every: int | None = None
+        self.reset()
+
+    def reset(self) -> None:
+        self.counters: dict[str, int] = {}
+        self.timers: dict[str, float] = {}
+        self.calls: dict[str, int] = {}
+        self.events: list[dict] = []
+        self.dropped_events = 0
+        self.next_dump = 0
+
+    def enable(
+        self,
+        dump_path: str | Path | None = None,
+        dump_every: int | None = None,
+        max_events: int = 100_000,
+    ) -> None:
+        """
+        計測を有効にし、それまでの記録を消す。
+        dump_path を渡すと、dump_every タイムステップごと (tick) と実行の終わり (finish) にその JSON を書き直す
+        """
+        self.enabled = True
+        self.dump_path = Path(dump_path) if dump_path is not None else None
+        self.dump_every = dump_every
+        self.max_events = max_events
+        self.reset()
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def count(self, name: str, n: int = 1) -> None:
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def clock(self) -> float:
+        return time.perf_counter() if self.enabled else 0.0
+
+    def add_time(self, name: str, start: float) -> None:
+        """
+        clock() で取った start からの経過時間を name のタイマーに足す
+        """
+        if self.enabled:
+            self.timers[name] = self.timers.get(name, 0.0) + (
+                time.perf_counter() - start
+            )
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    @contextmanager
+    def timer(self, name: str):
+        """
+        ホットパス以外で使うタイマー (with stats.timer("plot"): ...)
+        """
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.add_time(name, start)
+
+    def event(self, name: str, **data) -> None:
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + 1
+            if len(self.events) < self.max_events:
+                self.events.append({"event": name, **data})
+            else:
+                self.dropped_events += 1
+
+    def summary(self, include_events: bool = True) -> dict:
+        summary = {
+            "counters": dict(sorted(self.counters.items())),
+            "timers": {
+                name: {"seconds": seconds, "calls": self.calls[name]}
+                for name, seconds in sorted(self.timers.items())
+            },
+        }
+        if include_events:
+            summary["events"] = self.events
+            summary["dropped_events"] = self.dropped_events
+        return summary
+
+    def dump(self, path: str | Path | None = None) -> None:
+        """
+        summary を JSON で書き出す (途中で読まれても壊れないよう、一時ファイルから置き換える)
+        """
+        path = Path(path) if path is not None else self.dump_path
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("w") as f:
+            json.dump(self.summary(), f, indent=2)
+        tmp_path.replace(path)
+
+    def tick(self, timestep: int) -> None:
+        """
+        タイムステップの終わりに呼ぶ。dump_every ごとに dump_path へ書き出す
+        """
+        if self.enabled and self.dump_path is not None and self.dump_every:
+            if timestep >= self.next_dump:
+                self.dump()
+                self.next_dump = (timestep // self.dump_every + 1) * self.dump_every
+
+    def finish(self) -> None:
+        if self.enabled and self.dump_path is not None:
+            self.dump()
+
+    def report(self) -> str:
+        """
+        人が読むための表 (タイマーは時間の長い順)
+        """
+        lines = [f"{'timer':<24}{'seconds':>12}{'calls':>10}"]
+        for name, seconds in sorted(self.timers.items(), key=lambda kv: -kv[1]):
+            lines.append(f"{name:<24}{seconds:>12.4f}{self.calls[name]:>10}")
+        lines.append(f"{'counter':<24}{'count':>12}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:<24}{value:>12}")
+        return "\n".join(lines)
+
+
+# モジュール全体で共有するインスタンス
+stats = Instrumentation()
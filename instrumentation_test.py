@@ -0,0 +1,88 @@
+import json
+
+from instrumentation import Instrumentation
+from main import load_config, run_simulation, setup_simulation
+
+
+def test_disabled_instrumentation_records_nothing():
+    """
+    Test that a disabled `Instrumentation` ignores every call.
+    """
+    stats = Instrumentation()
+    start = stats.clock()
+    stats.add_time("routing", start)
+    stats.count("gates_executed")
+    stats.event("rollback", reason=2)
+    with stats.timer("plot"):
+        pass
+
+    assert start == 0.0
+    assert stats.summary() == {
+        "counters": {},
+        "timers": {},
+        "events": [],
+        "dropped_events": 0,
+    }
+
+
+def test_instrumentation_counts_times_and_caps_events():
+    """
+    Test counters, cumulative timers with call counts, and the event cap.
+    """
+    stats = Instrumentation()
+    stats.enable(max_events=2)
+    for _ in range(3):
+        start = stats.clock()
+        stats.add_time("routing", start)
+        stats.event("rollback", reason=3)
+    stats.count("blocked_ions", 4)
+
+    summary = stats.summary()
+    assert summary["timers"]["routing"]["calls"] == 3
+    assert summary["timers"]["routing"]["seconds"] >= 0.0
+    assert summary["counters"] == {"blocked_ions": 4, "rollback": 3}
+    assert summary["events"] == [{"event": "rollback", "reason": 3}] * 2
+    assert summary["dropped_events"] == 1
+
+
+def test_instrumentation_dumps_periodically(tmp_path):
+    """
+    Test that `tick` dumps every `dump_every` timesteps and `finish` dumps at the end.
+    """
+    stats = Instrumentation()
+    path = tmp_path / "stats.json"
+    stats.enable(dump_path=path, dump_every=10)
+
+    stats.tick(0)
+    assert json.loads(path.read_text())["counters"] == {}
+    stats.count("iterations")
+    stats.tick(5)
+    assert json.loads(path.read_text())["counters"] == {}
+    stats.tick(12)
+    assert json.loads(path.read_text())["counters"] == {"iterations": 1}
+    stats.count("iterations")
+    stats.finish()
+    assert json.loads(path.read_text())["counters"] == {"iterations": 2}
+
+
+def test_run_simulation_records_phases(monkeypatch):
+    """
+    Test that `run_simulation` fills the shared instrumentation when it is enabled.
+    """
+    import instrumentation
+
+    stats = Instrumentation()
+    stats.enable()
+    for module in ("main", "planner", "processing_zone", "move_obstacle_ion"):
+        monkeypatch.setattr(f"{module}.stats", stats)
+
+    config = load_config("cases/full_register_access_8.json")
+    run_simulation(*setup_simulation(config))
+
+    summary = stats.summary()
+    assert summary["counters"]["iterations"] >= 1
+    assert summary["counters"]["gates_executed"] == 8
+    assert {"routing", "process_pz", "reschedule", "gate_execution"} <= set(
+        summary["timers"]
+    )
+    assert not instrumentation.stats.enabled
@@ -1,4 +1,6 @@
+import argparse
 import json
+import time
 import networkx as nx
 from pathlib import Path
 from graph_basics import GraphCreator, create_starting_config, update_distance_map
@@ -6,15 +8,24 @@ from graph_utils import (
     create_idc_dictionary,
     create_dist_dict,
     get_ion_chains,
-    get_idx_from_idc,
+    check_ion_chains,
+    JunctionReservations,
 )
 
-from compilation import create_initial_sequence
-from find_path import find_path
-from plot import plot_state
-from move_obstacle_ion import move_as_push_obstacle_ions
+from compilation import (
+    FrontLayer,
+    HeapScheduler,
+    create_initial_sequence,
+    load_dependency_dag,
+)
+from find_path import create_routing_table
 from processing_zone import process_pz
-from move_ion import stride_move
+from instrumentation import stats
+from event_trace import trace
+from dag_cache import DagCache
+from eviction import make_eviction_policy
+from planner import PLANNERS, make_planner
+from checkpoint import Checkpointer, load_checkpoint, restore_state, simulation_state
 
 
 def run_simulation(
@@ -22,87 +33,126 @@ def run_simulation(
     graph_creator: GraphCreator,
     seq,
     flat_seq,
-    dag_dep,
+    front_layer: FrontLayer,
     next_node,
     init_seq_len: int,
-):
+    debug: bool = False,
+    scheduler: str = "heap",
+    max_timesteps: int | None = None,
+    eviction: str = "move_list",
+    max_chains_in_parking: int = 3,
+    checkpointer: Checkpointer | None = None,
+    resume_state: dict | None = None,
+    planner: str = "heuristic",
+) -> int:
     """
-    シミュレーションを実行する
+    シミュレーションを実行し、最後のタイムステップを返す
+
+    debug が True の場合、イオンを動かすたびにイオン位置の索引とグラフの整合性を確認する
+    scheduler はゲート順序の再計算方法 ("heap": HeapScheduler, "greedy": フロントレイヤーの走査)。
+    どちらも同じ順序になる
+    eviction はパーキングエッジが溢れたときに出すイオンの選び方 (eviction.EVICTION_POLICIES)。
+    既定の "move_list" は find_unnecessary_ion と同じ
+    max_chains_in_parking はパーキングエッジに置いておけるイオンの数
+    planner はタイムステップごとのイオンの移動の決め方 (planner.PLANNERS)。
+    既定の "heuristic" は move_list の順に1つずつ動かすもとのやり方、"cooperative" は時空間の予約表を使って
+    すべてのイオンの移動を一度に計画する
+    max_timesteps を渡すと、そのタイムステップに達した時点で打ち切る
+    (打ち切られたかどうかは front_layer に残ったゲートの数でわかる)
+    instrumentation.stats を有効にしておくと、段階ごとの時間と回数を記録する
+    (process_pz の時間は、その中の pz_eviction, gate_execution, reschedule を含む)
+    checkpointer を渡すと、その間隔でループの区切りの状態を保存する。
+    resume_state (checkpoint.load_checkpoint の戻り値) を渡すと、setup_simulation の状態をそれで置き換えて続きから実行する
+    イベント (イオンの移動、ゲートの実行など) は event_trace.trace に送る。最初の start イベントにはグラフの arch、
+    エッジの一覧とイオンの配置が入るので、トレースの move イベントを順に当てはめればどのタイムステップの配置も作り直せる
+    (描画はシミュレーション中には行わず、トレースから render.py で描く)
     """
-    show_plot_move = False
-    max_chains_in_parking = 3
-    used_junctions: dict[int, tuple[int, int]] = {}  # ion: node
-    timestep = 0
-    plot_state(G, ("Timestep", timestep), show_plot=show_plot_move)
-    timestep_buffer = 0
+    if scheduler == "heap":
+        heap_scheduler = HeapScheduler(front_layer.dag)
+    elif scheduler == "greedy":
+        heap_scheduler = None
+    else:
+        raise ValueError(f"Unknown scheduler: {scheduler}")
+    options = {
+        "scheduler": scheduler,
+        "eviction": eviction,
+        "max_chains_in_parking": max_chains_in_parking,
+        "planner": planner,
+    }
+    move_planner = make_planner(planner, G, graph_creator)
+    if resume_state is None:
+        eviction_policy = make_eviction_policy(eviction)
+        eviction_policy.on_schedule(seq)
+        timestep = 0
+        timestep_buffer = 0
+    else:
+        (
+            front_layer,
+            seq,
+            flat_seq,
+            next_node,
+            timestep,
+            timestep_buffer,
+            eviction_policy,
+        ) = restore_state(G, front_layer, resume_state)
+
+    # ion: node (タイムステップごとに空にして使い回す)
+    used_junctions = JunctionReservations()
+    num_ions = len(G.occupancy.ion_chains())
+    trace.timestep = timestep
+    trace.emit(
+        "start",
+        arch=[
+            graph_creator.m,
+            graph_creator.n,
+            graph_creator.ion_chain_size_vertical,
+            graph_creator.ion_chain_size_horizontal,
+        ],
+        edges=G.occupancy.edges,
+        edge_ions=G.occupancy.edge_ions,
+        num_gates=init_seq_len,
+        remaining_gates=len(front_layer),
+    )
 
     while len(seq) > 0:
+        trace.timestep = timestep
         # print("seq", seq)
         # print("flat_seq", flat_seq)
         # print(f"Next Node ID: {next_node.node_id}, qindices: {next_node.qindices}")
-        unique_seq = get_unique_flat_seq(flat_seq)
+        start = stats.clock()
+        unique_seq = get_unique_flat_seq(flat_seq, num_ions)
         # print("unique_seq", unique_seq)
         move_list = get_move_list(
             G, graph_creator.path_to_pz, next_node.qindices[0], unique_seq
         )
         # print("move_list", move_list)
+        stats.add_time("move_list", start)
 
-        used_junctions = {}
-
-        for ion in move_list:
-            current_edge = get_ion_chains(G)[ion]
-            path = find_path(G, current_edge, graph_creator.parking_node)
-            if not path:
-                continue
-
-            if ion in used_junctions:
-                continue
-
-            if get_idx_from_idc(G.idc_dict, current_edge) == get_idx_from_idc(
-                G.idc_dict, graph_creator.path_from_pz[0]
-            ):
-                # pzから帰る時の逆走防止
-                path = find_path(
-                    G, current_edge, (graph_creator.m - 1, graph_creator.n - 1)
-                )
-
-            next_edge = path[0]
-            if (
-                len(G.edges[next_edge]["ions"]) > 0
-                and G.edges[next_edge]["edge_type"] == "trap"
-            ):
-                # メモリゾーン上の動く予定のないイオンに邪魔されている
-                used_junctions, G = move_as_push_obstacle_ions(
-                    G, ion, next_edge, used_junctions, show_plot_move
-                )
-            else:
-                used_junctions = stride_move(
-                    G,
-                    ion,
-                    path,
-                    used_junctions,
-                    graph_creator.path_to_pz,
-                    timestep,
-                    graph_creator.parking_edge,
-                    graph_creator.processing_zone,
-                    show_plot_move=show_plot_move,
-                )
+        used_junctions.clear()
+        blocked_ions = move_planner.move(move_list, used_junctions, timestep, debug)
 
-            # plot_state(G, ("bugfix", ion), show_plot=show_plot_move)
+        stats.count("blocked_ions", blocked_ions)
+        if blocked_ions:
+            stats.event("blocked", timestep=timestep, ions=blocked_ions)
 
         # front_layerに合わせてPZを処理
-        dag_dep, seq, flat_seq, next_node, timestep_new = process_pz(
+        start = stats.clock()
+        front_layer, seq, flat_seq, next_node, timestep_new = process_pz(
             G,
             used_junctions,
             timestep,
             max_chains_in_parking,
-            dag_dep,
+            front_layer,
             move_list,
             seq,
             graph_creator.parking_edge,
             init_seq_len,
-            show_plot_move=show_plot_move,
+            scheduler=heap_scheduler,
+            eviction_policy=eviction_policy,
         )
+        stats.add_time("process_pz", start)
+        if debug:
+            check_ion_chains(G)
 
         # 処理ゾーンでの処理タイムステップで過剰に使ったタイムステップの一部は移動と並列して行えるので，通常移動の移動の時にtimestep_bufferから1引ければ，インクリメントする必要がない
         timestep_buffer = timestep_new - timestep
@@ -115,20 +165,52 @@ def run_simulation(
         else:
             timestep = timestep_new
 
-        # plot_state(G, ("Timestep", timestep), show_plot=True)
+        stats.count("iterations")
+        stats.tick(timestep)
+        if checkpointer is not None and checkpointer.due(timestep):
+            start = stats.clock()
+            checkpointer.save(
+                simulation_state(
+                    G,
+                    front_layer,
+                    timestep,
+                    timestep_buffer,
+                    eviction_policy,
+                    options=options,
+                )
+            )
+            trace.flush()
+            stats.add_time("checkpoint", start)
 
         if len(seq) == 0:
             print("\nFull Sequence executed in %s time steps" % timestep)
             break
 
+        if max_timesteps is not None and timestep >= max_timesteps:
+            print("\nStopped at max_timesteps (%s)" % max_timesteps)
+            break
+
+    trace.timestep = timestep
+    trace.emit("end", remaining_gates=len(front_layer))
+    trace.flush()
+    stats.finish()
+    return timestep
+
 
-def get_unique_flat_seq(sequence: list):
-    unique_sequence = []
+def get_unique_flat_seq(sequence: list, num_ions: int | None = None) -> list:
+    """
+    sequence に現れるイオンを、最初に現れた順に重複なく並べる
+
+    num_ions (イオンの総数) を渡すと、すべてのイオンが現れた時点で残りを見ずに打ち切る
+    """
+    unique_sequence = {}  # 挿入順を保つ集合として使う
     for seq_elem in sequence:
         if seq_elem not in unique_sequence:
-            unique_sequence.append(seq_elem)
+            unique_sequence[seq_elem] = None
+            if len(unique_sequence) == num_ions:
+                break
 
-    return unique_sequence
+    return list(unique_sequence)
 
 
 def get_move_list(
@@ -142,32 +224,55 @@ def get_move_list(
     reversed_path_to_pz = list(reversed(path_to_pz))
     # 逆順にしたリストをループして、各エッジ上にあるイオンを取得
     for edge in reversed_path_to_pz:
-        ions_on_edge = G.edges[edge]["ions"]
+        ions_on_edge = G.occupancy.ions(edge)
         move_list.extend(ions_on_edge)
 
-    if prior_ion not in move_list:
+    # move_list に入っているかの確認をリストの走査ではなく集合で行う (順序は move_list が持つ)
+    in_move_list = set(move_list)
+    if prior_ion not in in_move_list:
         move_list.append(prior_ion)
+        in_move_list.add(prior_ion)
 
     for seq_elem in unique_seq:
-        if seq_elem not in move_list and seq_elem != prior_ion:
+        if seq_elem not in in_move_list:
             move_list.append(seq_elem)
+            in_move_list.add(seq_elem)
 
     return move_list
 
 
-def main():
-    # JSONファイルの読み込み
-    config_file = "cases/full_register_access_6.json"
+def load_config(config_file: str | Path) -> dict:
+    """
+    cases/*.json の設定ファイルを読み込む
+    """
     with Path(config_file).open("r") as f:
-        config = json.load(f)
+        return json.load(f)
+
+
+def setup_simulation(
+    config: dict,
+    timings: dict[str, float] | None = None,
+    cache: DagCache | None = None,
+):
+    """
+    設定からグラフ、イオンの初期配置、ゲート列を作る
+
+    timings に辞書を渡すと、段階ごと (graph, dist_dict, routing_table, parse, sequence) の所要時間 [s] を書き込む
+    戻り値は run_simulation にそのまま渡せる
+    (G, graph_creator, seq, flat_seq, front_layer, next_node, init_seq_len)
+    cache を渡すと、QASM から作った依存グラフをディスクにキャッシュする
+    config に seed があれば、イオンの初期配置をその乱数シードで決める (既定は 0)
+    """
+    if timings is None:
+        timings = {}
 
     # 変数の設定
     arch = config["arch"]
-    max_timesteps = config["max_timesteps"]
     num_ion_chains = config["num_ion_chains"]
     filename = config["qu_alg"]
 
     # グラフ生成
+    start = time.perf_counter()
     m, n, v, h = arch
     ion_chain_size_vertical = v
     ion_chain_size_horizontal = h
@@ -175,24 +280,112 @@ def main():
         m, n, ion_chain_size_vertical, ion_chain_size_horizontal
     )
     G = graph_creator.get_graph()
-    nx.set_edge_attributes(G, {edge: [] for edge in G.edges}, "ions")
-    n_of_registers = create_starting_config(G, num_ion_chains, seed=0)
     G.idc_dict = create_idc_dictionary(G)
-    # print("idc_dict", G.idc_dict)
+    n_of_registers = create_starting_config(
+        G, num_ion_chains, seed=config.get("seed", 0)
+    )
+    timings["graph"] = time.perf_counter() - start
+
+    start = time.perf_counter()
     G.dist_dict = create_dist_dict(G, graph_creator.exit, graph_creator.processing_zone)
-    # print("dist_dict", G.dist_dict)
-    ion_chains = get_ion_chains(G)
+    timings["dist_dict"] = time.perf_counter() - start
+
+    # 移動先 (parking_node と PZ から帰るときの目的地) への経路は事前に計算しておく
+    start = time.perf_counter()
+    G.routing_table = create_routing_table(
+        G, [graph_creator.parking_node, (graph_creator.m - 1, graph_creator.n - 1)]
+    )
+    timings["routing_table"] = time.perf_counter() - start
 
+    # QASM の読み込みと依存グラフの構築
+    start = time.perf_counter()
+    dag = load_dependency_dag(filename, cache)
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ion_chains = get_ion_chains(G)
     distance_map = update_distance_map(ion_chains, G.dist_dict)
-    seq, flat_seq, dag_dep, next_node = create_initial_sequence(distance_map, filename)
+    seq, flat_seq, front_layer, next_node = create_initial_sequence(distance_map, dag)
     init_seq_len = len(seq)
+    timings["sequence"] = time.perf_counter() - start
+
+    return G, graph_creator, seq, flat_seq, front_layer, next_node, init_seq_len
 
-    timestep = 0
-    labels = ("timestep %s" % timestep, None)
+
+def main(
+    config_file: str = "cases/full_register_access_6.json",
+    checkpoint: str | None = None,
+    checkpoint_every: int = 100,
+    resume: str | None = None,
+    trace_file: str | None = None,
+    planner: str = "heuristic",
+):
+    """
+    checkpoint を渡すと checkpoint_every タイムステップごとに状態を保存する。
+    resume を渡すと、そのチェックポイントの設定と状態から続きを実行する (同じファイルに保存し続ける)
+    trace_file を渡すと、すべてのイベントをそのファイルに JSONL で書き出す (索引は trace_file.idx)
+    planner はイオンの移動の決め方 (planner.PLANNERS。再開するときはチェックポイントの設定を使う)
+    """
+    resume_state = None
+    if resume is not None:
+        resume_state = load_checkpoint(resume)
+        config = resume_state["config"]
+        checkpoint = checkpoint or resume
+    else:
+        config = load_config(config_file)
+    checkpointer = (
+        Checkpointer(checkpoint, checkpoint_every, config)
+        if checkpoint is not None
+        else None
+    )
+    options = (
+        resume_state["options"] if resume_state is not None else {"planner": planner}
+    )
+
+    if trace_file is not None:
+        trace.open(trace_file)
 
     # シミュレーション実行
-    run_simulation(G, graph_creator, seq, flat_seq, dag_dep, next_node, init_seq_len)
+    try:
+        run_simulation(
+            *setup_simulation(config, cache=DagCache()),
+            max_timesteps=config["max_timesteps"],
+            checkpointer=checkpointer,
+            resume_state=resume_state,
+            **options,
+        )
+    finally:
+        trace.close()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "config_file", nargs="?", default="cases/full_register_access_6.json"
+    )
+    parser.add_argument("--checkpoint", help="save the state to this file")
+    parser.add_argument("--checkpoint-every", type=int, default=100)
+    parser.add_argument("--resume", help="continue from this checkpoint")
+    parser.add_argument("--trace", help="write all events to this JSONL file")
+    parser.add_argument(
+        "--console-rate",
+        type=int,
+        help="print at most this many lines per second (the rest are counted)",
+    )
+    parser.add_argument("--quiet", action="store_true", help="print only the result")
+    parser.add_argument(
+        "--planner",
+        choices=sorted(PLANNERS),
+        default="heuristic",
+        help="how the ions to move are planned each timestep",
+    )
+    args = parser.parse_args()
+    trace.set_console(not args.quiet, args.console_rate)
+    main(
+        args.config_file,
+        args.checkpoint,
+        args.checkpoint_every,
+        args.resume,
+        args.trace,
+        args.planner,
+    )
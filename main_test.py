@@ -0,0 +1,42 @@
+import random
+
+from graph_basics import GraphCreator
+from main import get_move_list, get_unique_flat_seq
+
+
+def get_unique_flat_seq_by_scan(sequence: list) -> list:
+    """
+    Reference implementation of `get_unique_flat_seq` with list membership.
+    """
+    unique_sequence = []
+    for seq_elem in sequence:
+        if seq_elem not in unique_sequence:
+            unique_sequence.append(seq_elem)
+    return unique_sequence
+
+
+def test_get_unique_flat_seq_keeps_first_occurrence_order():
+    """
+    Test that `get_unique_flat_seq` matches the list scan, with and without the ion count.
+    """
+    random.seed(0)
+    for _ in range(100):
+        num_ions = random.randint(1, 10)
+        sequence = [random.randrange(num_ions) for _ in range(random.randint(0, 40))]
+        expected = get_unique_flat_seq_by_scan(sequence)
+        assert get_unique_flat_seq(sequence) == expected
+        assert get_unique_flat_seq(sequence, num_ions) == expected
+
+
+def test_get_move_list_order(graph3322: GraphCreator):
+    """
+    Test that `get_move_list` lists the ions on the path to the PZ first, then the prior
+    ion, then the rest of the sequence, each ion once.
+    """
+    G = graph3322.get_graph()
+    path_to_pz = graph3322.path_to_pz
+    G.occupancy.place(4, path_to_pz[-1])
+    G.occupancy.place(5, path_to_pz[-1])
+
+    assert get_move_list(G, path_to_pz, 2, [3, 4, 2, 0, 1]) == [4, 5, 2, 3, 0, 1]
+    assert get_move_list(G, path_to_pz, 5, [5, 1, 0]) == [4, 5, 1, 0]
@@ -1,25 +1,26 @@
 import networkx as nx
 import random
 from graph_utils import (
-    get_ion_chains,
+    JunctionReservations,
+    get_common_node,
+    get_ion_edge,
     get_idx_from_idc,
     move_ion,
 )
-from plot import plot_state
+from event_trace import trace
 
 
 def move_from_pz(
     G: nx.Graph,
     out_from_pz_ions: list[int],
-    used_junctions: dict[int, tuple[int, int]],
-    show_plot_move: bool = False,
+    used_junctions: JunctionReservations,
 ):
     """
     処理ゾーンからメモリゾーンにイオンを移動させる
     """
     # parking_edgeからの移動
     for out_ion in out_from_pz_ions:
-        ion_edge = get_ion_chains(G)[out_ion]
+        ion_edge = get_ion_edge(G, out_ion)
         adjacent_edges = list(
             nx.edge_boundary(G, nbunch1=[ion_edge[0], ion_edge[1]], data=True)
         )
@@ -28,7 +29,7 @@ def move_from_pz(
         for ad_edge in adjacent_edges:
             # print("ad_edge" ,ad_edge)
             edge_type = ad_edge[2]["edge_type"]
-            ions = ad_edge[2]["ions"]
+            ions = G.occupancy.ions(ad_edge[:2])
             
             if not edge_type == "parking_edge" and not edge_type == "exit":
                 # prevent reverse move
@@ -37,7 +38,7 @@ def move_from_pz(
         # 絶対成功する
         # print("candidates", candidates)
         if len(candidates) != 1:
-            print("mvoe from pz: 現状あり得ないかも")
+            trace.warning("mvoe from pz: 現状あり得ないかも")
         # for e in moving_edge:
         #     if len(e[2]["ions"]) >0:
         #         assert False, "Move to Memory Zone: Edge is not empty."
@@ -47,25 +48,21 @@ def move_from_pz(
             # 進めるエッジがない場合
             assert False, "not find next edge"
 
-        common_node = set(ion_edge).intersection(set(next_edge[:2]))
-        single_common_node = next(iter(common_node))
+        single_common_node = get_common_node(G, ion_edge, next_edge[:2])
         used_junctions[out_ion] = single_common_node
         move_ion(G, out_ion, ion_edge, next_edge[:2])
-        plot_state(
-            G, ("Move from PZ, Ion Number is", out_ion), show_plot=show_plot_move
-        )
 
     # path_from_pz
     prev_edge = ion_edge
     prev_ion = out_ion
-    current_edge = get_ion_chains(G)[prev_ion]
+    current_edge = get_ion_edge(G, prev_ion)
    
-    while len(G.edges[current_edge]["ions"]) > 1:
+    while G.occupancy.count(current_edge) > 1:
         # 隣のエッジを探し，prev_edgeではない方向に進む
         # 基本的にイオンがない方に進むが，進めない場合はイオンがあっても進み，current_edgeなどを更新する
 
         # 移動させるイオンの決定
-        on_site_ions: list[int] = G.edges[current_edge]["ions"]
+        on_site_ions: list[int] = G.occupancy.ions(current_edge)
         moving_ion = next((x for x in on_site_ions if x != prev_ion), None)
         
         # TODO:suspicious
@@ -96,20 +93,19 @@ def move_from_pz(
                 continue
 
             # print("through continue", ad_edge[:2], current_edge)
-            common_node = set(ad_edge[:2]).intersection(set(current_edge))
-            single_common_node = next(iter(common_node))
+            single_common_node = get_common_node(G, ad_edge[:2], current_edge)
             # print("single_common_node", single_common_node, used_junctions)
-            if single_common_node in used_junctions.values():
+            if used_junctions.reserved(single_common_node):
                 if (
                     G.edges[current_edge]["edge_type"] == "entry"
                     or G.edges[current_edge]["edge_type"] == "first_entry_connection"
                     and G.edges[ad_edge[:2]]["edge_type"] == "trap"
                 ):
-                    print("怪しい")
+                    trace.warning("怪しい")
                 else:
                     continue
 
-            if len(ad_edge[2]["ions"]) == 0:
+            if G.occupancy.count(ad_edge[:2]) == 0:
                 next_edge = ad_edge
                 # print("next_edge", next_edge)
                 break
@@ -131,9 +127,8 @@ def move_from_pz(
                     # not go back(swap)
                     continue
 
-                common_node = set(ad[:2]).intersection(set(current_edge))
-                single_common_node = next(iter(common_node))
-                if single_common_node in used_junctions.values():
+                single_common_node = get_common_node(G, ad[:2], current_edge)
+                if used_junctions.reserved(single_common_node):
                     continue
 
                 if ad[2]["edge_type"] == "parking_edge" or ad[2]["edge_type"] == "exit":
@@ -157,11 +152,9 @@ def move_from_pz(
 
         # 移動
         move_ion(G, moving_ion, current_edge, next_edge[:2])
-        common_node = set(current_edge).intersection(set(next_edge[:2]))
-        single_common_node = next(iter(common_node))
+        single_common_node = get_common_node(G, current_edge, next_edge[:2])
         used_junctions[moving_ion] = single_common_node
 
-        plot_state(G, ("Move from PZ", moving_ion), show_plot=show_plot_move)
         # 更新
         prev_edge = current_edge
         prev_ion = moving_ion
@@ -1,62 +1,62 @@
 import networkx as nx
 import random
-import copy
 from graph_utils import (
-    get_ion_chains,
+    JunctionReservations,
+    get_common_node,
+    get_ion_edge,
     get_idx_from_idc,
-    move_ion,
+    MoveJournal,
 )
 from find_path import get_shortest_path
-from plot import plot_state
+from instrumentation import stats
+from event_trace import trace
 
 
 def move_as_push_obstacle_ions(
     G: nx.Graph,
     ion: int,
     next_edge: list[tuple[int, int], tuple[int, int]],
-    used_junctions: dict[int, tuple[int, int]],
-    show_plot_move: bool = False,
+    used_junctions: JunctionReservations,
 ):
     """
     Only in Memory zone, (prior) ion push obstacle ions on next edge
+
+    押し出しに失敗した場合は journal を使って G と used_junctions を呼び出し前の状態に戻す。
     """
-    prev_G = copy.deepcopy(G)
-    prev_used_junctions = copy.deepcopy(used_junctions)
+    journal = MoveJournal(G, used_junctions)
 
-    ion_edge = get_ion_chains(G)[ion]
-    common_node = set(ion_edge).intersection(set(next_edge))
-    single_common_node = next(iter(common_node))
+    ion_edge = get_ion_edge(G, ion)
+    single_common_node = get_common_node(G, ion_edge, next_edge)
 
     # イオンは移動済みでなく、さらに、使用予定のジャンクションノードが未使用である場合、True
-    if ion not in used_junctions and single_common_node not in used_junctions.values():
-        used_junctions[ion] = single_common_node
-        move_ion(G, ion, ion_edge, next_edge)
+    if ion not in used_junctions and not used_junctions.reserved(single_common_node):
+        journal.use_junction(ion, single_common_node)
+        journal.move_ion(ion, ion_edge, next_edge)
     else:
-        return used_junctions, prev_G
+        return used_junctions
 
     # イオンの移動(上)に伴って、1サイト内に2つのイオンが存在している場合があるため以下の処理を行う
     prev_edge = ion_edge
     prev_ion = ion
-    current_edge = get_ion_chains(G)[prev_ion]
+    current_edge = get_ion_edge(G, prev_ion)
     # print("prev_edge", prev_edge)
     # print("prev_ion", prev_ion)
     # print("current_edge", current_edge)
 
-    while len(G.edges[current_edge]["ions"]) > 1:
+    while G.occupancy.count(current_edge) > 1:
         # 隣のエッジを探し，prev_edgeではない方向に進む
         # 基本的にイオンがない方に進むが，進めない場合はイオンがあっても進み，current_edgeなどを更新する
 
         # 移動させるイオンの決定
-        on_site_ions: list[int] = G.edges[current_edge]["ions"]
+        on_site_ions: list[int] = G.occupancy.ions(current_edge)
         moving_ion = next((x for x in on_site_ions if x != prev_ion), None)
         # print("moving_ion", moving_ion)
 
         if moving_ion in used_junctions:
-            print("rollback", "3")
-            # move_ion(G, prev_ion, current_edge, prev_edge)
-            # used_junctions.pop(prev_ion)
-            # G = rollback_graph(G, prev_G)
-            return prev_used_junctions, prev_G
+            trace.emit("rollback", reason=3, ion=ion, chain_length=journal.moves)
+            stats.event("rollback", reason=3, ion=ion, chain_length=journal.moves)
+            journal.rollback()
+            return used_junctions
 
         # 移動候補リスト
         adjacent_edges = list(
@@ -73,13 +73,15 @@ def move_as_push_obstacle_ions(
                 # not go back(swap)
                 continue
 
-            common_node = set(ad_edge[:2]).intersection(set(current_edge))
-            single_common_node = next(iter(common_node))
+            single_common_node = get_common_node(G, ad_edge[:2], current_edge)
 
-            if single_common_node in used_junctions.values():
+            if used_junctions.reserved(single_common_node):
                 continue
 
-            if ad_edge[2]["edge_type"] == "trap" and len(ad_edge[2]["ions"]) == 0:
+            if (
+                ad_edge[2]["edge_type"] == "trap"
+                and G.occupancy.count(ad_edge[:2]) == 0
+            ):
                 # TODO:
                 path = get_shortest_path(G, ad_edge[0], (0, 0))
                 cost = sum(
@@ -103,9 +105,8 @@ def move_as_push_obstacle_ions(
                     G.idc_dict, prev_edge
                 ):
                     continue
-                common_node = set(ad[:2]).intersection(set(current_edge))
-                single_common_node = next(iter(common_node))
-                if single_common_node in used_junctions.values():
+                single_common_node = get_common_node(G, ad[:2], current_edge)
+                if used_junctions.reserved(single_common_node):
                     continue
                 if ad[2]["edge_type"] == "trap":
                     # トラップだったら候補ではある
@@ -113,9 +114,10 @@ def move_as_push_obstacle_ions(
 
             if not candidates:
                 # 進めるエッジがない場合　ロールバックする
-                print("rollback", "2")
-                # G = rollback_graph(G, prev_G)
-                return prev_used_junctions, prev_G
+                trace.emit("rollback", reason=2, ion=ion, chain_length=journal.moves)
+                stats.event("rollback", reason=2, ion=ion, chain_length=journal.moves)
+                journal.rollback()
+                return used_junctions
 
             # print("candidates", candidates)
             next_edge = random.choice(candidates)
@@ -127,14 +129,14 @@ def move_as_push_obstacle_ions(
         # print("next_edge", next_edge)
         # 移動
         # print("bugfix2", current_edge, next_edge)
-        move_ion(G, moving_ion, current_edge, next_edge[:2])
-        common_node = set(current_edge).intersection(set(next_edge[:2]))
-        single_common_node = next(iter(common_node))
-        used_junctions[moving_ion] = single_common_node
-        plot_state(G, ("Move obstacle", moving_ion), show_plot=show_plot_move)
+        journal.move_ion(moving_ion, current_edge, next_edge[:2])
+        single_common_node = get_common_node(G, current_edge, next_edge[:2])
+        journal.use_junction(moving_ion, single_common_node)
         # 更新
         prev_edge = current_edge
         prev_ion = moving_ion
         current_edge = next_edge[:2]
 
-    return used_junctions, G
+    stats.event("push_chain", ion=ion, chain_length=journal.moves)
+    trace.emit("push", ion=ion, chain_length=journal.moves)
+    return used_junctions
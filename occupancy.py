@@ -0,0 +1,111 @@
+import networkx as nx
+
+
+class Occupancy:
+    """
+    イオンの配置 (どのエッジにどのイオンが何番目にいるか) を保持するクラス。
+
+    エッジは create_idc_dictionary の番号で添字付けし、エッジごとのイオンのリストと
+    イオン→エッジ番号の配列を持つ。networkx のグラフはトポロジーだけを表し、
+    イオンの移動でグラフの属性には触れない。
+    エッジを返すときは G.edges() の向きにそろえる。
+    """
+
+    __slots__ = ("edges", "idx_from_edge", "edge_ions", "ion_edge")
+
+    def __init__(self, G: nx.Graph):
+        idx_from_edge = G.idc_dict.idx_from_idc
+        edges = [None] * len(G.idc_dict)
+        for edge in G.edges():
+            edges[idx_from_edge[edge]] = edge
+        # トポロジー側 (edges, idx_from_edge) は copy() で共有する
+        self.edges: list[tuple[tuple[int, int], tuple[int, int]]] = edges
+        self.idx_from_edge: dict = idx_from_edge
+        self.edge_ions: list[list[int]] = [[] for _ in edges]
+        # ion -> エッジ番号 (-1 はどのエッジにもいない)
+        self.ion_edge: list[int] = []
+
+    def copy(self) -> "Occupancy":
+        other = Occupancy.__new__(Occupancy)
+        other.edges = self.edges
+        other.idx_from_edge = self.idx_from_edge
+        other.edge_ions = [ions.copy() for ions in self.edge_ions]
+        other.ion_edge = self.ion_edge.copy()
+        return other
+
+    def idx(self, edge: tuple[tuple[int, int], tuple[int, int]]) -> int:
+        return self.idx_from_edge[edge]
+
+    def ions(self, edge: tuple[tuple[int, int], tuple[int, int]]) -> list[int]:
+        """
+        エッジ上のイオンのリスト (呼び出し側で書き換えないこと)
+        """
+        return self.edge_ions[self.idx_from_edge[edge]]
+
+    def count(self, edge: tuple[tuple[int, int], tuple[int, int]]) -> int:
+        return len(self.edge_ions[self.idx_from_edge[edge]])
+
+    def edge_of(self, ion: int) -> tuple[tuple[int, int], tuple[int, int]]:
+        idx = self.ion_edge[ion] if ion < len(self.ion_edge) else -1
+        if idx < 0:
+            raise KeyError(ion)
+        return self.edges[idx]
+
+    def place(
+        self,
+        ion: int,
+        edge: tuple[tuple[int, int], tuple[int, int]],
+        index: int | None = None,
+    ) -> None:
+        """
+        イオンをエッジに置く。index を指定しなければ末尾に置く。
+        """
+        idx = self.idx_from_edge[edge]
+        if index is None:
+            self.edge_ions[idx].append(ion)
+        else:
+            self.edge_ions[idx].insert(index, ion)
+        if ion >= len(self.ion_edge):
+            self.ion_edge.extend([-1] * (ion + 1 - len(self.ion_edge)))
+        self.ion_edge[ion] = idx
+
+    def move(
+        self,
+        ion: int,
+        current_edge: tuple[tuple[int, int], tuple[int, int]],
+        new_edge: tuple[tuple[int, int], tuple[int, int]],
+    ) -> bool:
+        """
+        イオンを current_edge から new_edge の末尾へ移す。
+        current_edge にイオンがいなければ何もせず False を返す。
+        """
+        ions = self.edge_ions[self.idx_from_edge[current_edge]]
+        if ion not in ions:
+            return False
+        ions.remove(ion)
+        new_idx = self.idx_from_edge[new_edge]
+        self.edge_ions[new_idx].append(ion)
+        self.ion_edge[ion] = new_idx
+        return True
+
+    def ion_chains(self) -> dict[int, tuple[tuple[int, int], tuple[int, int]]]:
+        """
+        イオン番号順の {ion: edge}
+        """
+        return {
+            ion: self.edges[idx] for ion, idx in enumerate(self.ion_edge) if idx >= 0
+        }
+
+    def check(self) -> None:
+        """
+        エッジごとのリストとイオン→エッジの配列が一致しているか確認する。
+        """
+        scanned = {}
+        for idx, ions in enumerate(self.edge_ions):
+            for ion in ions:
+                assert ion not in scanned, f"Ion {ion} is on more than one edge"
+                scanned[ion] = idx
+        indexed = {ion: idx for ion, idx in enumerate(self.ion_edge) if idx >= 0}
+        assert (
+            scanned == indexed
+        ), f"Ion index is out of sync: index={indexed}, edges={scanned}"
@@ -0,0 +1,57 @@
+import pytest
+
+from graph_basics import GraphCreator
+from occupancy import Occupancy
+
+
+def test_occupancy_edges_follow_graph_orientation(graph3322: GraphCreator):
+    """
+    Test that `Occupancy` indexes edges by idc number and returns them in `G.edges` orientation.
+    """
+    G = graph3322.get_graph()
+    occupancy = Occupancy(G)
+    for edge in G.edges:
+        idx = G.idc_dict.idx_from_idc[edge]
+        assert occupancy.idx(edge) == idx
+        assert occupancy.idx((edge[1], edge[0])) == idx
+        assert occupancy.edges[idx] == edge
+
+    edge = next(iter(G.edges))
+    occupancy.place(3, (edge[1], edge[0]))
+    assert occupancy.edge_of(3) == edge
+    assert occupancy.ions(edge) == [3]
+    assert occupancy.count(edge) == 1
+
+
+def test_occupancy_move_and_missing_ion(graph3311: GraphCreator):
+    """
+    Test `Occupancy.move`, including the no-op when the ion is not on the edge.
+    """
+    occupancy = graph3311.get_graph().occupancy
+    assert occupancy.ion_chains() == {0: ((0, 0), (0, 1)), 1: ((0, 1), (1, 1))}
+
+    assert occupancy.move(0, ((0, 0), (0, 1)), ((0, 1), (1, 1)))
+    assert occupancy.ions(((0, 1), (1, 1))) == [1, 0]
+    assert occupancy.count(((0, 0), (0, 1))) == 0
+    assert occupancy.edge_of(0) == ((0, 1), (1, 1))
+
+    assert not occupancy.move(0, ((0, 0), (0, 1)), ((0, 1), (1, 1)))
+    occupancy.check()
+
+    with pytest.raises(KeyError):
+        occupancy.edge_of(7)
+
+
+def test_occupancy_copy_is_independent(graph3311: GraphCreator):
+    """
+    Test that `Occupancy.copy` shares topology but not ion placement.
+    """
+    occupancy = graph3311.get_graph().occupancy
+    other = occupancy.copy()
+    other.move(1, ((0, 1), (1, 1)), ((0, 0), (0, 1)))
+
+    assert occupancy.ion_chains() == {0: ((0, 0), (0, 1)), 1: ((0, 1), (1, 1))}
+    assert other.ion_chains() == {0: ((0, 0), (0, 1)), 1: ((0, 0), (0, 1))}
+    assert other.edges is occupancy.edges
+    occupancy.check()
+    other.check()
@@ -0,0 +1,477 @@
+import heapq
+import math
+from itertools import pairwise
+
+import networkx as nx
+
+from find_path import find_path
+from graph_basics import GraphCreator
+from graph_utils import (
+    JunctionReservations,
+    check_ion_chains,
+    get_common_node,
+    get_idx_from_idc,
+    get_ion_edge,
+    move_ion,
+)
+from instrumentation import stats
+from move_ion import stride_move
+from move_obstacle_ion import move_as_push_obstacle_ions
+
+
+class Planner:
+    """
+    1タイムステップ分のイオンの移動を決めて実行する。
+
+    run_simulation はタイムステップごとに move_list (優先順) と空の used_junctions を渡して move を呼ぶ。
+    移動で使ったノードは used_junctions に入り、その後の process_pz (パーキングエッジからの追い出し) も同じ表を使う
+    """
+
+    name = ""
+
+    def __init__(self, G: nx.Graph, graph_creator: GraphCreator):
+        self.G = G
+        self.graph_creator = graph_creator
+
+    def move(
+        self,
+        move_list: list[int],
+        used_junctions: JunctionReservations,
+        timestep: int,
+        debug: bool = False,
+    ) -> int:
+        """
+        Returns:
+            動く予定のないイオンに塞がれて押し出しを試みたイオンの数
+        """
+        raise NotImplementedError
+
+
+class HeuristicPlanner(Planner):
+    """
+    もとのやり方: move_list の順にイオンを1つずつ、最短経路に沿って1ジャンクション進める (stride_move)。
+    次のエッジが動く予定のないイオンに塞がれていれば押し出す (move_as_push_obstacle_ions)
+    """
+
+    name = "heuristic"
+
+    def route(self, ion: int):
+        """
+        イオンのいるエッジと parking_node までの経路 (PZ から帰るイオンは逆走しない経路)。
+        経路が空なら None
+        """
+        graph_creator = self.graph_creator
+        current_edge = get_ion_edge(self.G, ion)
+        start = stats.clock()
+        path = find_path(self.G, current_edge, graph_creator.parking_node)
+        stats.add_time("routing", start)
+        if not path:
+            return current_edge, None
+
+        if get_idx_from_idc(self.G.idc_dict, current_edge) == get_idx_from_idc(
+            self.G.idc_dict, graph_creator.path_from_pz[0]
+        ):
+            # pzから帰る時の逆走防止
+            start = stats.clock()
+            path = find_path(
+                self.G, current_edge, (graph_creator.m - 1, graph_creator.n - 1)
+            )
+            stats.add_time("routing", start)
+        return current_edge, path
+
+    def push(self, ion: int, next_edge, used_junctions: JunctionReservations) -> bool:
+        """
+        next_edge がメモリゾーン上でイオンに塞がれていれば押し出し、押し出しを試みたかを返す
+        """
+        G = self.G
+        if not (
+            G.occupancy.count(next_edge) > 0
+            and G.edges[next_edge]["edge_type"] == "trap"
+        ):
+            return False
+        start = stats.clock()
+        move_as_push_obstacle_ions(G, ion, next_edge, used_junctions)
+        stats.add_time("push_obstacles", start)
+        return True
+
+    def step(
+        self, ion: int, used_junctions: JunctionReservations, timestep: int
+    ) -> bool:
+        """
+        1つのイオンを進める。押し出しを試みたかを返す
+        """
+        graph_creator = self.graph_creator
+        current_edge, path = self.route(ion)
+        if path is None or ion in used_junctions:
+            return False
+
+        next_edge = path[0]
+        # メモリゾーン上の動く予定のないイオンに邪魔されている
+        if self.push(ion, next_edge, used_junctions):
+            return True
+
+        start = stats.clock()
+        stride_move(
+            self.G,
+            ion,
+            path,
+            used_junctions,
+            graph_creator.path_to_pz,
+            timestep,
+            graph_creator.parking_edge,
+            graph_creator.processing_zone,
+        )
+        stats.add_time("stride_move", start)
+        return False
+
+    def move(self, move_list, used_junctions, timestep, debug=False):
+        blocked_ions = 0
+        for ion in move_list:
+            blocked_ions += self.step(ion, used_junctions, timestep)
+            if debug:
+                check_ion_chains(self.G)
+        return blocked_ions
+
+
+def create_successor_table(
+    G: nx.Graph, graph_creator: GraphCreator
+) -> list[list[tuple[int, tuple[int, int]]]]:
+    """
+    エッジ番号ごとに、1タイムステップで移れるエッジと、そのとき使うノード (next_idx, node) のリスト。
+
+    stride_move と同じ規則で作る:
+    - exit のエッジ (path_to_pz) は PZ に向かう向きにだけ進み、最後はパーキングエッジに入る
+    - entry のエッジ (path_from_pz) は PZ から離れる向きにだけ進み、最後はメモリゾーンに入る
+    - メモリゾーンのエッジからは、ジャンクションを越えて隣のメモリゾーンのエッジか exit の最初のエッジに進む
+      (ジャンクションでないノードは越えない。entry には逆から入らない)
+    - パーキングエッジからは動かない (追い出しは process_pz が行う)
+    """
+    occupancy = G.occupancy
+    exit_path = [occupancy.idx(edge) for edge in graph_creator.path_to_pz]
+    entry_path = [occupancy.idx(edge) for edge in graph_creator.path_from_pz]
+    parking = occupancy.idx(graph_creator.parking_edge)
+    successors: list[list[tuple[int, tuple[int, int]]]] = [[] for _ in occupancy.edges]
+
+    def connect(source: int, target: int) -> None:
+        node = get_common_node(G, occupancy.edges[source], occupancy.edges[target])
+        successors[source].append((target, node))
+
+    for source, target in pairwise(exit_path + [parking]):
+        connect(source, target)
+    for source, target in pairwise(entry_path):
+        connect(source, target)
+
+    for idx, edge in enumerate(occupancy.edges):
+        is_trap = G.edges[edge]["edge_type"] == "trap"
+        if not (is_trap or idx == entry_path[-1]):
+            continue
+        for node in edge:
+            if is_trap and node not in G.junction_set:
+                continue
+            for neighbor in G.edges(node):
+                neighbor_idx = occupancy.idx(neighbor)
+                if neighbor_idx == idx:
+                    continue
+                if (
+                    G.edges[neighbor]["edge_type"] == "trap"
+                    or neighbor_idx == exit_path[0]
+                ):
+                    successors[idx].append((neighbor_idx, node))
+    return successors
+
+
+def create_distance_table(
+    successors: list[list[tuple[int, tuple[int, int]]]], goals: list[int]
+) -> list[float]:
+    """
+    successors に沿って goals のどれかに着くまでの最短のタイムステップ数 (着けないエッジは math.inf)。
+    他のイオンを無視した下界なので、A* のヒューリスティックに使える
+    """
+    predecessors: list[list[int]] = [[] for _ in successors]
+    for source, targets in enumerate(successors):
+        for target, _ in targets:
+            predecessors[target].append(source)
+
+    distance = [math.inf] * len(successors)
+    for goal in goals:
+        distance[goal] = 0
+    frontier = list(goals)
+    while frontier:
+        next_frontier = []
+        for target in frontier:
+            for source in predecessors[target]:
+                if distance[source] == math.inf:
+                    distance[source] = distance[target] + 1
+                    next_frontier.append(source)
+        frontier = next_frontier
+    return distance
+
+
+class ReservationTable:
+    """
+    時空間の予約表。窓 (window タイムステップ) の中の時刻 t について、
+    edges[t] はそのときエッジを占めるイオン、nodes[t] は t から t+1 への移動で使うノードを持つ。
+
+    まだ計画していないイオンと計画を持たないイオンは static に数え、窓の間ずっとそのエッジにいるものとして扱う。
+    容量に制限のないエッジ (パーキングエッジ) は予約しない
+    """
+
+    def __init__(self, num_edges: int, window: int, unlimited: set[int] = frozenset()):
+        self.window = window
+        self.unlimited = unlimited
+        self.static = [0] * num_edges
+        self.edges: list[dict[int, int]] = [{} for _ in range(window + 1)]
+        self.nodes: list[dict[tuple[int, int], int]] = [{} for _ in range(window)]
+
+    def reset(self, edge_counts: list[int]) -> None:
+        """
+        タイムステップの始めに、エッジごとのイオンの数 (すべて static) から作り直す
+        """
+        self.static[:] = edge_counts
+        for reserved in self.edges:
+            reserved.clear()
+        for reserved in self.nodes:
+            reserved.clear()
+
+    def release(self, edge: int) -> None:
+        """
+        計画するイオンを static から外す
+        """
+        self.static[edge] -= 1
+
+    def edge_free(self, edge: int, t: int) -> bool:
+        return edge in self.unlimited or (
+            not self.static[edge] and edge not in self.edges[t]
+        )
+
+    def node_free(self, node: tuple[int, int], t: int) -> bool:
+        return node not in self.nodes[t]
+
+    def reserve(
+        self, ion: int, path: list[int], nodes: list[tuple[int, int] | None]
+    ) -> None:
+        """
+        path[t] は時刻 t のエッジ、nodes[t] は t から t+1 への移動で使うノード (待つときは None)。
+        path が窓より短ければ、最後のエッジに窓の終わりまでいる (動かないイオンは static に戻す)
+        """
+        if all(node is None for node in nodes):
+            if path[0] not in self.unlimited:
+                self.static[path[0]] += 1
+            return
+        last = len(path) - 1
+        for t, reserved in enumerate(self.edges):
+            edge = path[min(t, last)]
+            if edge not in self.unlimited:
+                reserved[edge] = ion
+        for t, node in enumerate(nodes):
+            if node is not None:
+                self.nodes[t][node] = ion
+
+
+class CooperativePlanner(HeuristicPlanner):
+    """
+    窓付きの協調 A* (windowed hierarchical cooperative A*) による優先順の計画。
+
+    タイムステップごとに、move_list の順 (優先度の高い順) にイオンの window タイムステップ分の経路を
+    (エッジ, 時刻) の空間で探し、ReservationTable に予約する。後のイオンは先のイオンの予約を避けるので、
+    すべてのイオンの移動は衝突しない (1つのエッジに1つのイオン、1つのノードを1タイムステップに1回、
+    すれ違いなし)。計画した経路の最初の1ステップだけを実行し、次のタイムステップで計画し直す。
+
+    ヒューリスティックは他のイオンを無視したパーキングエッジまでの距離 (create_distance_table) なので、
+    予約に邪魔されないイオンは探索せずに最短経路をそのまま使う。
+    move_list にないイオンは動かないものとして扱うが、entry の上にいるものだけは (entry は一方通行で
+    押し出せないので) 最も低い優先度でメモリゾーンに戻す。
+    計画できないイオン (規則の上でパーキングエッジに着けないエッジにいる) は HeuristicPlanner と同じように動かし、
+    待つことになったイオンの次のエッジが動かないイオンに塞がれていれば、同じように押し出す
+    """
+
+    name = "cooperative"
+
+    def __init__(self, G: nx.Graph, graph_creator: GraphCreator, window: int = 3):
+        super().__init__(G, graph_creator)
+        self.window = window
+        self.parking = G.occupancy.idx(graph_creator.parking_edge)
+        self.successors = create_successor_table(G, graph_creator)
+        self.distance = create_distance_table(self.successors, [self.parking])
+        # PZ から帰る途中で止まっているイオンは、メモリゾーンのどこかに戻れば entry を空けられる
+        self.entry_path = {G.occupancy.idx(edge) for edge in graph_creator.path_from_pz}
+        self.memory_distance = create_distance_table(
+            self.successors,
+            [
+                idx
+                for idx, edge in enumerate(G.occupancy.edges)
+                if G.edges[edge]["edge_type"] == "trap"
+            ],
+        )
+        self.reservations = ReservationTable(
+            len(G.occupancy.edges), window, {self.parking}
+        )
+
+    def plan(
+        self, start: int, distance: list[float]
+    ) -> tuple[list[int], list[tuple[int, int] | None]]:
+        """
+        start から、予約を避けて (目的地 (distance が 0 のエッジ) に着くか窓の終わりまでの時間) +
+        (そこからの距離) が最小になる経路 (時刻ごとのエッジ、移動で使うノード) を返す
+        """
+        if distance[start] == 0:
+            return [start], []
+        successors = self.successors
+        window = self.window
+        # 探索の内側では ReservationTable.edge_free / node_free を展開して使う
+        table = self.reservations
+        static = table.static
+        reserved_edges = table.edges
+        reserved_nodes = table.nodes
+        unlimited = table.unlimited
+
+        # 予約に邪魔されなければ最短経路をそのまま使う
+        path = [start]
+        nodes = []
+        edge = start
+        for t in range(window):
+            if distance[edge] == 0:
+                break
+            for next_edge, node in successors[edge]:
+                if (
+                    distance[next_edge] == distance[edge] - 1
+                    and node not in reserved_nodes[t]
+                    and (
+                        next_edge in unlimited
+                        or not (static[next_edge] or next_edge in reserved_edges[t + 1])
+                    )
+                ):
+                    path.append(next_edge)
+                    nodes.append(node)
+                    edge = next_edge
+                    break
+            else:
+                break
+        else:
+            return path, nodes
+        if distance[edge] == 0:
+            return path, nodes
+
+        # (エッジ, 時刻) の A*。どの経路でも (e, t) までのコストは t なので、最初に見つけた親で十分
+        # (同じ状態を2回 open_list に入れることはない)
+        parents = {(start, 0): None}
+        open_list = [(distance[start], 0, start)]
+        while open_list:
+            _, negative_t, edge = heapq.heappop(open_list)
+            t = -negative_t
+            if distance[edge] == 0 or t == window:
+                return self._reconstruct(parents, (edge, t))
+
+            t_next = t + 1
+            edges_next = reserved_edges[t_next]
+            if (
+                not (static[edge] or edge in edges_next)
+                and (edge, t_next) not in parents
+            ):
+                parents[(edge, t_next)] = (edge, t, None)
+                heapq.heappush(open_list, (t_next + distance[edge], -t_next, edge))
+            nodes_now = reserved_nodes[t]
+            for next_edge, node in successors[edge]:
+                if (
+                    distance[next_edge] < math.inf
+                    and (next_edge, t_next) not in parents
+                    and node not in nodes_now
+                    and (
+                        next_edge in unlimited
+                        or not (static[next_edge] or next_edge in edges_next)
+                    )
+                ):
+                    parents[(next_edge, t_next)] = (edge, t, node)
+                    heapq.heappush(
+                        open_list, (t_next + distance[next_edge], -t_next, next_edge)
+                    )
+        return [start], []
+
+    @staticmethod
+    def _reconstruct(parents: dict, state: tuple[int, int]):
+        path = []
+        nodes = []
+        while state is not None:
+            path.append(state[0])
+            parent = parents[state]
+            if parent is not None:
+                nodes.append(parent[2])
+                parent = parent[:2]
+            state = parent
+        path.reverse()
+        nodes.reverse()
+        return path, nodes
+
+    def move(self, move_list, used_junctions, timestep, debug=False):
+        G = self.G
+        occupancy = G.occupancy
+        table = self.reservations
+
+        start = stats.clock()
+        table.reset([len(ions) for ions in occupancy.edge_ions])
+        # move_list のイオンの後に、move_list にない entry 上のイオン (優先度は最も低い) をメモリゾーンに戻す
+        in_move_list = set(move_list)
+        agents = [(ion, self.distance) for ion in move_list] + [
+            (ion, self.memory_distance)
+            for idx in sorted(self.entry_path)
+            for ion in occupancy.edge_ions[idx]
+            if ion not in in_move_list
+        ]
+        plans = []
+        for ion, distance in agents:
+            edge = occupancy.ion_edge[ion]
+            if distance[edge] == math.inf:
+                plans.append((ion, edge, None))
+                continue
+            table.release(edge)
+            path, nodes = self.plan(edge, distance)
+            table.reserve(ion, path, nodes)
+            if len(path) > 1 and path[1] != edge:
+                plans.append((ion, edge, (path[1], nodes[0])))
+            else:
+                plans.append((ion, edge, ()))
+        stats.add_time("planning", start)
+
+        # 計画の最初の1ステップを実行する (予約が衝突しないので、どの順に動かしてもよい)
+        start = stats.clock()
+        for ion, edge, step in plans:
+            if step:
+                next_edge, node = step
+                move_ion(G, ion, occupancy.edges[edge], occupancy.edges[next_edge])
+                used_junctions[ion] = node
+        stats.add_time("planned_moves", start)
+        if debug:
+            check_ion_chains(G)
+
+        blocked_ions = 0
+        for ion, edge, step in plans[: len(move_list)]:
+            if step is None:
+                # 計画できないイオンはもとのやり方で動かす
+                blocked_ions += self.step(ion, used_junctions, timestep)
+            elif not step and edge != self.parking and ion not in used_junctions:
+                # 待つイオンの次のエッジ (最短経路の最初のもの) が動かないイオンに塞がれていれば押し出す
+                for next_edge, _ in self.successors[edge]:
+                    if self.distance[next_edge] == self.distance[edge] - 1:
+                        blocked_ions += self.push(
+                            ion, occupancy.edges[next_edge], used_junctions
+                        )
+                        break
+            if debug:
+                check_ion_chains(G)
+        return blocked_ions
+
+
+PLANNERS = {planner.name: planner for planner in (HeuristicPlanner, CooperativePlanner)}
+
+
+def make_planner(name: str, G: nx.Graph, graph_creator: GraphCreator) -> Planner:
+    """
+    Args:
+        name: One of PLANNERS ("heuristic" is the original behaviour).
+
+    Returns:
+        A planner for this graph (tables that depend only on the topology are built here).
+    """
+    if name not in PLANNERS:
+        raise ValueError(f"Unknown planner: {name}")
+    return PLANNERS[name](G, graph_creator)
@@ -0,0 +1,105 @@
+import pytest
+
+from graph_basics import GraphCreator
+from graph_utils import create_idc_dictionary
+from main import load_config, run_simulation, setup_simulation
+from occupancy import Occupancy
+from planner import CooperativePlanner, make_planner
+
+
+def create_graph(m: int, n: int) -> GraphCreator:
+    graph_creator = GraphCreator(m, n, 1, 1)
+    G = graph_creator.get_graph()
+    G.idc_dict = create_idc_dictionary(G)
+    G.occupancy = Occupancy(G)
+    return graph_creator
+
+
+def test_successor_table_follows_stride_rules():
+    """
+    Test that the exit and entry paths are one-way, that the parking edge is final,
+    and that distances count one edge per timestep.
+    """
+    graph_creator = create_graph(4, 4)
+    G = graph_creator.get_graph()
+    planner = CooperativePlanner(G, graph_creator)
+    idx = G.occupancy.idx
+    exit_path = [idx(edge) for edge in graph_creator.path_to_pz]
+    entry_path = [idx(edge) for edge in graph_creator.path_from_pz]
+    assert len(exit_path) == len(entry_path) == 2
+
+    assert planner.successors[planner.parking] == []
+    assert [edge for edge, _ in planner.successors[exit_path[-1]]] == [planner.parking]
+    assert [edge for edge, _ in planner.successors[entry_path[0]]] == [entry_path[1]]
+    assert all(
+        G.edges[G.occupancy.edges[edge]]["edge_type"] == "trap"
+        for edge, _ in planner.successors[entry_path[-1]]
+    )
+    assert planner.distance[exit_path[-1]] == 1
+    assert planner.distance[idx(((0, 0), (0, 1)))] == len(exit_path) + 6
+    assert planner.memory_distance[entry_path[0]] == len(entry_path)
+    assert planner.memory_distance[idx(((0, 0), (0, 1)))] == 0
+
+
+def test_plans_do_not_conflict():
+    """
+    Test that plans made in priority order never share an edge (except the parking
+    edge) or a node at the same time, and never enter an edge held by a later ion.
+    """
+    graph_creator = create_graph(4, 4)
+    G = graph_creator.get_graph()
+    trap_edges = [edge for edge in G.edges if G.edges[edge]["edge_type"] == "trap"]
+    for ion, edge in enumerate(trap_edges[-12:]):
+        G.occupancy.place(ion, edge)
+    planner = CooperativePlanner(G, graph_creator, window=4)
+    table = planner.reservations
+    table.reset([len(ions) for ions in G.occupancy.edge_ions])
+
+    ions = list(range(12))
+    plans = {}
+    for ion in ions:
+        start = G.occupancy.ion_edge[ion]
+        table.release(start)
+        path, nodes = planner.plan(start, planner.distance)
+        table.reserve(ion, path, nodes)
+        assert len(path) == len(nodes) + 1 <= planner.window + 1
+        plans[ion] = (path + [path[-1]] * planner.window, nodes)
+    assert any(len(set(path)) > 1 for path, _ in plans.values())
+
+    for t in range(planner.window + 1):
+        edges = [path[t] for path, _ in plans.values() if path[t] != planner.parking]
+        assert len(edges) == len(set(edges))
+    for t in range(planner.window):
+        nodes = [nodes[t] for _, nodes in plans.values() if t < len(nodes)]
+        nodes = [node for node in nodes if node is not None]
+        assert len(nodes) == len(set(nodes))
+    # 後で計画するイオンのいるエッジには入らない
+    for ion in ions:
+        later_starts = {plans[other][0][0] for other in ions[ion + 1 :]}
+        assert later_starts.isdisjoint(plans[ion][0][1:])
+
+
+def test_cooperative_planner_completes_runs():
+    """
+    Test that the cooperative planner keeps the ion chains consistent and finishes
+    a circuit on which the heuristic does not make progress.
+    """
+    for config_file, max_timesteps in [
+        ("cases/qft_5_no_swap.json", 1000),
+        ("cases/qft_8_no_swap.json", 2000),
+    ]:
+        simulation = setup_simulation(load_config(config_file))
+        front_layer = simulation[4]
+        timestep = run_simulation(
+            *simulation,
+            debug=True,
+            max_timesteps=max_timesteps,
+            planner="cooperative",
+        )
+        assert len(front_layer) == 0
+        assert timestep < max_timesteps
+
+
+def test_unknown_planner(graph3311: GraphCreator):
+    with pytest.raises(ValueError):
+        make_planner("astar", graph3311.get_graph(), graph3311)
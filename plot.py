@@ -1,6 +1,4 @@
 import networkx as nx
-import numpy as np
-import matplotlib.pyplot as plt
 from graph_utils import get_idx_from_idc
 
 
@@ -14,6 +12,13 @@ def plot_state(
     plot_cycle=False,
     filename="",
 ):
+    if not show_plot and not save_plot:
+        # 表示も保存もしない場合 (ヘッドレス実行) は描画しない
+        return
+    # numpy と matplotlib の import は重いので、実際に描画するときだけ読み込む
+    import numpy as np
+    import matplotlib.pyplot as plt
+
     idc_dict = graph.idc_dict
     pos = {(x, y): (y, -x) for i, (x, y) in enumerate(list(graph.nodes()))}
     if plot_ions is True:
@@ -40,7 +45,7 @@ def plot_state(
         np.random.seed()
 
     for edge in graph.edges:
-        ions = graph.edges[edge]["ions"]
+        ions = graph.occupancy.ions(edge)
         for ion in ions:
             try:
                 ion_holder[edge].append(ion)
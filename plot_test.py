@@ -0,0 +1,13 @@
+import copy
+
+from plot import plot_state
+
+
+def test_plot_state_headless_is_noop(graph3311):
+    """
+    Test that `plot_state` leaves the graph untouched when nothing is shown or saved.
+    """
+    G = graph3311.get_graph()
+    before = copy.deepcopy(list(G.edges(data=True)))
+    plot_state(G, ("Timestep", 0))
+    assert list(G.edges(data=True)) == before
@@ -1,55 +1,78 @@
+from typing import TYPE_CHECKING
+
 import networkx as nx
 from graph_basics import update_distance_map
 from graph_utils import (
+    JunctionReservations,
     get_ion_chains,
 )
-from compilation import get_front_layer, remove_node, manual_copy_dag, update_sequence
+from compilation import FrontLayer, HeapScheduler, update_sequence
 from move_from_pz import move_from_pz
+from instrumentation import stats
+from event_trace import trace
+
+if TYPE_CHECKING:
+    from eviction import EvictionPolicy
 
 
 def process_pz(
     G: nx.Graph,
-    used_junctions: dict[int, tuple[int, int]],
+    used_junctions: JunctionReservations,
     timestep: int,
     max_chains_in_parking: int,
-    dag_dep,
+    front_layer: FrontLayer,
     flat_seq,
     seq,
     parking_edge: tuple[tuple[int, int], tuple[int, int]],
     init_seq_len: int,
-    show_plot_move: bool = False,
+    scheduler: HeapScheduler | None = None,
+    eviction_policy: "EvictionPolicy | None" = None,
 ):
     """
     プロセッシングゾーンの処理を行う
+
+    scheduler を渡すと、ゲート順序の再計算にヒープを使うスケジューラを使う
+    eviction_policy を渡すと、パーキングエッジから出すイオンをそのポリシーで選ぶ
+    (渡さなければ find_unnecessary_ion)。ポリシーには再スケジュールと実行したゲートを知らせる
     """
-    parking_ions: list[int] = G.edges[parking_edge]["ions"]
+    parking_ions: list[int] = G.occupancy.ions(parking_edge)
     out_from_pz_ions: list[int] = []
     if len(parking_ions) == 0:
         # ion nothing but distance is changed
-        dag_dep = manual_copy_dag(dag_dep)
+        start = stats.clock()
         distance_map = update_distance_map(get_ion_chains(G), G.dist_dict)
-        gate_ids, next_node = update_sequence(dag_dep, distance_map)
+        gate_ids, next_node = update_sequence(front_layer, distance_map, scheduler)
         seq = [tuple(gate) for gate in gate_ids]
         flat_seq = [item for sublist in seq for item in sublist]
-        return dag_dep, seq, flat_seq, next_node, timestep
+        if eviction_policy is not None:
+            eviction_policy.on_schedule(seq)
+        stats.add_time("reschedule", start)
+        return front_layer, seq, flat_seq, next_node, timestep
 
     # キャパより多い場合，いらないイオンを出す
     if len(parking_ions) > max_chains_in_parking:
         # parking_ionsの中で，flat_seqの先頭から順で最も遅く出現するイオンをunnessecary_ionとして選ぶ
-        unnecessary_ion = find_unnecessary_ion(parking_ions, flat_seq)
+        if eviction_policy is not None:
+            unnecessary_ion = eviction_policy.choose(G, parking_ions, flat_seq)
+        else:
+            unnecessary_ion = find_unnecessary_ion(parking_ions, flat_seq)
         if unnecessary_ion == -1:
-            print("おかしい")
+            trace.warning("おかしい")
 
+        trace.emit("eviction", ion=unnecessary_ion)
         out_from_pz_ions.append(unnecessary_ion)
         # print("move_from_pz", "out_from_pz_ions", out_from_pz_ions)
-        move_from_pz(G, out_from_pz_ions, used_junctions, show_plot_move=show_plot_move)
+        start = stats.clock()
+        move_from_pz(G, out_from_pz_ions, used_junctions)
+        stats.add_time("pz_eviction", start)
+        stats.count("evicted_ions", len(out_from_pz_ions))
 
     # ゲート処理
     # remove dag nodes in front layer as possible from dag by using current parking ions
+    start = stats.clock()
     flag_dag_node_removed = True
     while flag_dag_node_removed:
         flag_dag_node_removed = False
-        front_layer = get_front_layer(dag_dep)
         # front_layerのイオンがparking_ionsに含まれているか確認し，含まれていれば，そのノード（ゲート）を実行し，seqから削除する
 
         ###################################
@@ -72,7 +95,7 @@ def process_pz(
         #             timestep += 1
         #             # timestep += 1
 
-        #         remove_node(dag_dep, dagNode)
+        #         front_layer.remove(dagNode)
         #         # print("after")
         #         # for node in dag_dep.get_nodes():
         #         #     print(f"Node ID: {node.node_id}, Qubits: {node.qargs}")
@@ -81,7 +104,7 @@ def process_pz(
         ###########################################
         # フロントレイヤーから1つのゲートだけ処理
         ###########################################
-        for dagNode in front_layer:
+        for dagNode in front_layer.nodes():
             qubit_indices = dagNode.qindices
             if all(qubit in parking_ions for qubit in qubit_indices):
                 # タイムステップをインクリメント
@@ -91,21 +114,31 @@ def process_pz(
                     timestep += 1
 
                 # ゲートを実行して削除
-                print(
-                    f"time step: {timestep}, execution of gate ({init_seq_len-len(seq)+1}/{init_seq_len}) on qubit(s) {qubit_indices}"
+                trace.timestep = timestep
+                trace.emit(
+                    "gate",
+                    gate=init_seq_len - len(seq) + 1,
+                    num_gates=init_seq_len,
+                    qubits=qubit_indices,
                 )
-                remove_node(dag_dep, dagNode)
+                front_layer.remove(dagNode)
+                if eviction_policy is not None:
+                    eviction_policy.on_gate(qubit_indices, timestep)
+                stats.count("gates_executed")
                 flag_dag_node_removed = False
                 break  # 1つのゲートを処理したらループを抜ける
+    stats.add_time("gate_execution", start)
 
-    dag_dep = manual_copy_dag(dag_dep)
+    start = stats.clock()
     distance_map = update_distance_map(get_ion_chains(G), G.dist_dict)
-    gate_ids, next_node = update_sequence(dag_dep, distance_map)
+    gate_ids, next_node = update_sequence(front_layer, distance_map, scheduler)
     seq = [tuple(gate) for gate in gate_ids]
     flat_seq = [item for sublist in seq for item in sublist]
-    # dag_drawer(dag_dep)
+    if eviction_policy is not None:
+        eviction_policy.on_schedule(seq)
+    stats.add_time("reschedule", start)
 
-    return dag_dep, seq, flat_seq, next_node, timestep
+    return front_layer, seq, flat_seq, next_node, timestep
 
 
 def find_unnecessary_ion(parking_ions: list, flat_seq: list) -> int:
@@ -0,0 +1,228 @@
+import math
+import re
+
+# qiskit を通さずに、rz / rx / rzz / h だけからなる OpenQASM 2.0 ファイルを1行ずつ読んで依存グラフを作る。
+# 結果は circuit_to_dagdependency と同じ (ノードの順序、直接の後続とその順序まで一致する) ので、
+# 読めないファイル (ほかのゲート、途中の barrier / measure、レジスタ全体への適用、式の括弧など) は None を返し、
+# 呼び出し側 (compilation.load_dependency_dag) が qiskit で読み直す。
+
+SUPPORTED_GATES = {"rz": 1, "rx": 1, "rzz": 2, "h": 1}
+# 同じ量子ビットに作用する2つのゲートは、その量子ビット上の生成子が同じなら可換 (rz と rzz は Z、rx は X)。
+# h は h とだけ可換
+GATE_BASIS = {"rz": "Z", "rzz": "Z", "rx": "X", "h": "H"}
+# qiskit の CommutationChecker は平均ゲート忠実度で恒等演算子に十分近いゲートを、何とでも可換とみなす。
+# 回転角 θ のゲートでは 1 - F_avg = d / (d + 1) * sin²(θ/2) (d = 2^量子ビット数) になる
+IDENTITY_TOLERANCE = 1e-12
+
+_NUMBER = r"(?:\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?|pi)"
+_EXPRESSION = re.compile(rf"\s*(-)?\s*({_NUMBER})((?:\s*[*/]\s*{_NUMBER})*)\s*")
+_OPERATION = re.compile(rf"\s*([*/])\s*({_NUMBER})")
+_GATE = re.compile(r"([a-z]+)\s*(?:\((.*)\))?\s+(.*)")
+_QUBIT = re.compile(r"\s*([A-Za-z_]\w*)\s*\[\s*(\d+)\s*\]\s*")
+_REGISTER = re.compile(r"(qreg|creg)\s+([A-Za-z_]\w*)\s*\[\s*(\d+)\s*\]")
+
+
+class UnsupportedQasm(Exception):
+    """
+    The file uses something outside of what `read_qasm_gates` understands.
+    """
+
+
+def parse_angle(expression: str) -> float:
+    """
+    Evaluate a gate parameter such as `3.74993896484375*pi`, `-pi/4` or `0.5`.
+    Only numbers and `pi` joined by `*` and `/` (left to right) are accepted.
+
+    Raises:
+        UnsupportedQasm: The expression has another form.
+    """
+    match = _EXPRESSION.fullmatch(expression)
+    if match is None:
+        raise UnsupportedQasm(expression)
+    sign, first, rest = match.groups()
+
+    def value(token: str) -> float:
+        return math.pi if token == "pi" else float(token)
+
+    angle = value(first)
+    if sign:
+        angle = -angle
+    for operator, token in _OPERATION.findall(rest):
+        if operator == "*":
+            angle *= value(token)
+        else:
+            angle /= value(token)
+    return angle
+
+
+def is_identity(name: str, angle: float | None) -> bool:
+    """
+    Whether qiskit regards the gate as the identity, i.e. as commuting with every gate.
+    """
+    if angle is None:
+        return False
+    dimension = 2 ** SUPPORTED_GATES[name]
+    return dimension / (dimension + 1) * math.sin(angle / 2) ** 2 < IDENTITY_TOLERANCE
+
+
+def iter_statements(filename: str):
+    """
+    Yield the statements of a QASM file without comments, one at a time.
+    """
+    pending = ""
+    with open(filename) as file:
+        for line in file:
+            line = line.split("//", 1)[0]
+            if ";" not in line:
+                pending += line
+                continue
+            *statements, pending = (pending + line).split(";")
+            for statement in statements:
+                statement = statement.strip()
+                if statement:
+                    yield statement
+    if pending.strip():
+        raise UnsupportedQasm(pending.strip())
+
+
+class DependencyBuilder:
+    """
+    Add gates one by one and keep the direct successors that qiskit's DAGDependency would give.
+
+    DAGDependency connects a new gate to every earlier gate it does not commute with,
+    unless that gate is already an ancestor of another such gate. Instead of checking
+    every earlier gate, each qubit keeps its last two runs of mutually commuting gates:
+    the gates on a qubit that do not commute with the new gate are the run just before
+    it (older ones are its ancestors), so only those runs have to be compared.
+    """
+
+    def __init__(self):
+        self.names: list[str] = []
+        self.qindices: list[tuple[int, ...]] = []
+        self.successors: list[list[int]] = []
+        self.predecessors: list[list[int]] = []
+        # qubit -> (basis of the last run, last run, run before it)
+        self.runs: dict[int, tuple[str, list[int], list[int]]] = {}
+
+    def add(self, name: str, qubits: tuple[int, ...], angle: float | None) -> None:
+        node_id = len(self.names)
+        self.names.append(name)
+        self.qindices.append(qubits)
+        self.successors.append([])
+        self.predecessors.append([])
+        if is_identity(name, angle):
+            return
+
+        basis = GATE_BASIS[name]
+        candidates = set()
+        for qubit in qubits:
+            run_basis, last_run, previous_run = self.runs.get(qubit, (None, [], []))
+            if run_basis == basis:
+                candidates.update(previous_run)
+                last_run.append(node_id)
+            else:
+                candidates.update(last_run)
+                self.runs[qubit] = (basis, [node_id], last_run)
+
+        for predecessor in sorted(self.maximal(candidates)):
+            self.successors[predecessor].append(node_id)
+            self.predecessors[node_id].append(predecessor)
+
+    def maximal(self, candidates: set[int]) -> set[int]:
+        """
+        The candidates that are not an ancestor of another candidate.
+        """
+        if len(candidates) <= 1:
+            return candidates
+        lowest = min(candidates)
+        ancestors = set()
+        stack = [
+            predecessor
+            for node_id in candidates
+            for predecessor in self.predecessors[node_id]
+            if predecessor >= lowest
+        ]
+        while stack:
+            node_id = stack.pop()
+            if node_id in ancestors:
+                continue
+            ancestors.add(node_id)
+            stack.extend(
+                predecessor
+                for predecessor in self.predecessors[node_id]
+                if predecessor >= lowest and predecessor not in ancestors
+            )
+        return candidates - ancestors
+
+
+def read_qasm_gates(
+    filename: str,
+) -> tuple[list[str], list[tuple[int, ...]], list[tuple[int, ...]]] | None:
+    """
+    Read a QASM file that uses only rz, rx, rzz and h gates, without qiskit.
+
+    Final measurements and barriers are dropped as in `compilation.load_dependency_dag`.
+
+    Args:
+        filename: The name of the QASM file.
+
+    Returns:
+        The gate names, the qubit indices of each gate and the direct successors of each
+        gate, numbered as in `circuit_to_dagdependency`, or None if the file uses
+        anything else.
+    """
+    builder = DependencyBuilder()
+    registers = {}
+    num_qubits = 0
+    finished = False
+    try:
+        for statement in iter_statements(filename):
+            keyword = statement.split(None, 1)[0]
+            if keyword == "OPENQASM":
+                if statement.split()[1:] != ["2.0"]:
+                    return None
+                continue
+            if keyword == "include":
+                if statement.split(None, 1)[1].strip() != '"qelib1.inc"':
+                    return None
+                continue
+            register = _REGISTER.fullmatch(statement)
+            if register is not None:
+                kind, name, size = register.groups()
+                if kind == "qreg":
+                    if name in registers:
+                        return None
+                    registers[name] = (num_qubits, int(size))
+                    num_qubits += int(size)
+                continue
+            if keyword in ("barrier", "measure"):
+                finished = True
+                continue
+
+            gate = _GATE.fullmatch(statement)
+            if finished or gate is None or gate.group(1) not in SUPPORTED_GATES:
+                return None
+            name, parameter, arguments = gate.groups()
+            if (parameter is None) != (name == "h"):
+                return None
+            qubits = []
+            for argument in arguments.split(","):
+                qubit = _QUBIT.fullmatch(argument)
+                if qubit is None or qubit.group(1) not in registers:
+                    return None
+                offset, size = registers[qubit.group(1)]
+                if int(qubit.group(2)) >= size:
+                    return None
+                qubits.append(offset + int(qubit.group(2)))
+            if len(qubits) != SUPPORTED_GATES[name] or len(set(qubits)) != len(qubits):
+                return None
+            angle = parse_angle(parameter) if parameter is not None else None
+            builder.add(name, tuple(qubits), angle)
+    except UnsupportedQasm:
+        return None
+
+    return (
+        builder.names,
+        builder.qindices,
+        [tuple(successors) for successors in builder.successors],
+    )
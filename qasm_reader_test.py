@@ -0,0 +1,102 @@
+import random
+
+import pytest
+import compilation
+from compilation import load_dependency_dag, qiskit_dependency_dag
+from qasm_reader import parse_angle, read_qasm_gates
+
+QASM_FILES = [
+    "qft_without_swaps/qft_no_swaps_nativegates_quantinuum_tket_5.qasm",
+    "qft_without_swaps/qft_no_swaps_nativegates_quantinuum_tket_10.qasm",
+    "full_register_access/full_register_access_8.qasm",
+]
+HEADER = 'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[4];\ncreg c[4];\n'
+
+
+def qiskit_gates(filename: str):
+    dag = qiskit_dependency_dag(filename)
+    return (
+        [node.name for node in dag.nodes],
+        [tuple(node.qindices) for node in dag.nodes],
+        dag.successors,
+    )
+
+
+@pytest.mark.parametrize("filename", QASM_FILES)
+def test_read_qasm_gates_matches_qiskit(filename: str):
+    """
+    Test that the native reader gives the same gates and direct successors as qiskit.
+    """
+    assert read_qasm_gates(filename) == qiskit_gates(filename)
+
+
+def test_read_qasm_gates_matches_qiskit_on_random_circuits(tmp_path):
+    """
+    Test the commutation rules, including rotations that qiskit treats as the identity.
+    """
+    random.seed(0)
+    angles = ["0.5*pi", "0", "2*pi", "1e-7", "-pi/4", "3.74993896484375*pi", "1e-5"]
+    for i in range(50):
+        lines = [HEADER]
+        for _ in range(random.randint(1, 30)):
+            gate = random.choice(["rz", "rx", "rzz", "h"])
+            if gate == "rzz":
+                a, b = random.sample(range(4), 2)
+                lines.append(f"rzz({random.choice(angles)}) q[{a}],q[{b}];\n")
+            elif gate == "h":
+                lines.append(f"h q[{random.randrange(4)}];\n")
+            else:
+                lines.append(
+                    f"{gate}({random.choice(angles)}) q[{random.randrange(4)}];\n"
+                )
+        lines.append("barrier q[0],q[1];\nmeasure q[0] -> c[0];\n")
+        filename = tmp_path / f"random_{i}.qasm"
+        filename.write_text("".join(lines))
+        assert read_qasm_gates(str(filename)) == qiskit_gates(str(filename)), i
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        "cx q[0],q[1];\n",
+        "h q;\n",
+        "rz(sin(0.5)) q[0];\n",
+        "rz(0.5*pi) q[0];\nmeasure q[0] -> c[0];\nrz(0.5*pi) q[1];\n",
+        "rz(0.5*pi) q[7];\n",
+    ],
+)
+def test_read_qasm_gates_rejects_unsupported(tmp_path, body: str):
+    """
+    Test that anything outside the supported subset is left to qiskit.
+    """
+    filename = tmp_path / "circuit.qasm"
+    filename.write_text(HEADER + body)
+    assert read_qasm_gates(str(filename)) is None
+
+
+def test_load_dependency_dag_falls_back_to_qiskit(tmp_path, monkeypatch):
+    """
+    Test that `load_dependency_dag` converts unsupported circuits with qiskit.
+    """
+    filename = tmp_path / "circuit.qasm"
+    filename.write_text(HEADER + "h q[0];\ncx q[0],q[1];\n")
+    calls = []
+    monkeypatch.setattr(
+        compilation,
+        "qiskit_dependency_dag",
+        lambda filename: calls.append(filename) or qiskit_dependency_dag(filename),
+    )
+    dag = load_dependency_dag(str(filename))
+    assert len(calls) == 1
+    assert [(node.name, node.qindices) for node in dag.nodes] == [
+        ("h", [0]),
+        ("cx", [0, 1]),
+    ]
+    assert dag.successors == [(1,), ()]
+
+
+def test_parse_angle():
+    assert parse_angle("3.74993896484375*pi") == 3.74993896484375 * 3.141592653589793
+    assert parse_angle("-pi/4") == -3.141592653589793 / 4
+    assert parse_angle(" 0.5 ") == 0.5
+    assert parse_angle("2*pi/3") == 2 * 3.141592653589793 / 3
@@ -0,0 +1,205 @@
+# Description: event_trace で記録したトレースから、タイムステップごとのイオンの配置を画像に描き、アニメーションにまとめる
+# Usage: python3 render.py TRACE [-o OUTPUT_DIR] [--every N] [--start T] [--stop T] [-j N] [--animation FILE.gif] [--fps N]
+#   例: python3 main.py cases/qft_5_no_swap.json --trace traces/qft_5.jsonl --quiet
+#       python3 render.py traces/qft_5.jsonl --every 10 --animation traces/qft_5.gif
+#   グラフはトレースの start イベントの arch から GraphCreator で作り直す。
+#   レイアウト (ノードの位置と色、エッジの線分、イオンの色) は1回だけ計算してワーカープロセスに渡し、
+#   各ワーカーは図を1回だけ作って、フレームごとにエッジの色とラベルだけを書き換えて保存する。
+#   フレームは OUTPUT_DIR/timestep_XXXXXX.png (そのタイムステップの終わりの配置)。
+#   --every N は N タイムステップごと (タイムステップは飛ぶので、N の倍数以降の最初のタイムステップ) に描く
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from event_trace import TraceReader, apply_move  # noqa: E402
+from graph_basics import GraphCreator  # noqa: E402
+from graph_utils import create_idc_dictionary  # noqa: E402
+from occupancy import Occupancy  # noqa: E402
+
+
+class FrameLayout:
+    """
+    フレームごとに変わらない描画の情報。エッジはトレースと同じ番号 (create_idc_dictionary) の順に並べる
+    """
+
+    def __init__(self, arch: list[int]):
+        import numpy as np
+
+        m, n, v, h = arch
+        G = GraphCreator(m, n, v, h).get_graph()
+        G.idc_dict = create_idc_dictionary(G)
+        self.edges = Occupancy(G).edges
+        self.nodes = list(G.nodes())
+        self.pos = {(x, y): (y, -x) for x, y in self.nodes}
+        self.node_colors = [G.nodes[node]["color"] for node in self.nodes]
+        # plot_state と同じ色 (先頭のイオンの番号で引く)
+        self.colors = [
+            tuple(rgb)
+            for rgb in np.round(np.random.RandomState(0).rand(len(self.edges), 3), 1)
+        ]
+        corner = max(self.nodes)
+        self.figsize = (max(corner[1], 1) * 2, max(corner[0], 1) * 2)
+
+
+class FrameCanvas:
+    """
+    1つのワーカーが使い回す図。ノードとエッジは最初に1回だけ描き、draw ではエッジの色とラベルだけを変える
+    """
+
+    def __init__(self, layout: FrameLayout):
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import LineCollection
+
+        self.layout = layout
+        self.figure, ax = plt.subplots(figsize=layout.figsize)
+        ax.axis("off")
+        segments = [(layout.pos[u], layout.pos[v]) for u, v in layout.edges]
+        self.lines = LineCollection(segments, linewidths=8, colors="k", zorder=1)
+        ax.add_collection(self.lines)
+        xs, ys = zip(*(layout.pos[node] for node in layout.nodes))
+        ax.scatter(xs, ys, s=300, c=layout.node_colors, zorder=2)
+        for node in layout.nodes:
+            ax.text(*layout.pos[node], str(node), fontsize=6, ha="center", va="center")
+        self.labels = [
+            ax.text(
+                (x1 + x2) / 2,
+                (y1 + y2) / 2,
+                "",
+                fontsize=8,
+                ha="center",
+                va="center",
+                zorder=3,
+                bbox={"boxstyle": "round", "ec": "white", "fc": "white"},
+            )
+            for (x1, y1), (x2, y2) in segments
+        ]
+        ax.autoscale_view()
+        ax.margins(0.05)
+        self.title = ax.set_title("")
+
+    def draw(self, timestep: int, edge_ions: list[list[int]], path: Path) -> None:
+        colors = self.layout.colors
+        self.lines.set_color(
+            [colors[ions[0] % len(colors)] if ions else "k" for ions in edge_ions]
+        )
+        for label, ions in zip(self.labels, edge_ions):
+            label.set_text(str(ions))
+            label.set_visible(bool(ions))
+        self.title.set_text(f"Timestep {timestep}")
+        self.figure.savefig(path)
+
+
+def frame_states(
+    reader: TraceReader,
+    every: int = 1,
+    start: int | None = None,
+    stop: int | None = None,
+):
+    """
+    トレースの move イベントを順に当てはめ、描くタイムステップ (start <= t < stop) の終わりの配置を
+    (timestep, edge_ions) で返す
+    """
+    edge_ions = None
+    current = None
+    next_timestep = 0 if start is None else start
+    for event in reader.events(stop=stop):
+        if current is not None and event["t"] != current and current >= next_timestep:
+            yield current, [ions.copy() for ions in edge_ions]
+            next_timestep = (current // every + 1) * every
+        current = event["t"]
+        if event["event"] == "start":
+            edge_ions = [list(ions) for ions in event["edge_ions"]]
+        elif event["event"] == "move":
+            apply_move(edge_ions, event)
+    if current is not None and current >= next_timestep:
+        yield current, [ions.copy() for ions in edge_ions]
+
+
+_canvas: FrameCanvas | None = None
+
+
+def _init_worker(layout: FrameLayout) -> None:
+    global _canvas
+    _canvas = FrameCanvas(layout)
+
+
+def _render_frame(frame: tuple[int, list[list[int]], Path]) -> Path:
+    timestep, edge_ions, path = frame
+    _canvas.draw(timestep, edge_ions, path)
+    return path
+
+
+def render_frames(
+    trace_file: str | Path,
+    output_dir: str | Path,
+    every: int = 1,
+    start: int | None = None,
+    stop: int | None = None,
+    jobs: int | None = None,
+) -> list[Path]:
+    """
+    トレースのフレームを jobs 個のワーカープロセスで描き、保存した画像のパスをタイムステップ順に返す
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with TraceReader(trace_file) as reader:
+        first = next(reader.events(), None)
+        if first is None or first["event"] != "start":
+            raise ValueError(f"{trace_file} does not start with a start event")
+        layout = FrameLayout(first["arch"])
+        if len(layout.edges) != len(first["edge_ions"]):
+            raise ValueError("The trace was recorded on a different graph")
+        frames = (
+            (timestep, edge_ions, output_dir / f"timestep_{timestep:06d}.png")
+            for timestep, edge_ions in frame_states(reader, every, start, stop)
+        )
+        with ProcessPoolExecutor(
+            max_workers=jobs, initializer=_init_worker, initargs=(layout,)
+        ) as executor:
+            return list(executor.map(_render_frame, frames, chunksize=8))
+
+
+def write_animation(frames: list[Path], path: str | Path, fps: float = 5) -> None:
+    """
+    保存したフレームを GIF にまとめる
+    """
+    from PIL import Image
+
+    images = [Image.open(frame) for frame in frames]
+    images[0].save(
+        path,
+        save_all=True,
+        append_images=images[1:],
+        duration=1000 / fps,
+        loop=0,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("trace", type=Path)
+    parser.add_argument("-o", "--output-dir", type=Path)
+    parser.add_argument("--every", type=int, default=1)
+    parser.add_argument("--start", type=int)
+    parser.add_argument("--stop", type=int)
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--animation", type=Path, help="also write a GIF")
+    parser.add_argument("--fps", type=float, default=5)
+    args = parser.parse_args()
+
+    output_dir = args.output_dir or args.trace.with_name(args.trace.stem + "_frames")
+    frames = render_frames(
+        args.trace, output_dir, args.every, args.start, args.stop, args.jobs
+    )
+    print(f"{len(frames)} frames in {output_dir}")
+    if args.animation is not None and frames:
+        write_animation(frames, args.animation, args.fps)
+        print(f"animation: {args.animation}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import sys
+
+from event_trace import EventTrace, TraceReader, trace
+from main import load_config, run_simulation, setup_simulation
+from render import frame_states, render_frames, write_animation
+
+
+def write_trace(path, timesteps: list[int]):
+    """
+    A trace on a 3x3 grid where ion 0 moves on to the next of edges 0, 1, 2
+    once per entry in timesteps.
+    """
+    event_trace = EventTrace()
+    event_trace.open(path)
+    event_trace.emit("start", arch=[3, 3, 1, 1], edge_ions=[[0], [], []])
+    for move, timestep in enumerate(timesteps):
+        event_trace.timestep = timestep
+        event_trace.emit("move", ion=0, source=move % 3, target=(move + 1) % 3)
+    event_trace.close()
+
+
+def test_frame_states_every_nth_timestep(tmp_path):
+    """
+    Test that one frame is taken per `every` timesteps, even when timesteps skip,
+    and that each frame shows the placement at the end of its timestep.
+    """
+    write_trace(tmp_path / "trace.jsonl", [0, 0, 3, 5, 6, 12, 13])
+    with TraceReader(tmp_path / "trace.jsonl") as reader:
+        frames = list(frame_states(reader, every=5))
+    assert frames == [
+        (0, [[], [], [0]]),
+        (5, [[], [0], []]),
+        (12, [[0], [], []]),
+    ]
+
+
+def test_render_frames_from_simulation(tmp_path):
+    """
+    Test that a recorded run is rendered by worker processes, and that the
+    simulation itself does not load matplotlib.
+    """
+    simulation = setup_simulation(load_config("cases/full_register_access_6.json"))
+    trace.open(tmp_path / "trace.jsonl")
+    try:
+        timestep = run_simulation(*simulation)
+    finally:
+        trace.close()
+
+    frames = render_frames(tmp_path / "trace.jsonl", tmp_path / "frames", jobs=2)
+    assert frames[-1].name == f"timestep_{timestep:06d}.png"
+    assert sorted(path.name for path in (tmp_path / "frames").iterdir()) == [
+        frame.name for frame in frames
+    ]
+    assert all(frame.read_bytes()[:8] == b"\x89PNG\r\n\x1a\n" for frame in frames)
+    assert "matplotlib.pyplot" not in sys.modules
+
+    write_animation(frames, tmp_path / "run.gif")
+    assert (tmp_path / "run.gif").read_bytes()[:6] == b"GIF89a"
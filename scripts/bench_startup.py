@@ -0,0 +1,76 @@
+# Description: cases/ にあるアーキテクチャごとに、グラフ生成と create_dist_dict にかかる時間を計測するスクリプト
+# Usage: python3 scripts/bench_startup.py [--repeat N] [--reference]
+#   --reference を付けると、エッジごとに最短経路を2回探索する以前の実装の時間も計測し、結果が一致するか確認する
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import networkx as nx
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from graph_basics import GraphCreator  # noqa: E402
+from graph_utils import create_dist_dict, dist_weight  # noqa: E402
+
+
+def create_dist_dict_per_edge(G: nx.Graph, processing_zone: tuple[int, int]) -> dict:
+    """以前の実装 (エッジの両端からPZまでをそれぞれ探索する)"""
+    dist_dict = {}
+    for edge in G.edges():
+        dist_dict[edge] = min(
+            nx.shortest_path_length(G, node, processing_zone, weight=dist_weight)
+            for node in edge
+        )
+    return dist_dict
+
+
+def best_of(repeat: int, func) -> tuple[float, object]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--reference", action="store_true")
+    args = parser.parse_args()
+
+    archs = set()
+    for config_file in sorted((ROOT / "cases").glob("*.json")):
+        with config_file.open("r") as f:
+            archs.add(tuple(json.load(f)["arch"]))
+
+    header = f"{'arch':<16}{'edges':>7}{'graph [ms]':>12}{'dist [ms]':>12}"
+    if args.reference:
+        header += f"{'per-edge [ms]':>15}"
+    print(header)
+
+    for arch in sorted(archs, key=lambda a: GraphCreator(*a).get_graph().size()):
+        graph_time, graph_creator = best_of(args.repeat, lambda: GraphCreator(*arch))
+        G = graph_creator.get_graph()
+        dist_time, dist_dict = best_of(
+            args.repeat,
+            lambda: create_dist_dict(
+                G, graph_creator.exit, graph_creator.processing_zone
+            ),
+        )
+        line = f"{str(arch):<16}{G.size():>7}{graph_time * 1e3:>12.2f}{dist_time * 1e3:>12.2f}"
+        if args.reference:
+            ref_time, ref_dict = best_of(
+                1, lambda: create_dist_dict_per_edge(G, graph_creator.processing_zone)
+            )
+            assert ref_dict == dist_dict, f"dist_dict mismatch for arch {arch}"
+            line += f"{ref_time * 1e3:>15.2f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
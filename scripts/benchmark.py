@@ -0,0 +1,298 @@
+# Description: ケースごとに、実行の段階 (グラフ生成, create_dist_dict, QASM の読み込みと依存グラフの構築, run_simulation) の時間を計測して保存し、
+#              保存した2回分の結果を比較するスクリプト
+# Usage: python3 scripts/benchmark.py run [--suite cases|qft|all] [--qft-sizes N ...] [--repeat N] [--max-timesteps N] [--cache] [-o FILE] [--baseline FILE]
+#        python3 scripts/benchmark.py imports [--repeat N]
+#        python3 scripts/benchmark.py compare BASE NEW [--threshold PCT]
+#   run: cases/full_register_access_*.json と qft_without_swaps (既定では 10〜100 量子ビット) を計測し、benchmarks/ に JSON で保存する
+#        各段階の時間は --repeat 回のうち最短のもの。--baseline を付けると保存した結果と比較する
+#        --cache を付けると parse は .dag_cache/ のキャッシュから読む (既定では毎回 QASM を解析する)
+#        モジュールの import 時間 (新しいプロセスでの import main など) も計測して保存する
+#   imports: import 時間と、そのとき読み込まれた重い依存 (numpy, matplotlib, qiskit, scipy) だけを表示する
+#   compare: 段階ごとと import の変化を % で表示し、--threshold を超えて遅くなったものがあれば終了コード 1 を返す
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from graph_basics import GraphCreator  # noqa: E402
+from dag_cache import DagCache  # noqa: E402
+from main import load_config, run_simulation, setup_simulation  # noqa: E402
+from event_trace import trace  # noqa: E402
+
+PHASES = ["graph", "dist_dict", "routing_table", "parse", "sequence", "simulate"]
+# ワーカープロセスが起動時に読み込むモジュール。描画や qiskit へのフォールバックがなければ重い依存は読み込まない
+IMPORT_MODULES = ["main", "batch", "compilation", "graph_basics", "plot"]
+HEAVY_MODULES = ["numpy", "matplotlib", "qiskit", "scipy"]
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+print(",".join(name for name in {heavy!r} if name in sys.modules))
+"""
+QFT_FILE = "qft_without_swaps/qft_no_swaps_nativegates_quantinuum_tket_{}.qasm"
+
+
+def arch_for_qubits(n_qubits: int) -> list[int]:
+    """
+    n_qubits 個のイオンを置いても、トラップの半分以上が空いている最小の正方格子 (1, 1)
+    """
+    k = 2
+    while True:
+        G = GraphCreator(k, k, 1, 1).get_graph()
+        traps = sum(1 for *_, t in G.edges(data="edge_type") if t == "trap")
+        if traps >= 2 * n_qubits:
+            return [k, k, 1, 1]
+        k += 1
+
+
+def collect_configs(suite: str, qft_sizes: list[int]) -> dict[str, dict]:
+    configs = {}
+    if suite in ("cases", "all"):
+        for config_file in sorted(
+            (ROOT / "cases").glob("full_register_access_*.json"),
+            key=lambda path: int(path.stem.rsplit("_", 1)[1]),
+        ):
+            configs[config_file.stem] = load_config(config_file)
+    if suite in ("qft", "all"):
+        for n_qubits in qft_sizes:
+            configs[f"qft_{n_qubits}_no_swap"] = {
+                "arch": arch_for_qubits(n_qubits),
+                "num_ion_chains": n_qubits,
+                "qu_alg": QFT_FILE.format(n_qubits),
+            }
+    return configs
+
+
+def run_once(
+    config: dict, max_timesteps: int, cache: DagCache | None = None
+) -> tuple[dict[str, float], int, bool]:
+    timings = {}
+    # 標準出力は捨てるので、コンソールへのイベントも書かない (print の時間を計測に含めない)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(
+        devnull
+    ), trace.muted():
+        simulation = setup_simulation(config, timings, cache)
+        front_layer = simulation[4]
+        start = time.perf_counter()
+        timestep = run_simulation(*simulation, max_timesteps=max_timesteps)
+        timings["simulate"] = time.perf_counter() - start
+    return timings, timestep, len(front_layer) == 0
+
+
+def measure_import(module: str, repeat: int) -> dict:
+    """
+    新しいプロセスで module を import する時間 ([s], repeat 回のうち最短) と、読み込まれた重い依存
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES),
+            ],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.splitlines()
+        best = min(best, float(output[0]))
+    heavy = output[1].split(",") if len(output) > 1 and output[1] else []
+    return {"seconds": best, "heavy_modules": heavy}
+
+
+def measure_imports(repeat: int) -> dict[str, dict]:
+    imports = {}
+    print(f"{'import':<28}{'[ms]':>14}  heavy modules")
+    for module in IMPORT_MODULES:
+        imports[module] = measure_import(module, repeat)
+        print(
+            f"{module:<28}{imports[module]['seconds'] * 1e3:>14.1f}  "
+            + (", ".join(imports[module]["heavy_modules"]) or "-")
+        )
+    return imports
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def format_row(name: str, values: list[str]) -> str:
+    return f"{name:<28}" + "".join(f"{value:>14}" for value in values)
+
+
+def run(args):
+    configs = collect_configs(args.suite, args.qft_sizes)
+    cache = DagCache() if args.cache else None
+    results = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "repeat": args.repeat,
+            "max_timesteps": args.max_timesteps,
+            "cache": args.cache,
+        },
+        "imports": measure_imports(args.repeat),
+        "benchmarks": {},
+    }
+
+    print(format_row("benchmark [ms]", PHASES + ["timestep"]))
+    for name, config in configs.items():
+        max_timesteps = min(
+            config.get("max_timesteps", args.max_timesteps), args.max_timesteps
+        )
+        best = {}
+        for _ in range(args.repeat):
+            timings, timestep, completed = run_once(config, max_timesteps, cache)
+            for phase, seconds in timings.items():
+                best[phase] = min(best.get(phase, float("inf")), seconds)
+        results["benchmarks"][name] = {
+            "arch": config["arch"],
+            "num_ion_chains": config["num_ion_chains"],
+            "qu_alg": config["qu_alg"],
+            "max_timesteps": max_timesteps,
+            "timestep": timestep,
+            "completed": completed,
+            "timings": best,
+            "total": sum(best.values()),
+        }
+        print(
+            format_row(
+                name,
+                [f"{best[phase] * 1e3:.2f}" for phase in PHASES]
+                + [f"{timestep}{'' if completed else '*'}"],
+            )
+        )
+    print("* stopped at max_timesteps")
+
+    output = args.output or ROOT / "benchmarks" / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("w") as f:
+        json.dump(results, f, indent=2)
+    print(f"saved to {output}")
+
+    if args.baseline:
+        return compare(args.baseline, output, args.threshold, args.min_time)
+    return 0
+
+
+def compare(base_file: Path, new_file: Path, threshold: float, min_time: float) -> int:
+    """
+    段階ごとの変化を % で表示する。threshold [%] を超えて遅くなった段階があれば 1 を返す
+    (base の時間が min_time [s] 未満の段階は誤差が大きいので判定しない)
+    """
+    with Path(base_file).open("r") as f:
+        base = json.load(f)
+    with Path(new_file).open("r") as f:
+        new = json.load(f)
+    print(f"base: {base['meta']['git']} ({base['meta']['created']})")
+    print(f"new:  {new['meta']['git']} ({new['meta']['created']})")
+
+    regressions = []
+    print(format_row("change [%]", PHASES + ["total"]))
+    for name, new_result in new["benchmarks"].items():
+        base_result = base["benchmarks"].get(name)
+        if base_result is None:
+            continue
+        if base_result["timestep"] != new_result["timestep"]:
+            print(
+                f"{name}: timestep changed "
+                f"({base_result['timestep']} -> {new_result['timestep']})"
+            )
+        pairs = [
+            (phase, base_result["timings"].get(phase), new_result["timings"].get(phase))
+            for phase in PHASES
+        ]
+        pairs.append(("total", base_result["total"], new_result["total"]))
+        values = []
+        for phase, old, now in pairs:
+            if not old or now is None:
+                values.append("-")
+                continue
+            change = (now - old) / old * 100
+            regressed = change > threshold and old >= min_time
+            if regressed:
+                regressions.append(f"{name}/{phase}")
+            values.append(f"{change:+.1f}{'!' if regressed else ''}")
+        print(format_row(name, values))
+
+    for module, new_import in new.get("imports", {}).items():
+        base_import = base.get("imports", {}).get(module)
+        if base_import is None:
+            continue
+        old, now = base_import["seconds"], new_import["seconds"]
+        change = (now - old) / old * 100
+        regressed = change > threshold and old >= min_time
+        if regressed:
+            regressions.append(f"import {module}")
+        print(
+            format_row(f"import {module}", [f"{change:+.1f}{'!' if regressed else ''}"])
+        )
+
+    if regressions:
+        print(f"regressions over {threshold}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run")
+    run_parser.add_argument("--suite", choices=["cases", "qft", "all"], default="all")
+    run_parser.add_argument(
+        "--qft-sizes", type=int, nargs="+", default=list(range(10, 101, 10))
+    )
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--max-timesteps", type=int, default=2000)
+    run_parser.add_argument("--cache", action="store_true")
+    run_parser.add_argument("-o", "--output", type=Path)
+    run_parser.add_argument("--baseline", type=Path)
+
+    imports_parser = subparsers.add_parser("imports")
+    imports_parser.add_argument("--repeat", type=int, default=3)
+
+    compare_parser = subparsers.add_parser("compare")
+    compare_parser.add_argument("base", type=Path)
+    compare_parser.add_argument("new", type=Path)
+
+    for sub in (run_parser, compare_parser):
+        sub.add_argument("--threshold", type=float, default=10.0)
+        sub.add_argument("--min-time", type=float, default=0.001)
+    args = parser.parse_args()
+
+    # ケースの qu_alg はリポジトリのルートからの相対パス
+    os.chdir(ROOT)
+    if args.command == "run":
+        sys.exit(run(args))
+    if args.command == "imports":
+        measure_imports(args.repeat)
+        sys.exit(0)
+    sys.exit(compare(args.base, args.new, args.threshold, args.min_time))
+
+
+if __name__ == "__main__":
+    main()
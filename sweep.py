@@ -0,0 +1,251 @@
+# Description: ケースの設定 (arch, num_ion_chains, 初期配置の seed, max_chains_in_parking, eviction, planner) の組み合わせを
+#              並列のワーカープロセスで実行し、結果をキャッシュ (JSONL) に追記して、タイムステップと実行時間の表を出す
+# Usage: python3 sweep.py CASE_OR_GLOB [CASE_OR_GLOB ...] [--arch M,N,V,H ...] [--num-ion-chains N ...] [--seed N ...]
+#                         [--max-chains-in-parking N ...] [--eviction NAME ...] [--planner NAME ...]
+#                         [-j N] [--timeout SEC] [-o RESULTS.jsonl]
+#   例: python3 sweep.py cases/qft_5_no_swap.json --arch 2,4,1,1 3,3,1,1 --seed 0 1 2 --max-chains-in-parking 2 3 4
+#   指定しなかったパラメータはケースの値 (seed は 0, max_chains_in_parking は 3, eviction は move_list,
+#   planner は heuristic) を使う。
+#   ワーカーは空いたものから次の組み合わせを取るので、実行時間がばらついても遊ぶワーカーは出ない。
+#   1回の実行が --timeout 秒を超えたら打ち切って timeout として記録する。
+#   結果は既定で results/sweep.jsonl に1行ずつ追記し、同じ組み合わせ (QASM ファイルの内容も含む) は次から実行しない
+#   (timeout と error は次も実行する。--rerun ですべて実行し直す)
+
+import argparse
+import contextlib
+import hashlib
+import itertools
+import json
+import os
+import signal
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from batch import expand_cases  # noqa: E402
+from dag_cache import DagCache  # noqa: E402
+from eviction import EVICTION_POLICIES  # noqa: E402
+from event_trace import trace  # noqa: E402
+from main import load_config, run_simulation, setup_simulation  # noqa: E402
+from planner import PLANNERS  # noqa: E402
+
+# 組み合わせを決めるパラメータ。config に無いものは DEFAULTS を使う
+PARAMETERS = [
+    "arch",
+    "num_ion_chains",
+    "seed",
+    "max_chains_in_parking",
+    "eviction",
+    "planner",
+]
+DEFAULTS = {
+    "seed": 0,
+    "max_chains_in_parking": 3,
+    "eviction": "move_list",
+    "planner": "heuristic",
+}
+
+
+class RunTimeout(Exception):
+    pass
+
+
+def expand_grid(config: dict, grid: dict[str, list]) -> list[dict]:
+    """
+    config の値を grid の各パラメータの値で置き換えた、すべての組み合わせ (grid の値の順)
+    """
+    base = {**DEFAULTS, **config}
+    names = [name for name in PARAMETERS if grid.get(name)]
+    return [
+        {**base, **dict(zip(names, values))}
+        for values in itertools.product(*(grid[name] for name in names))
+    ]
+
+
+def run_key(config: dict) -> str:
+    """
+    キャッシュのキー。パラメータ、max_timesteps と QASM ファイルの内容から決まる
+    """
+    with open(config["qu_alg"], "rb") as f:
+        qasm_digest = hashlib.sha256(f.read()).hexdigest()
+    key = {name: config[name] for name in PARAMETERS + ["max_timesteps", "qu_alg"]}
+    key["qasm_sha256"] = qasm_digest
+    return json.dumps(key, sort_keys=True)
+
+
+def load_results(path: Path) -> dict[str, dict]:
+    """
+    キャッシュを読む。書きかけの行 (途中で止めた場合) は読み飛ばす
+    """
+    results = {}
+    if not path.exists():
+        return results
+    with path.open("r") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            results[result["key"]] = result
+    return results
+
+
+def _raise_timeout(signum, frame):
+    raise RunTimeout()
+
+
+def run_one(config: dict, timeout: float | None = None, use_cache: bool = True) -> dict:
+    """
+    1つの組み合わせを実行する (ワーカープロセスで呼ばれる)。
+    timeout 秒を超えたら打ち切り、例外は error に記録する
+    """
+    result = {"key": run_key(config), "config": config, "status": "ok"}
+    if timeout:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    start = time.perf_counter()
+    try:
+        # 標準出力は捨てるので、コンソールへのイベントも書かない
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(
+            devnull
+        ), trace.muted():
+            simulation = setup_simulation(
+                config, cache=DagCache() if use_cache else None
+            )
+            front_layer = simulation[4]
+            result["timestep"] = run_simulation(
+                *simulation,
+                max_timesteps=config["max_timesteps"],
+                eviction=config["eviction"],
+                max_chains_in_parking=config["max_chains_in_parking"],
+                planner=config["planner"],
+            )
+        result["completed"] = len(front_layer) == 0
+    except RunTimeout:
+        result["status"] = "timeout"
+    except Exception:
+        result["status"] = "error"
+        result["error"] = traceback.format_exc()
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    result["wall_time"] = time.perf_counter() - start
+    return result
+
+
+def run_sweep(
+    configs: list[dict],
+    results_file: Path,
+    jobs: int | None = None,
+    timeout: float | None = None,
+    rerun: bool = False,
+    use_cache: bool = True,
+) -> list[dict]:
+    """
+    configs のうち results_file に正常に終わった結果が無いものを実行して追記し、configs の順に結果を返す
+    """
+    results = load_results(results_file)
+    keys = [run_key(config) for config in configs]
+    pending = {}
+    for key, config in zip(keys, configs):
+        cached = key in results and results[key]["status"] == "ok"
+        if (rerun or not cached) and key not in pending:
+            pending[key] = config
+    print(f"{len(configs)} runs, {len(configs) - len(pending)} cached")
+
+    if pending:
+        results_file.parent.mkdir(parents=True, exist_ok=True)
+        with ProcessPoolExecutor(max_workers=jobs) as executor, results_file.open(
+            "a"
+        ) as f:
+            futures = [
+                executor.submit(run_one, config, timeout, use_cache)
+                for config in pending.values()
+            ]
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                results[result["key"]] = result
+                f.write(json.dumps(result) + "\n")
+                f.flush()
+                print(f"[{done}/{len(futures)}] {format_params(result['config'])}")
+    return [results[key] for key in keys]
+
+
+def format_params(config: dict) -> str:
+    arch = ",".join(str(x) for x in config["arch"])
+    return (
+        f"{Path(config['qu_alg']).stem} arch={arch} ions={config['num_ion_chains']} "
+        f"seed={config['seed']} parking={config['max_chains_in_parking']} "
+        f"eviction={config['eviction']} planner={config['planner']}"
+    )
+
+
+def summary_table(results: list[dict]) -> str:
+    """
+    組み合わせごとのタイムステップと実行時間の表 (* は max_timesteps で打ち切り)
+    """
+    lines = [
+        f"{'qu_alg':<44}{'arch':<12}{'ions':>5}{'seed':>5}{'parking':>8}  "
+        f"{'eviction':<18}{'planner':<13}{'timestep':>10}{'wall [s]':>10}"
+    ]
+    for result in results:
+        config = result["config"]
+        if result["status"] == "ok":
+            timestep = f"{result['timestep']}{'' if result['completed'] else '*'}"
+        else:
+            timestep = result["status"]
+        lines.append(
+            f"{Path(config['qu_alg']).stem:<44}"
+            f"{','.join(str(x) for x in config['arch']):<12}"
+            f"{config['num_ion_chains']:>5}{config['seed']:>5}"
+            f"{config['max_chains_in_parking']:>8}  {config['eviction']:<18}"
+            f"{config['planner']:<13}"
+            f"{timestep:>10}{result['wall_time']:>10.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("cases", nargs="+", help="case JSON files or globs")
+    parser.add_argument(
+        "--arch",
+        nargs="+",
+        type=lambda value: [int(x) for x in value.split(",")],
+        help="M,N,V,H",
+    )
+    parser.add_argument("--num-ion-chains", nargs="+", type=int)
+    parser.add_argument("--seed", nargs="+", type=int)
+    parser.add_argument("--max-chains-in-parking", nargs="+", type=int)
+    parser.add_argument("--eviction", nargs="+", choices=sorted(EVICTION_POLICIES))
+    parser.add_argument("--planner", nargs="+", choices=sorted(PLANNERS))
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--timeout", type=float, help="seconds per run")
+    parser.add_argument(
+        "-o", "--output", type=Path, default=Path("results") / "sweep.jsonl"
+    )
+    parser.add_argument("--rerun", action="store_true")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    grid = {name: getattr(args, name) for name in PARAMETERS}
+    configs = []
+    for config_file in expand_cases(args.cases):
+        configs.extend(expand_grid(load_config(config_file), grid))
+
+    results = run_sweep(
+        configs,
+        args.output,
+        args.jobs,
+        args.timeout,
+        args.rerun,
+        not args.no_cache,
+    )
+    print(summary_table(results))
+
+
+if __name__ == "__main__":
+    main()
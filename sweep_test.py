@@ -0,0 +1,66 @@
+import json
+from pathlib import Path
+
+from sweep import expand_grid, load_results, run_sweep, summary_table
+
+ROOT = Path(__file__).resolve().parent
+CONFIG = {
+    "arch": [3, 3, 1, 1],
+    "max_timesteps": 1000,
+    "num_ion_chains": 5,
+    "qu_alg": "full_register_access/full_register_access_5.qasm",
+}
+
+
+def test_expand_grid_overrides_and_defaults():
+    """
+    Test that `expand_grid` fills defaults and varies only the given parameters.
+    """
+    configs = expand_grid(CONFIG, {"seed": [0, 1], "eviction": ["lru", "move_list"]})
+    assert [(config["seed"], config["eviction"]) for config in configs] == [
+        (0, "lru"),
+        (0, "move_list"),
+        (1, "lru"),
+        (1, "move_list"),
+    ]
+    assert all(config["max_chains_in_parking"] == 3 for config in configs)
+    assert all(config["arch"] == [3, 3, 1, 1] for config in configs)
+    assert expand_grid(CONFIG, {}) == [
+        {
+            **CONFIG,
+            "seed": 0,
+            "max_chains_in_parking": 3,
+            "eviction": "move_list",
+            "planner": "heuristic",
+        }
+    ]
+
+
+def test_run_sweep_skips_cached_runs(tmp_path, monkeypatch):
+    """
+    Test that a second sweep reuses finished results and reruns timed-out ones.
+    """
+    monkeypatch.chdir(ROOT)
+    results_file = tmp_path / "sweep.jsonl"
+    configs = expand_grid(CONFIG, {"max_chains_in_parking": [2, 3]})
+
+    results = run_sweep(configs, results_file, jobs=1, use_cache=False)
+    assert [result["status"] for result in results] == ["ok", "ok"]
+    assert all(result["completed"] for result in results)
+    assert len(results_file.read_text().splitlines()) == 2
+
+    run_sweep(configs, results_file, jobs=1, use_cache=False)
+    assert len(results_file.read_text().splitlines()) == 2
+
+    # 打ち切られた結果はキャッシュとして使わない
+    timed_out = {**results[0], "status": "timeout"}
+    with results_file.open("a") as f:
+        f.write(json.dumps(timed_out) + "\n")
+    assert load_results(results_file)[timed_out["key"]]["status"] == "timeout"
+    results = run_sweep(configs, results_file, jobs=1, use_cache=False)
+    assert [result["status"] for result in results] == ["ok", "ok"]
+    assert len(results_file.read_text().splitlines()) == 4
+
+    table = summary_table(results).splitlines()
+    assert len(table) == 3
+    assert table[1].split()[-2] == str(results[0]["timestep"])